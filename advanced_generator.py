@@ -7,7 +7,13 @@ Integra configuraciones de máquinas y perfiles de dibujo
 import argparse
 import os
 import sys
-from image_to_gcode import HandDrawnGCodeGenerator
+import numpy as np
+from color_layers import process_color_image_to_gcode
+from config_loader import load_config
+from gcode_encoder import NumberColumn
+from image_to_gcode import HandDrawnGCodeGenerator, print_trace_comparison, print_z_comparison
+from job_control import JobOptions
+from job_metrics import JobMetrics
 from machine_configs import get_machine_config, list_available_machines
 
 class AdvancedGCodeGenerator(HandDrawnGCodeGenerator):
@@ -16,6 +22,7 @@ class AdvancedGCodeGenerator(HandDrawnGCodeGenerator):
     def __init__(self, machine_type="grbl", **kwargs):
         super().__init__(**kwargs)
         self.machine_config = get_machine_config(machine_type)
+        self.z_speed_ratio = self.machine_config.z_speed_ratio
         
     def generate_gcode_header(self):
         """Genera header específico para el tipo de máquina"""
@@ -34,6 +41,71 @@ class AdvancedGCodeGenerator(HandDrawnGCodeGenerator):
         footer = [""]
         footer.extend(self.machine_config.get_footer())
         return footer
+    
+    def generate_tool_change_lines(self, pen_number, color):
+        """Cambio de pluma con el comando de pausa de la máquina"""
+        if self.uses_power:
+            return [
+                f"; Pasada {pen_number}: {color}",
+                f"{self.machine_config.tool_off_command} ; Láser apagado para el cambio",
+                f"{self.machine_config.pause_command} ; Pausa: preparar la pasada {pen_number} ({color})",
+                f"{self.machine_config.dynamic_power_command} S0 ; Potencia dinámica de nuevo",
+            ]
+        return [
+            f"; Pluma {pen_number}: {color}",
+            f"G0 Z{self.z_safe:.2f} ; Herramienta arriba para el cambio",
+            f"{self.machine_config.pause_command} ; Pausa: colocar la pluma {pen_number} ({color})",
+        ]
+    
+    @property
+    def uses_power(self) -> bool:
+        """True si la máquina modula la potencia S en lugar de mover Z (láser)"""
+        return not self.machine_config.supports_z and self.machine_config.supports_power
+    
+    def generate_resume_lines(self):
+        """Al reanudar una parte: herramienta arriba o láser en potencia dinámica"""
+        if self.uses_power:
+            return [f"{self.machine_config.dynamic_power_command} S0 ; Reanudación: láser apagado hasta el primer G1"]
+        return super().generate_resume_lines()
+    
+    def create_job_metrics(self):
+        """Sin Z no se cuentan subidas ni bajadas entre trazos"""
+        if self.uses_power:
+            return JobMetrics(self.z_safe, self.travel_speed, max(self.feed_rate // 4, 1), z_moves=False)
+        return super().create_job_metrics()
+    
+    def pressure_to_power(self, z):
+        """Convierte la Z de presión simulada en potencia S: menos Z, más potencia"""
+        low, high = self.machine_config.power_range
+        if self.z_variation > 0:
+            pressure = np.clip(1.0 - (z - self.z_draw_base) / self.z_variation, 0.0, 1.0)
+        else:
+            pressure = np.ones(len(z))
+        return np.rint(low + pressure * (high - low)).astype(np.int64)
+    
+    def stroke_lead_lines(self, xy, z, feed):
+        """Con potencia dinámica basta posicionar con G0: en modo M4 el láser no emite"""
+        if not self.uses_power:
+            return super().stroke_lead_lines(xy, z, feed)
+        x, y = xy[0]
+        return [f"G0 X{x:.3f} Y{y:.3f} F{self.travel_speed}"]
+    
+    def stroke_end_lines(self):
+        """Sin Z no hay que levantar nada al final del trazo"""
+        if not self.uses_power:
+            return super().stroke_end_lines()
+        return []
+    
+    def drawing_columns(self, xy, z, feed, first):
+        """Movimientos de dibujo con potencia S en lugar de Z cuando la máquina lo admite"""
+        if not self.uses_power:
+            return super().drawing_columns(xy, z, feed, first)
+        # S es modal: solo se escribe al empezar cada trazo o cuando cambia la potencia
+        power = self.pressure_to_power(z)
+        changed = first.copy()
+        changed[1:] |= power[1:] != power[:-1]
+        return [b"G1 X", NumberColumn(xy[:, 0], 3), b" Y", NumberColumn(xy[:, 1], 3),
+                NumberColumn(power, prefix=b" S", present=changed), b" F", NumberColumn(feed)]
 
 def setup_drawing_profiles():
     """Define perfiles de dibujo predefinidos"""
@@ -44,7 +116,10 @@ def setup_drawing_profiles():
             "feed_rate": 800,
             "tremor_amplitude": 0.15,
             "pressure_variation": 0.4,
-            "speed_variation": 0.3
+            "speed_variation": 0.3,
+            "tremor_frequency": 0.6,
+            "pressure_frequency": 0.08,
+            "speed_frequency": 0.05
         },
         "technical": {
             "description": "Trazo técnico preciso",
@@ -52,7 +127,10 @@ def setup_drawing_profiles():
             "feed_rate": 1200,
             "tremor_amplitude": 0.05,
             "pressure_variation": 0.1,
-            "speed_variation": 0.1
+            "speed_variation": 0.1,
+            "tremor_frequency": 0.2,
+            "pressure_frequency": 0.03,
+            "speed_frequency": 0.02
         },
         "sketch": {
             "description": "Boceto rápido y suelto",
@@ -60,7 +138,10 @@ def setup_drawing_profiles():
             "feed_rate": 1500,
             "tremor_amplitude": 0.2,
             "pressure_variation": 0.35,
-            "speed_variation": 0.25
+            "speed_variation": 0.25,
+            "tremor_frequency": 0.8,
+            "pressure_frequency": 0.1,
+            "speed_frequency": 0.08
         },
         "calligraphy": {
             "description": "Estilo caligráfico con variaciones suaves",
@@ -68,7 +149,10 @@ def setup_drawing_profiles():
             "feed_rate": 600,
             "tremor_amplitude": 0.08,
             "pressure_variation": 0.5,
-            "speed_variation": 0.2
+            "speed_variation": 0.2,
+            "tremor_frequency": 0.3,
+            "pressure_frequency": 0.04,
+            "speed_frequency": 0.03
         },
         "engraving": {
             "description": "Grabado controlado para materiales duros",
@@ -76,7 +160,10 @@ def setup_drawing_profiles():
             "feed_rate": 400,
             "tremor_amplitude": 0.03,
             "pressure_variation": 0.05,
-            "speed_variation": 0.05
+            "speed_variation": 0.05,
+            "tremor_frequency": 0.15,
+            "pressure_frequency": 0.02,
+            "speed_frequency": 0.02
         }
     }
 
@@ -99,6 +186,20 @@ def apply_profile(generator, profile_name, profiles):
         generator.pressure_variation = profile["pressure_variation"]
     if "speed_variation" in profile:
         generator.speed_variation = profile["speed_variation"]
+    if "tremor_frequency" in profile:
+        generator.tremor_frequency = profile["tremor_frequency"]
+    if "pressure_frequency" in profile:
+        generator.pressure_frequency = profile["pressure_frequency"]
+    if "speed_frequency" in profile:
+        generator.speed_frequency = profile["speed_frequency"]
+
+def create_generator(machine_type="grbl", profile_name="artistic", config=None, **kwargs):
+    """Crea un generador avanzado con perfil y procesamiento de imagen aplicados"""
+    generator = AdvancedGCodeGenerator(machine_type=machine_type, **kwargs)
+    apply_profile(generator, profile_name, setup_drawing_profiles())
+    if config:
+        generator.configure_image_processing(config.get("image_processing", {}))
+    return generator
 
 def main():
     parser = argparse.ArgumentParser(
@@ -142,6 +243,16 @@ Ejemplos de uso:
                        help='Altura base de dibujo en mm (default: 0.2)')
     parser.add_argument('--z-variation', type=float,
                        help='Variación máxima en Z en mm (override del perfil)')
+    parser.add_argument('--z-speed-ratio', type=float,
+                       help='Velocidad máxima de Z respecto a XY (default: según la máquina)')
+    parser.add_argument('--z-smoothing', type=float,
+                       help='Ventana en mm del filtro paso bajo de la presión (default: 4)')
+    parser.add_argument('--z-deadband', type=float,
+                       help='Cambios de Z menores (mm) no se emiten (default: 0.02)')
+    parser.add_argument('--no-z-planning', action='store_true',
+                       help='Emitir la presión sin suavizar, limitar ni agrupar cambios de Z')
+    parser.add_argument('--compare-z', action='store_true',
+                       help='Medir la velocidad efectiva de dibujo sin y con planificación de Z')
     
     # Parámetros de velocidad
     parser.add_argument('--feed-rate', type=int,
@@ -150,10 +261,69 @@ Ejemplos de uso:
                        help='Velocidad de desplazamiento en mm/min (default: 3000)')
     
     # Procesamiento de imagen
-    parser.add_argument('--blur', type=int, default=5,
-                       help='Kernel de difuminado para suavizar imagen (default: 5)')
+    parser.add_argument('--config', help='Archivo de configuración (default: config.json)')
+    parser.add_argument('--blur', type=int,
+                       help='Kernel de difuminado para suavizar imagen (default: config, 5)')
+    parser.add_argument('--canny-low', type=float,
+                       help='Umbral inferior de Canny (default: config, 50)')
+    parser.add_argument('--canny-high', type=float,
+                       help='Umbral superior de Canny (default: config, 150)')
+    parser.add_argument('--min-area', type=float,
+                       help='Área mínima de contorno en px² (default: config, 50)')
+    parser.add_argument('--min-area-mm2', type=float,
+                       help='Área mínima de contorno en mm² del canvas (default: config, sin filtro)')
+    parser.add_argument('--min-length-mm', type=float,
+                       help='Perímetro o longitud mínima de trazo en mm (default: config, sin filtro)')
+    parser.add_argument('--auto-threshold', choices=['median', 'otsu'],
+                       help='Calcular los umbrales de Canny a partir de la imagen')
+    parser.add_argument('--centerline', action='store_true',
+                       help='Trazar la línea central de cada trazo (dibujos de línea) en lugar de sus bordes')
+    parser.add_argument('--max-contours', type=int,
+                       help='Presupuesto máximo de contornos (levantamientos de pluma)')
+    parser.add_argument('--max-points', type=int,
+                       help='Presupuesto máximo de puntos de trayectoria')
+    parser.add_argument('--resample-step', type=float,
+                       help='Remuestrear los trazos con un punto cada N mm (default: config, desactivado)')
+    parser.add_argument('--svg-tolerance', type=float,
+                       help='Error máximo en mm al aproximar las curvas de un SVG (default: config, 0.05)')
+    parser.add_argument('--max-job-points', type=int,
+                       help='Presupuesto máximo de puntos emitidos; amplía el paso de remuestreo')
+    parser.add_argument('--preview', action='store_true',
+                       help='Guardar una vista previa PNG del G-code (nombre.preview.png)')
+    parser.add_argument('--metrics', action='store_true',
+                       help='Guardar las métricas del trabajo (nombre.metrics.json)')
+    parser.add_argument('--low-memory', action='store_true',
+                       help='Liberar las imágenes y trazos intermedios en cuanto se consumen')
+    parser.add_argument('--pen-width', type=float, default=0.5,
+                       help='Ancho del trazo en mm, limita la resolución de entrada; 0 = completa (default: 0.5)')
+    
+    # Color (varias plumas)
+    parser.add_argument('--colors', type=int,
+                       help='Separar la imagen en N colores, una capa por pluma')
+    parser.add_argument('--pens',
+                       help='Paleta de plumas disponibles, p. ej. "#000000,#d02020,#2040c0"')
+    parser.add_argument('--split-pens', action='store_true',
+                       help='Un archivo por pluma en lugar de un programa con pausas de cambio')
+    parser.add_argument('--keep-background', action='store_true',
+                       help='Dibujar también el color más claro (por defecto se toma como papel)')
+    
+    # Salida
+    parser.add_argument('--compress', choices=['gzip', 'xz'],
+                       help='Comprimir la salida (también se deduce de .gz/.xz)')
+    parser.add_argument('--max-part-mb', type=float,
+                       help='Dividir la salida en partes de como máximo N MB (p. ej. tarjetas SD)')
+    parser.add_argument('--max-part-minutes', type=float,
+                       help='Dividir la salida en partes de como máximo N minutos estimados')
+    parser.add_argument('--time-limit', type=float,
+                       help='Detener el trabajo tras N segundos dejando un G-code parcial válido')
+    
+    # Validación
+    parser.add_argument('--validate', action='store_true',
+                       help='Validar el G-code generado contra la sección safety de config.json')
     
     args = parser.parse_args()
+    if args.time_limit is not None and not (np.isfinite(args.time_limit) and args.time_limit > 0):
+        parser.error("--time-limit debe ser un número de segundos mayor que 0")
     
     # Mostrar listas si se solicita
     if args.list_machines:
@@ -185,32 +355,113 @@ Ejemplos de uso:
             canvas_height=args.height,
             z_safe=args.z_safe,
             z_draw_base=args.z_base,
-            travel_speed=args.travel_speed
+            travel_speed=args.travel_speed,
+            pen_width=args.pen_width
         )
         
         # Aplicar perfil
         profiles = setup_drawing_profiles()
         apply_profile(generator, args.profile, profiles)
         
+        # Procesamiento de imagen desde config.json y overrides
+        config = load_config(args.config)
+        generator.configure_image_processing(config.get("image_processing", {}))
+        generator.configure_image_processing({
+            key: value for key, value in (
+                ("default_blur", args.blur),
+                ("canny_low", args.canny_low),
+                ("canny_high", args.canny_high),
+                ("min_contour_area", args.min_area),
+                ("min_contour_area_mm2", args.min_area_mm2),
+                ("min_contour_length_mm", args.min_length_mm),
+                ("auto_threshold", args.auto_threshold),
+                ("trace_mode", "centerline" if args.centerline else None),
+                ("max_contours", args.max_contours),
+                ("max_points", args.max_points),
+                ("resample_step", args.resample_step),
+                ("max_job_points", args.max_job_points),
+                ("svg_tolerance", args.svg_tolerance),
+            ) if value is not None
+        })
+        
+        # Opciones de salida
+        generator.output_compression = args.compress
+        generator.low_memory = args.low_memory
+        generator.write_metrics = args.metrics
+        if args.max_part_mb:
+            generator.max_part_bytes = int(args.max_part_mb * 1024 * 1024)
+        if args.max_part_minutes:
+            generator.max_part_seconds = args.max_part_minutes * 60.0
+        
         # Aplicar overrides de línea de comandos
         if args.z_variation is not None:
             generator.z_variation = args.z_variation
         if args.feed_rate is not None:
             generator.feed_rate = args.feed_rate
+        if args.z_speed_ratio is not None:
+            generator.z_speed_ratio = args.z_speed_ratio
+        if args.z_smoothing is not None:
+            generator.z_smoothing = args.z_smoothing
+        if args.z_deadband is not None:
+            generator.z_deadband = args.z_deadband
+        generator.z_planning = not args.no_z_planning
         
         # Procesar imagen
         print(f"Procesando: {args.input_image}")
         print(f"Máquina: {generator.machine_config.name}")
         print(f"Perfil: {args.profile} - {profiles.get(args.profile, {}).get('description', 'Personalizado')}")
         print(f"Canvas: {args.width}x{args.height}mm")
-        print(f"Variación Z: {generator.z_variation}mm")
+        if generator.uses_power:
+            low, high = generator.machine_config.power_range
+            print(f"Potencia: S{low}-{high} ({generator.machine_config.dynamic_power_command}, sin movimientos Z)")
+        else:
+            print(f"Variación Z: {generator.z_variation}mm")
         print(f"Velocidad: {generator.feed_rate}mm/min")
         print()
         
-        generator.process_image_to_gcode(args.input_image, args.output)
+        if args.colors:
+            output_paths = process_color_image_to_gcode(
+                generator, args.input_image, args.output,
+                n_colors=args.colors,
+                pens=args.pens.split(',') if args.pens else None,
+                split_files=args.split_pens,
+                keep_background=args.keep_background
+            )
+        else:
+            if generator.trace_mode == "centerline":
+                print_trace_comparison(generator.compare_trace_modes(args.input_image))
+                print()
+            if args.compare_z:
+                print_z_comparison(generator.compare_z_planning(args.input_image))
+                print()
+            options = JobOptions.with_time_limit(args.time_limit) if args.time_limit is not None else None
+            output_paths = generator.process_image_to_gcode(args.input_image, args.output, options)
+            if generator.last_stop_reason:
+                print(f"⚠ G-code parcial ({generator.last_stop_reason}): herramienta levantada al final")
+                print()
         
-        print(f"✓ G-code generado exitosamente: {args.output}")
+        print(f"✓ G-code generado exitosamente: {', '.join(output_paths)}")
         print()
+        
+        if args.preview:
+            from preview_renderer import preview_path, render_gcode_preview
+            preview = render_gcode_preview(output_paths, preview_path(args.output),
+                                           extent=(args.width, args.height))
+            print(f"Vista previa: {preview}")
+            print()
+        
+        if args.validate:
+            from gcode_validator import GCodeValidator, print_report
+            validator = GCodeValidator.from_config(
+                config, canvas_width=args.width, canvas_height=args.height)
+            all_ok = True
+            for output_path in output_paths:
+                report = validator.validate_file(output_path)
+                print_report(output_path, report)
+                print()
+                all_ok = all_ok and report.ok
+            if not all_ok:
+                return 1
         print("Notas importantes:")
         print("- Verifica los parámetros Z según tu máquina y material")
         print("- Prueba en simulador antes del uso real")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Procesamiento por lotes con pipeline asyncio solapado
+Decodifica las siguientes imágenes mientras se emite y escribe la actual,
+con una cola acotada entre etapas. La salida es la misma que la del CLI
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from advanced_generator import create_generator
+from config_loader import load_config
+from image_to_gcode import HandDrawnGCodeGenerator
+
+# Marca de fin de cola
+_DONE = object()
+
+class BatchStats:
+    """Tiempos de un lote: total y ocupación de cada etapa"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.images = 0
+        self.failed: List[Tuple[str, str]] = []
+        self.wall_time = 0.0
+        self.stage_time: Dict[str, float] = {"decode": 0.0, "emit": 0.0}
+
+    @property
+    def per_image(self) -> float:
+        return self.wall_time / self.images if self.images else 0.0
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stage_time.items())
+        return (f"{self.mode}: {self.images} imágenes en {self.wall_time:.2f}s "
+                f"({self.per_image * 1000:.0f} ms/imagen; {stages})")
+
+class BatchPipeline:
+    """Pipeline de dos etapas (decodificar; emitir y escribir) sobre hilos
+
+    OpenCV libera el GIL durante la decodificación y la detección de bordes,
+    así que la imagen siguiente se procesa mientras Python emite el G-code de
+    la actual. La emisión escribe con write_toolpath_gcode (GCodeWriter), igual
+    que process_image_to_gcode: compresión, partes, líneas de reanudación y
+    métricas salen idénticas a las del CLI.
+    """
+
+    def __init__(self, generator_factory: Callable[[], HandDrawnGCodeGenerator],
+                 prefetch: int = 2):
+        # Una cola asyncio con maxsize < 1 no tiene límite
+        if prefetch < 1:
+            raise ValueError("prefetch debe ser al menos 1")
+        self.generator_factory = generator_factory
+        self.prefetch = prefetch
+
+    def run(self, jobs: List[Tuple[str, str]]) -> BatchStats:
+        """Procesa una lista de (imagen, salida) y devuelve las estadísticas"""
+        return asyncio.run(self.run_async(jobs))
+
+    async def run_async(self, jobs: List[Tuple[str, str]]) -> BatchStats:
+        stats = BatchStats("pipeline")
+        loop = asyncio.get_running_loop()
+        decode_queue: asyncio.Queue = asyncio.Queue(maxsize=self.prefetch)
+
+        # Un generador por etapa: la caché del decodificador no interfiere con la emisión
+        decoder = self.generator_factory()
+        emitter = self.generator_factory()
+
+        async def timed(stage, executor, func, *args):
+            start = time.perf_counter()
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            finally:
+                stats.stage_time[stage] += time.perf_counter() - start
+
+        async def decode_stage(executor):
+            for image_path, output_path in jobs:
+                try:
+                    toolpath = await timed("decode", executor, decoder.get_toolpath, image_path)
+                except Exception as e:
+                    stats.failed.append((image_path, str(e)))
+                    continue
+                # Bloquea si la emisión va por detrás (memoria acotada)
+                await decode_queue.put((image_path, output_path, toolpath))
+            await decode_queue.put(_DONE)
+
+        async def emit_stage(executor):
+            while True:
+                item = await decode_queue.get()
+                if item is _DONE:
+                    break
+                image_path, output_path, toolpath = item
+                try:
+                    await timed("emit", executor, emitter.write_toolpath_gcode, toolpath, output_path)
+                    stats.images += 1
+                except Exception as e:
+                    stats.failed.append((image_path, str(e)))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(1, thread_name_prefix="decode") as decode_executor, \
+                ThreadPoolExecutor(1, thread_name_prefix="emit") as emit_executor:
+            await asyncio.gather(
+                decode_stage(decode_executor),
+                emit_stage(emit_executor),
+            )
+        stats.wall_time = time.perf_counter() - start
+        return stats
+
+def run_sequential(generator_factory: Callable[[], HandDrawnGCodeGenerator],
+                   jobs: List[Tuple[str, str]]) -> BatchStats:
+    """Bucle secuencial de referencia: leer, procesar, emitir y escribir una a una"""
+    stats = BatchStats("secuencial")
+    generator = generator_factory()
+    start = time.perf_counter()
+    for image_path, output_path in jobs:
+        try:
+            stage_start = time.perf_counter()
+            toolpath = generator.get_toolpath(image_path)
+            # Sin caché entre imágenes, igual que un proceso por trabajo
+            generator.invalidate_cache()
+            stats.stage_time["decode"] += time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            generator.write_toolpath_gcode(toolpath, output_path)
+            stats.stage_time["emit"] += time.perf_counter() - stage_start
+            stats.images += 1
+        except Exception as e:
+            stats.failed.append((image_path, str(e)))
+    stats.wall_time = time.perf_counter() - start
+    return stats
+
+def build_jobs(image_paths: List[str], output_dir: Optional[str], suffix: str) -> List[Tuple[str, str]]:
+    """Asocia cada imagen a su archivo de salida"""
+    jobs = []
+    for image_path in image_paths:
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        directory = output_dir or os.path.dirname(image_path) or "."
+        jobs.append((image_path, os.path.join(directory, f"{base_name}_{suffix}.gcode")))
+    return jobs
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convierte muchas imágenes con un pipeline solapado de E/S y cómputo',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  %(prog)s escaneos/*.png -d salida --machine plotter --profile sketch
+  %(prog)s escaneos/*.png -d salida --compare
+        """
+    )
+    parser.add_argument('images', nargs='+', help='Imágenes de entrada')
+    parser.add_argument('-d', '--output-dir', help='Directorio de salida (default: junto a cada imagen)')
+    parser.add_argument('--machine', default='grbl', help='Tipo de máquina (default: grbl)')
+    parser.add_argument('--profile', default='artistic', help='Perfil de dibujo (default: artistic)')
+    parser.add_argument('--width', type=float, default=200.0, help='Ancho del canvas en mm (default: 200)')
+    parser.add_argument('--height', type=float, default=200.0, help='Alto del canvas en mm (default: 200)')
+    parser.add_argument('--config', help='Archivo de configuración (default: config.json)')
+    parser.add_argument('--prefetch', type=int, default=2,
+                        help='Imágenes decodificadas por adelantado (default: 2)')
+    parser.add_argument('--compare', action='store_true',
+                        help='Medir también el bucle secuencial y mostrar la aceleración')
+
+    args = parser.parse_args()
+    if args.prefetch < 1:
+        print("Error: --prefetch debe ser al menos 1", file=sys.stderr)
+        return 1
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    config = load_config(args.config)
+
+    def factory():
+        return create_generator(args.machine, args.profile, config,
+                                canvas_width=args.width, canvas_height=args.height)
+
+    jobs = build_jobs(args.images, args.output_dir, f"{args.machine}_{args.profile}")
+
+    results = []
+    if args.compare:
+        results.append(run_sequential(factory, jobs))
+    results.append(BatchPipeline(factory, prefetch=args.prefetch).run(jobs))
+
+    print()
+    for stats in results:
+        print(stats.summary())
+        for image_path, error in stats.failed:
+            print(f"  ✗ {image_path}: {error}")
+    if args.compare and results[0].per_image > 0 and results[1].per_image > 0:
+        print(f"Aceleración: {results[0].per_image / results[1].per_image:.2f}x")
+
+    return 0 if not results[-1].failed else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Trazado por línea central para dibujos de línea
+Umbraliza, adelgaza con Zhang-Suen y recorre el esqueleto como un grafo
+para obtener una polilínea por trazo en lugar de los dos bordes de Canny
+"""
+
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+def _neighbour_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Tablas de 256 entradas indexadas por el código de los 8 vecinos
+
+    Bit k del código = vecino P(k+2) de Zhang-Suen: N, NE, E, SE, S, SO, O, NO.
+    """
+    codes = np.arange(256)
+    p = [(codes >> k) & 1 for k in range(8)]  # p[0] = P2 ... p[7] = P9
+    count = sum(p)
+    # Transiciones 0 -> 1 en la secuencia circular P2, P3, ..., P9, P2
+    transitions = sum(((p[k] == 0) & (p[(k + 1) % 8] == 1)).astype(np.int64) for k in range(8))
+    P2, P4, P6, P8 = p[0], p[2], p[4], p[6]
+    common = (count >= 2) & (count <= 6) & (transitions == 1)
+    first = common & (P2 * P4 * P6 == 0) & (P4 * P6 * P8 == 0)
+    second = common & (P2 * P4 * P8 == 0) & (P2 * P6 * P8 == 0)
+    return first, second, transitions.astype(np.uint8)
+
+DELETE_FIRST, DELETE_SECOND, CROSSINGS = _neighbour_tables()
+
+def _offsets(width: int) -> np.ndarray:
+    """Desplazamientos en el índice plano de N, NE, E, SE, S, SO, O, NO"""
+    return np.array([-width, -width + 1, 1, width + 1, width, width - 1, -1, -width - 1])
+
+def _reach_offsets(width: int) -> np.ndarray:
+    """Desplazamientos planos de la ventana 5x5, del más cercano al más lejano"""
+    window = [(dx, dy) for dy in range(-2, 3) for dx in range(-2, 3) if dx or dy]
+    window.sort(key=lambda d: d[0] * d[0] + d[1] * d[1])
+    return np.array([dy * width + dx for dx, dy in window])
+
+def _neighbour_codes(flat: np.ndarray, indices: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    code = np.zeros(len(indices), dtype=np.uint8)
+    for bit, offset in enumerate(offsets):
+        code |= flat[indices + offset] << bit
+    return code
+
+def _binary_padded(binary: np.ndarray, margin: int) -> np.ndarray:
+    """Copia 0/1 uint8 de la máscara con un marco de ceros (sin copias intermedias)"""
+    padded = np.pad(binary, margin)
+    if padded.dtype != np.uint8:
+        return (padded > 0).astype(np.uint8)
+    np.minimum(padded, 1, out=padded)
+    return padded
+
+def zhang_suen_thinning(binary: np.ndarray) -> np.ndarray:
+    """Esqueleto de 1 píxel de una máscara binaria (Zhang-Suen)
+
+    Solo se reevalúan los píxeles vecinos de alguno borrado en la iteración
+    anterior, así que el coste depende del grosor del trazo y no del tamaño
+    de la imagen.
+    """
+    # Marco de un píxel para que los vecinos nunca salgan de la imagen
+    padded = _binary_padded(binary, 1)
+    height, width = padded.shape
+    flat = padded.ravel()
+    offsets = _offsets(width)
+
+    # Al principio solo el borde puede adelgazar
+    border = cv2.erode(padded, np.ones((3, 3), np.uint8))
+    cv2.subtract(padded, border, dst=border)
+    candidates = np.flatnonzero(border).astype(np.int32)
+    del border
+    offsets = offsets.astype(np.int32)
+    while candidates.size:
+        deleted = []
+        for table in (DELETE_FIRST, DELETE_SECOND):
+            candidates = candidates[flat[candidates] == 1]
+            remove = candidates[table[_neighbour_codes(flat, candidates, offsets)]]
+            flat[remove] = 0
+            deleted.append(remove)
+        removed = np.concatenate(deleted)
+        if not removed.size:
+            break
+        # Vecinos aún activos, sin duplicados (ordenar int32 es más rápido que np.unique)
+        neighbours = (removed[:, None] + offsets[None, :]).ravel()
+        neighbours = np.sort(neighbours[flat[neighbours] == 1])
+        keep = np.empty(len(neighbours), dtype=bool)
+        keep[:1] = True
+        np.not_equal(neighbours[1:], neighbours[:-1], out=keep[1:])
+        candidates = neighbours[keep]
+
+    return padded[1:-1, 1:-1]
+
+def trace_skeleton(skeleton: np.ndarray, min_spur_length: int = 5) -> List[np.ndarray]:
+    """Convierte un esqueleto en polilíneas (N, 2) en coordenadas de píxel (x, y)
+
+    Los cruces (píxeles con 3 o más ramas de vecinos) y sus vecinos se separan
+    del esqueleto; cada tramo restante es una cadena simple que findContours
+    recorre en C. Cada extremo que toca un cruce se prolonga hasta él y, en
+    cada cruce, las ramas que siguen en línea recta se unen en un solo trazo.
+    Las ramas sueltas más cortas que min_spur_length se descartan.
+    """
+    # Marco de dos píxeles: la búsqueda de cruces mira hasta 2 píxeles alrededor.
+    # Es la única copia a tamaño completo; los cruces se guardan como índices
+    padded = _binary_padded(skeleton, 2)
+    height, width = padded.shape
+    chains = padded.ravel()
+    offsets = _offsets(width)
+
+    pixels = np.flatnonzero(chains)
+    # Número de ramas: no cuenta dos veces los escalones diagonales del esqueleto
+    branches = CROSSINGS[_neighbour_codes(chains, pixels, offsets)]
+    junctions = pixels[branches >= 3]
+    del pixels, branches
+
+    # Quitar también los vecinos de cada cruce: en 8-conectividad las ramas
+    # siguen tocándose en diagonal alrededor de un único píxel de cruce
+    chains[junctions] = 0
+    chains[(junctions[:, None] + offsets[None, :]).ravel()] = 0
+    chain_image = chains.reshape(height, width)
+    reach = _reach_offsets(width)
+
+    # Cada grupo de cruces cuyas zonas se tocan es un nodo del grafo
+    nodes = _group_junctions(junctions, width)
+
+    contours, _ = cv2.findContours(chain_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    if not contours:
+        return []
+    points, lengths = _chains_from_contours(contours, chains, width, offsets)
+    del contours
+    heads = np.cumsum(lengths) - lengths
+    tails = heads + lengths - 1
+
+    # Prolongar cada extremo hasta el cruce más cercano (a 2 píxeles como mucho);
+    # los dos extremos de una cadena no se unen al mismo píxel de cruce
+    head_pixel = _nearest_junction(points[heads], junctions, width, reach)
+    tail_pixel = _nearest_junction(points[tails], junctions, width, reach, exclude=head_pixel)
+    has_head, has_tail = head_pixel >= 0, tail_pixel >= 0
+
+    # Las ramas sueltas cortas (sin cruce en los dos extremos) se descartan
+    extended = lengths + has_head + has_tail
+    keep = (has_head & has_tail) | (extended >= min_spur_length)
+    if not keep.any():
+        return []
+    points = points[np.repeat(keep, lengths)]
+    lengths, extended = lengths[keep], extended[keep]
+    head_pixel, tail_pixel = head_pixel[keep], tail_pixel[keep]
+    has_head, has_tail = has_head[keep], has_tail[keep]
+
+    # Cadenas prolongadas concatenadas: [cruce] tramo [cruce]
+    starts = np.cumsum(extended) - extended
+    ends = starts + extended - 1
+    body = np.arange(len(points)) - np.repeat(np.cumsum(lengths) - lengths - starts - has_head, lengths)
+    path = np.empty((int(extended.sum()), 2), dtype=points.dtype)
+    path[body] = points
+    path[starts[has_head], 0] = head_pixel[has_head] % width
+    path[starts[has_head], 1] = head_pixel[has_head] // width
+    path[ends[has_tail], 0] = tail_pixel[has_tail] % width
+    path[ends[has_tail], 1] = tail_pixel[has_tail] // width
+    del points, body
+
+    # Extremos unidos a un cruce: identificador 2 * cadena + (0 inicio, 1 final)
+    end_ids = np.concatenate([2 * np.flatnonzero(has_head), 2 * np.flatnonzero(has_tail) + 1])
+    pixels = np.concatenate([head_pixel[has_head], tail_pixel[has_tail]])
+    end_nodes = nodes[np.searchsorted(junctions, pixels)]
+    links = _pair_at_junctions(path, starts, ends, end_ids, end_nodes)
+    return _stitch(path - 2, starts, extended, links)  # quitar el marco
+
+def _grouped_arange(lengths: np.ndarray) -> np.ndarray:
+    """0..lengths[i]-1 de cada grupo, concatenados"""
+    return np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+def _is_member(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """values que aparecen en el array ordenado sorted_values"""
+    positions = np.minimum(np.searchsorted(sorted_values, values), max(len(sorted_values) - 1, 0))
+    return sorted_values[positions] == values if len(sorted_values) else np.zeros(len(values), bool)
+
+def _nearest_junction(ends: np.ndarray, junctions: np.ndarray, width: int, reach: np.ndarray,
+                      exclude: Optional[np.ndarray] = None) -> np.ndarray:
+    """Índice plano del cruce más cercano a cada extremo (x, y) en la ventana 5x5, o -1"""
+    touching = (ends[:, 1].astype(np.int64) * width + ends[:, 0])[:, None] + reach[None, :]
+    member = _is_member(junctions, touching.ravel()).reshape(touching.shape)
+    if exclude is not None:
+        member &= touching != exclude[:, None]
+    first = member.argmax(axis=1)
+    return np.where(member.any(axis=1), touching[np.arange(len(touching)), first], -1)
+
+def _group_junctions(junctions: np.ndarray, width: int) -> np.ndarray:
+    """Etiqueta de grupo de cada cruce (cruces a 3 píxeles o menos comparten grupo)"""
+    labels = np.arange(len(junctions))
+    if len(junctions) < 2:
+        return labels
+    pairs = []
+    for dy in range(0, 4):
+        for dx in range(-3, 4):
+            if dy == 0 and dx <= 0:
+                continue
+            neighbours = junctions + dy * width + dx
+            found = _is_member(junctions, neighbours)
+            pairs.append(np.stack([np.flatnonzero(found), np.searchsorted(junctions, neighbours[found])]))
+    a, b = np.concatenate(pairs, axis=1)
+
+    # Propagar la etiqueta mínima por las parejas hasta que no cambie
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        previous = labels.copy()
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+def _pair_at_junctions(path: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                       end_ids: np.ndarray, end_nodes: np.ndarray) -> List[int]:
+    """Empareja en cada cruce los extremos que continúan en línea más recta
+
+    end_ids son extremos 2 * cadena + (0 inicio, 1 final) y end_nodes su
+    nodo. Devuelve, por extremo, el extremo con el que se une o -1. Dos
+    ramas solo se unen si forman un ángulo de más de 90°.
+    """
+    links = [-1] * (2 * len(starts))
+    if len(end_ids) < 2:
+        return links
+
+    # Dirección de salida desde el cruce hacia el interior de la cadena (hasta 5 píxeles)
+    chain, at_tail = end_ids >> 1, (end_ids & 1).astype(bool)
+    depth = np.minimum(5, ends[chain] - starts[chain])
+    outer = np.where(at_tail, ends[chain], starts[chain])
+    inner = np.where(at_tail, outer - depth, outer + depth)
+    directions = (path[inner] - path[outer]).astype(np.float64)
+    norms = np.hypot(*directions.T)
+    np.divide(directions, norms[:, None], out=directions, where=norms[:, None] > 0)
+
+    # Todas las parejas de extremos de un mismo nodo: tras ordenar por nodo (y por
+    # extremo dentro del nodo) son las de posiciones a distancia d dentro del mismo tramo
+    order = np.lexsort((end_ids, end_nodes))
+    end_ids, end_nodes, directions = end_ids[order], end_nodes[order], directions[order]
+    firsts, seconds = [], []
+    for gap in range(1, len(end_ids)):
+        a = np.flatnonzero(end_nodes[:-gap] == end_nodes[gap:])
+        if not a.size:
+            break
+        firsts.append(a)
+        seconds.append(a + gap)
+    a, b = np.concatenate(firsts), np.concatenate(seconds)
+    # Redondeado para que los empates (p. ej. ramas opuestas exactas) no dependan del redondeo
+    cosines = np.round((directions[a] * directions[b]).sum(axis=1), 9)
+    valid = (cosines < 0) & (end_ids[a] >> 1 != end_ids[b] >> 1)
+    a, b, cosines = a[valid], b[valid], cosines[valid]
+
+    # Emparejamiento voraz de la pareja más recta (empates por orden de extremos);
+    # cada extremo pertenece a un solo nodo, así que el orden global equivale a
+    # recorrer los nodos por separado
+    best = np.lexsort((b, a, cosines))
+    for first, second in zip(end_ids[a[best]].tolist(), end_ids[b[best]].tolist()):
+        if links[first] < 0 and links[second] < 0:
+            links[first] = second
+            links[second] = first
+    return links
+
+def _stitch(path: np.ndarray, starts: np.ndarray, lengths: np.ndarray, links: List[int]) -> List[np.ndarray]:
+    """Une las cadenas enlazadas en polilíneas continuas"""
+    count = len(starts)
+    linked = np.array(links) >= 0
+    # Primero las que tienen un extremo libre, así cada recorrido empieza en una punta
+    order = np.argsort(linked[0::2].astype(np.int8) + linked[1::2], kind="stable")
+
+    # Recorrer los enlaces solo con enteros; los puntos se copian al final en bloque
+    used = bytearray(count)
+    pieces, reversed_pieces, sizes = [], [], []
+    for first in order.tolist():
+        if used[first]:
+            continue
+        # Empezar por el extremo libre si solo uno lo está
+        entry = 1 if links[2 * first] >= 0 and links[2 * first + 1] < 0 else 0
+        chain = first
+        size = 0
+        while True:
+            used[chain] = 1
+            pieces.append(chain)
+            reversed_pieces.append(entry)
+            size += 1
+            nxt = links[2 * chain + 1 - entry]
+            if nxt < 0 or used[nxt >> 1]:
+                break
+            chain, entry = nxt >> 1, nxt & 1
+        sizes.append(size)
+
+    # Cada pieza salvo la primera de su polilínea omite el punto compartido con la anterior
+    pieces = np.array(pieces)
+    backwards = np.array(reversed_pieces, dtype=bool)
+    skip = np.ones(len(pieces), dtype=np.int64)
+    skip[np.cumsum(sizes) - sizes] = 0
+    piece_lengths = lengths[pieces] - skip
+    local = _grouped_arange(piece_lengths) + np.repeat(skip, piece_lengths)
+    chain_start = np.repeat(starts[pieces], piece_lengths)
+    chain_last = chain_start + np.repeat(lengths[pieces], piece_lengths) - 1
+    indices = np.where(np.repeat(backwards, piece_lengths), chain_last - local, chain_start + local)
+
+    polyline_lengths = np.add.reduceat(piece_lengths, np.cumsum(sizes) - sizes)
+    return np.split(path[indices], np.cumsum(polyline_lengths)[:-1])
+
+def _chains_from_contours(contours: List[np.ndarray], chains: np.ndarray, width: int,
+                          offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cadenas simples (x, y) concatenadas y su longitud, a partir de los contornos externos
+
+    El contorno de un tramo abierto de 1 píxel va de un extremo al otro y
+    vuelve: la cadena empieza en su primer extremo y acaba en el siguiente.
+    El de un ciclo lo recorre una sola vez y se cierra repitiendo el primer
+    punto. Todos los contornos se procesan a la vez.
+    """
+    sizes = np.array([len(contour) for contour in contours])
+    points = np.concatenate(contours).reshape(-1, 2)
+    offsets_start = np.cumsum(sizes) - sizes
+    indices = points[:, 1].astype(np.int64) * width + points[:, 0]
+    is_end = CROSSINGS[_neighbour_codes(chains, indices, offsets)] <= 1
+
+    # Primer y segundo extremo de cada contorno (dos centinelas tras el último punto)
+    ends = np.concatenate([np.flatnonzero(is_end), [len(points), len(points)]])
+    k = np.searchsorted(ends, offsets_start)
+    limit = offsets_start + sizes
+    has_first = ends[k] < limit
+    has_second = ends[k + 1] < limit
+    first = np.where(has_first, ends[k] - offsets_start, 0)
+    stop = np.where(has_second, ends[k + 1] - offsets_start - first, sizes - 1)
+    lengths = np.where(has_first, stop + 1, sizes + 1)
+
+    # Rotación circular de cada contorno desde su primer extremo
+    group = np.repeat(np.arange(len(sizes)), lengths)
+    positions = (first[group] + _grouped_arange(lengths)) % sizes[group] + offsets_start[group]
+    return points[positions], lengths
+
+def threshold_line_art(gray: np.ndarray, blur_kernel: int = 3, in_place: bool = False) -> np.ndarray:
+    """Máscara binaria de la tinta (oscuro sobre claro) con umbral de Otsu
+
+    Todas las operaciones reutilizan un único buffer; con in_place es el de gray.
+    """
+    kernel_size = max(1, int(blur_kernel)) | 1
+    mask = cv2.GaussianBlur(gray, (kernel_size, kernel_size), 0, dst=gray if in_place else None)
+    cv2.threshold(mask, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU, dst=mask)
+    # Cerrar poros pequeños para que el esqueleto no forme bucles espurios
+    cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8), dst=mask)
+    return mask
+
+def trace_centerlines(gray: np.ndarray, blur_kernel: int = 3,
+                      min_spur_length: int = 5, in_place: bool = False) -> List[np.ndarray]:
+    """Polilíneas de la línea central de un dibujo de línea en escala de grises"""
+    skeleton = zhang_suen_thinning(threshold_line_art(gray, blur_kernel, in_place))
+    return trace_skeleton(skeleton, min_spur_length)
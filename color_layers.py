@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Separación de colores para dibujo con varias plumas
+Agrupa los colores con k-means sobre una copia reducida, clasifica cada píxel
+por centroide más cercano y extrae los contornos de cada color por separado
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from image_to_gcode import HandDrawnGCodeGenerator
+
+# Píxeles de la copia reducida sobre la que se calcula k-means
+KMEANS_SAMPLE_PIXELS = 128 * 128
+
+# Filas por bloque al clasificar (acota la matriz de distancias en memoria)
+CLASSIFY_BAND_ROWS = 256
+
+def parse_hex_color(color: str) -> np.ndarray:
+    """Convierte '#rrggbb' en un píxel BGR uint8"""
+    value = color.strip().lstrip('#')
+    if len(value) != 6:
+        raise ValueError(f"Color de pluma no válido: {color}")
+    r, g, b = (int(value[i:i + 2], 16) for i in (0, 2, 4))
+    return np.array([b, g, r], dtype=np.uint8)
+
+def bgr_to_lab(colors: np.ndarray) -> np.ndarray:
+    """Convierte colores BGR uint8 (N, 3) a Lab en float32"""
+    return cv2.cvtColor(colors.reshape(-1, 1, 3), cv2.COLOR_BGR2LAB).reshape(-1, 3).astype(np.float32)
+
+class ColorLayer:
+    """Una pluma: color, fracción de la imagen que cubre y su trayectoria"""
+
+    def __init__(self, color_bgr: np.ndarray, labels: List[int], coverage: float):
+        self.color_bgr = color_bgr
+        self.labels = labels  # clústeres de k-means asignados a esta pluma
+        self.coverage = coverage
+        self.toolpath: List[np.ndarray] = []
+
+    @property
+    def hex(self) -> str:
+        b, g, r = (int(c) for c in self.color_bgr)
+        return f"#{r:02x}{g:02x}{b:02x}"
+
+    @property
+    def luminance(self) -> float:
+        return float(luminance(self.color_bgr.reshape(1, 3))[0])
+
+def kmeans_colors(lab: np.ndarray, n_colors: int, seed: Optional[int] = None) -> np.ndarray:
+    """Centroides Lab de n_colors clústeres calculados sobre una copia reducida"""
+    height, width = lab.shape[:2]
+    scale = min(1.0, (KMEANS_SAMPLE_PIXELS / (height * width)) ** 0.5)
+    if scale < 1.0:
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        lab = cv2.resize(lab, size, interpolation=cv2.INTER_AREA)
+    samples = lab.reshape(-1, 3).astype(np.float32)
+    n_colors = max(1, min(n_colors, len(samples)))
+
+    if seed is not None:
+        cv2.setRNGSeed(seed)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.5)
+    _, _, centers = cv2.kmeans(samples, n_colors, None, criteria, 3, cv2.KMEANS_PP_CENTERS)
+    return centers
+
+def classify_pixels(lab: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Etiqueta de centroide más cercano para cada píxel, por bandas de filas"""
+    height, width = lab.shape[:2]
+    labels = np.empty((height, width), dtype=np.uint8)
+    centers = centers.astype(np.float32)
+    # |x - c|² = |x|² - 2x·c + |c|²; |x|² no cambia el mínimo
+    centers_sq = (centers * centers).sum(axis=1)
+    for start in range(0, height, CLASSIFY_BAND_ROWS):
+        block = lab[start:start + CLASSIFY_BAND_ROWS].reshape(-1, 3).astype(np.float32)
+        distances = centers_sq - 2.0 * (block @ centers.T)
+        labels[start:start + CLASSIFY_BAND_ROWS] = distances.argmin(axis=1).reshape(-1, width)
+    return labels
+
+def luminance(colors_bgr: np.ndarray) -> np.ndarray:
+    """Luminancia de colores BGR (N, 3)"""
+    colors = colors_bgr.astype(np.float64)
+    return 0.299 * colors[:, 2] + 0.587 * colors[:, 1] + 0.114 * colors[:, 0]
+
+def assign_pens(centers_bgr: np.ndarray, coverage: np.ndarray, clusters: List[int],
+                pens: Optional[Sequence[str]] = None) -> List[ColorLayer]:
+    """Agrupa los clústeres por pluma; con paleta, los que caen en la misma pluma se fusionan"""
+    if not pens:
+        return [ColorLayer(centers_bgr[i], [i], float(coverage[i])) for i in clusters]
+
+    palette = np.array([parse_hex_color(pen) for pen in pens])
+    selected = centers_bgr[clusters]
+    distances = ((bgr_to_lab(selected)[:, None, :] - bgr_to_lab(palette)[None, :, :]) ** 2).sum(axis=2)
+    nearest = distances.argmin(axis=1)
+    layers = []
+    for pen in np.unique(nearest):
+        members = [clusters[i] for i in np.flatnonzero(nearest == pen)]
+        layers.append(ColorLayer(palette[pen], members, float(coverage[members].sum())))
+    return layers
+
+def order_layers(layers: List[ColorLayer]) -> List[ColorLayer]:
+    """Ordena las plumas de clara a oscura
+
+    Cada pluma se dibuja de una vez, así que el programa tiene un solo cambio
+    por pluma. Dibujar primero los colores claros evita que tapen a los oscuros.
+    """
+    return sorted(layers, key=lambda layer: layer.luminance, reverse=True)
+
+def extract_layer_toolpath(generator: HandDrawnGCodeGenerator, labels: np.ndarray,
+                           layer: ColorLayer) -> List[np.ndarray]:
+    """Contornos de la máscara de una pluma, simplificados y normalizados"""
+    mask = np.isin(labels, layer.labels).astype(np.uint8) * 255
+    # Eliminar motas aisladas de clasificación antes de buscar contornos
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+
+    toolpath = []
+    for simplified in generator.simplify_table(generator.find_contour_table(mask)):
+        if len(simplified) >= 2:
+            toolpath.append(generator.normalize_points(simplified.reshape(-1, 2), labels.shape))
+    return toolpath
+
+def separate_colors(generator: HandDrawnGCodeGenerator, image_path: str, n_colors: int = 4,
+                    pens: Optional[Sequence[str]] = None, keep_background: bool = False,
+                    max_workers: Optional[int] = None) -> List[ColorLayer]:
+    """Separa la imagen en capas por pluma y extrae la trayectoria de cada una en paralelo"""
+    image = generator.load_image(image_path, color=True)
+    kernel_size = max(1, int(generator.blur_kernel)) | 1
+    image = cv2.GaussianBlur(image, (kernel_size, kernel_size), 0)
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+
+    centers = kmeans_colors(lab, n_colors, generator.seed)
+    labels = classify_pixels(lab, centers)
+    coverage = np.bincount(labels.ravel(), minlength=len(centers)) / labels.size
+
+    centers_lab = np.clip(np.round(centers), 0, 255).astype(np.uint8)
+    centers_bgr = cv2.cvtColor(centers_lab.reshape(-1, 1, 3), cv2.COLOR_LAB2BGR).reshape(-1, 3)
+    # El clúster más claro se toma como papel y no se dibuja
+    clusters = list(range(len(centers)))
+    if not keep_background and len(clusters) > 1:
+        clusters.remove(int(luminance(centers_bgr).argmax()))
+    layers = order_layers(assign_pens(centers_bgr, coverage, clusters, pens))
+
+    # OpenCV libera el GIL en morfología y findContours: las capas se procesan en hilos
+    workers = max_workers or min(len(layers), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(workers, thread_name_prefix="layer") as executor:
+        toolpaths = list(executor.map(lambda layer: extract_layer_toolpath(generator, labels, layer), layers))
+    for layer, toolpath in zip(layers, toolpaths):
+        layer.toolpath = toolpath
+    # Una pluma sin contornos solo añadiría un cambio de herramienta
+    return [layer for layer in layers if layer.toolpath]
+
+def pen_output_path(output_path: str, pen_number: int, layer: ColorLayer) -> str:
+    """Nombre del archivo de una pluma: base_pluma1_rrggbb.gcode"""
+    base, ext = os.path.splitext(output_path)
+    if ext in ('.gz', '.xz'):
+        base, inner = os.path.splitext(base)
+        ext = inner + ext
+    return f"{base}_pluma{pen_number}_{layer.hex.lstrip('#')}{ext or '.gcode'}"
+
+def process_color_image_to_gcode(generator: HandDrawnGCodeGenerator, image_path: str,
+                                 output_path: str, n_colors: int = 4,
+                                 pens: Optional[Sequence[str]] = None,
+                                 split_files: bool = False,
+                                 keep_background: bool = False) -> List[str]:
+    """Genera un programa con pausas de cambio de pluma o un archivo por pluma"""
+    print(f"Procesando imagen en color: {image_path}")
+    layers = separate_colors(generator, image_path, n_colors, pens, keep_background)
+    for number, layer in enumerate(layers, 1):
+        print(f"Pluma {number}: {layer.hex} ({layer.coverage:.0%} de la imagen, "
+              f"{len(layer.toolpath)} contornos)")
+
+    if split_files:
+        paths = []
+        for number, layer in enumerate(layers, 1):
+            paths.extend(generator.write_toolpath_gcode(layer.toolpath, pen_output_path(output_path, number, layer)))
+        return paths
+
+    return generator.write_layers_gcode(
+        [(generator.generate_tool_change_lines(number, layer.hex), layer.toolpath)
+         for number, layer in enumerate(layers, 1)],
+        output_path
+    )
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Carga del archivo de configuración config.json
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+def load_config(config_path: Optional[str] = None) -> Dict:
+    """Carga la configuración JSON; devuelve un diccionario vacío si no existe"""
+    path = config_path or DEFAULT_CONFIG_PATH
+    if not os.path.exists(path):
+        if config_path:
+            raise FileNotFoundError(f"No se encontró el archivo de configuración: {config_path}")
+        return {}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_config_section(section: str, config_path: Optional[str] = None) -> Dict:
+    """Devuelve una sección de la configuración (vacía si no está definida)"""
+    return load_config(config_path).get(section, {})
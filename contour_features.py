@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tabla de características de contornos
+Calcula en una sola pasada vectorizada sobre todos los puntos el área, el
+perímetro, la caja envolvente, el centroide y los extremos de cada contorno.
+Filtrar, ordenar y buscar contornos son consultas sobre estas columnas en
+lugar de llamadas repetidas a cv2.contourArea / cv2.arcLength
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+class ContourTable:
+    """Columnas por contorno sobre un único array de puntos concatenados
+
+    points es (N, 2) int32 y el contorno i ocupa points[starts[i]:stops[i]].
+    Seleccionar u ordenar filas no copia los puntos, solo los índices.
+    Las áreas y perímetros van en píxeles y en mm según scale (mm por píxel
+    en X e Y, el estiramiento de la imagen al canvas).
+    """
+
+    COLUMNS = ("starts", "stops", "area", "perimeter", "area_mm2", "length_mm",
+               "bbox", "centroid", "start", "end")
+
+    def __init__(self, points: np.ndarray, closed: bool, **columns: np.ndarray):
+        self.points = points
+        self.closed = closed
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def from_contours(cls, contours: Sequence[np.ndarray], closed: bool = True,
+                      scale: Tuple[float, float] = (1.0, 1.0)) -> "ContourTable":
+        """Construye la tabla a partir de contornos de OpenCV (n, 1, 2)
+
+        Con closed se cuenta el segmento de cierre en el perímetro, igual que
+        cv2.arcLength(contour, True). El área es siempre la del polígono
+        cerrado, como cv2.contourArea.
+        """
+        counts = np.fromiter((len(c) for c in contours), dtype=np.int64, count=len(contours))
+        stops = np.cumsum(counts)
+        starts = stops - counts
+        if not len(contours):
+            points = np.zeros((0, 2), dtype=np.int32)
+        else:
+            points = np.concatenate([c.reshape(-1, 2) for c in contours]).astype(np.int32, copy=False)
+        if not len(points):
+            empty = np.zeros(0)
+            return cls(points, closed, starts=starts, stops=stops, area=empty, perimeter=empty,
+                       area_mm2=empty, length_mm=empty, bbox=np.zeros((0, 4)),
+                       centroid=np.zeros((0, 2)), start=np.zeros((0, 2), dtype=np.int32),
+                       end=np.zeros((0, 2), dtype=np.int32))
+
+        # Índice del punto siguiente dentro del mismo contorno (el último vuelve al primero)
+        following = np.arange(1, len(points) + 1)
+        following[stops - 1] = starts
+        x = points[:, 0].astype(np.int64)
+        y = points[:, 1].astype(np.int64)
+        dx = x[following] - x
+        dy = y[following] - y
+
+        # Fórmula del área de Gauss: enteros exactos, igual que cv2.contourArea
+        cross = x * y[following] - x[following] * y
+        twice_area = np.add.reduceat(cross, starts)
+        area = np.abs(twice_area) / 2.0
+
+        # Perímetro con la misma precisión que cv2.arcLength (raíz en float32)
+        segment = np.sqrt((dx * dx + dy * dy).astype(np.float32)).astype(np.float64)
+        segment_mm = np.hypot(dx * scale[0], dy * scale[1])
+        if not closed:
+            segment[stops - 1] = 0.0
+            segment_mm[stops - 1] = 0.0
+        perimeter = np.add.reduceat(segment, starts)
+        length_mm = np.add.reduceat(segment_mm, starts)
+
+        bbox = np.column_stack([np.minimum.reduceat(x, starts), np.minimum.reduceat(y, starts),
+                                np.maximum.reduceat(x, starts), np.maximum.reduceat(y, starts)])
+
+        # Centroide del polígono; los degenerados (área nula) usan la media de sus vértices
+        degenerate = twice_area == 0
+        divisor = np.where(degenerate, 1, 3 * twice_area)
+        centroid = np.column_stack([
+            np.where(degenerate, np.add.reduceat(x, starts) / counts,
+                     np.add.reduceat((x + x[following]) * cross, starts) / divisor),
+            np.where(degenerate, np.add.reduceat(y, starts) / counts,
+                     np.add.reduceat((y + y[following]) * cross, starts) / divisor),
+        ])
+
+        return cls(points, closed, starts=starts, stops=stops, area=area, perimeter=perimeter,
+                   area_mm2=area * scale[0] * scale[1], length_mm=length_mm, bbox=bbox,
+                   centroid=centroid, start=points[starts], end=points[stops - 1])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def contour(self, i: int) -> np.ndarray:
+        """Contorno i como vista (n, 1, 2) sobre los puntos de la tabla"""
+        return self.points[self.starts[i]:self.stops[i]].reshape(-1, 1, 2)
+
+    def contours(self) -> List[np.ndarray]:
+        return [self.contour(i) for i in range(len(self))]
+
+    def take(self, indices) -> "ContourTable":
+        """Filas seleccionadas por índices o máscara booleana, en ese orden"""
+        return ContourTable(self.points, self.closed, **{name: getattr(self, name)[indices]
+                                                         for name in self.COLUMNS})
+
+    def order_by(self, column: str, descending: bool = False) -> "ContourTable":
+        """Ordena las filas por una columna; los empates conservan el orden actual"""
+        values = getattr(self, column)
+        return self.take(np.argsort(-values if descending else values, kind="stable"))
+
+    def mask(self, min_area: Optional[float] = None, min_area_mm2: Optional[float] = None,
+             min_length_mm: Optional[float] = None) -> np.ndarray:
+        """Filas que superan los mínimos indicados (área en px², área en mm², longitud en mm)"""
+        keep = np.ones(len(self), dtype=bool)
+        if min_area is not None:
+            keep &= self.area > min_area
+        if min_area_mm2:
+            keep &= self.area_mm2 >= min_area_mm2
+        if min_length_mm:
+            keep &= self.length_mm >= min_length_mm
+        return keep
+
+    def within(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Índices de los contornos cuya caja envolvente corta el rectángulo (en píxeles)"""
+        bbox = self.bbox
+        return np.flatnonzero((bbox[:, 0] <= x1) & (bbox[:, 2] >= x0) &
+                              (bbox[:, 1] <= y1) & (bbox[:, 3] >= y0))
+
+    def nearest_endpoint(self, point: Sequence[float]) -> Tuple[int, bool]:
+        """Contorno con el extremo más cercano a point y si conviene recorrerlo al revés"""
+        to_start = np.hypot(*(self.start - point).T)
+        to_end = np.hypot(*(self.end - point).T)
+        i = int(np.argmin(np.minimum(to_start, to_end)))
+        return i, bool(to_end[i] < to_start[i])
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Codificación en bloque de líneas G-code
+Formatea columnas enteras de coordenadas y avances como texto en punto fijo
+con operaciones vectorizadas, en lugar de un f-string por línea. El resultado
+es idéntico byte a byte al de format(x, '.3f')
+"""
+
+import argparse
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Líneas por bloque en la comparación de rendimiento
+BENCHMARK_CHUNK = 65536
+
+_MINUS, _DOT, _ZERO = ord('-'), ord('.'), ord('0')
+
+class NumberColumn:
+    """Columna numérica de un bloque de líneas
+
+    values tiene un valor por línea; decimals fija los decimales (0 para
+    enteros). Si se indica present, las líneas con False omiten el número y
+    su prefijo (por ejemplo, una palabra modal que no cambia).
+    """
+
+    def __init__(self, values, decimals: int = 0, prefix: bytes = b"",
+                 present: Optional[np.ndarray] = None):
+        self.values = np.asarray(values)
+        self.decimals = decimals
+        self.prefix = prefix
+        self.present = present
+
+def fixed_point(values: np.ndarray, decimals: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Signo y magnitud entera de cada valor, redondeados como format(x, f'.{decimals}f')
+
+    El producto por 10^decimals puede caer al otro lado de un empate; esos
+    casos dudosos (muy pocos) se redondean con el formateo de Python.
+    """
+    if values.dtype.kind in "iu":
+        scaled = values.astype(np.int64) * 10 ** decimals
+        return scaled < 0, np.abs(scaled)
+
+    values = values.astype(np.float64, copy=False)
+    if not np.isfinite(values).all():
+        raise ValueError("No se pueden codificar valores no finitos")
+    # format conserva el signo de -0.0 y de los negativos que redondean a cero
+    negative = np.signbit(values)
+    scaled = np.abs(values) * 10.0 ** decimals
+    magnitude = np.rint(scaled).astype(np.int64)
+    doubtful = np.abs(scaled - np.floor(scaled) - 0.5) <= scaled * 4e-16 + 1e-9
+    doubtful |= scaled >= 2.0 ** 52
+    for i in np.flatnonzero(doubtful):
+        magnitude[i] = int(f"{abs(values[i]):.{decimals}f}".replace(".", ""))
+    return negative, magnitude
+
+def _digit_columns(chars: np.ndarray, keep: np.ndarray, start: int,
+                   values: np.ndarray, width: int, pad: bool) -> None:
+    """Escribe values en width columnas de dígitos; sin pad se omiten los ceros a la izquierda"""
+    remaining = values
+    for k in range(width - 1, -1, -1):
+        remaining, digit = np.divmod(remaining, 10)
+        chars[:, start + k] = digit
+        chars[:, start + k] += _ZERO
+        if not pad and k < width - 1:
+            keep[:, start + k] = values >= 10 ** (width - 1 - k)
+
+def _number_chars(column: NumberColumn, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Matriz de caracteres (una fila por línea) y máscara de los que se emiten"""
+    negative, magnitude = fixed_point(column.values, column.decimals)
+    scale = 10 ** column.decimals
+    whole, fraction = np.divmod(magnitude, scale)
+    width = len(str(int(whole.max()))) if count else 1
+    has_sign = bool(negative.any())
+
+    prefix = len(column.prefix)
+    sign_at = prefix
+    whole_at = sign_at + has_sign
+    dot_at = whole_at + width
+    total = dot_at + (1 + column.decimals if column.decimals else 0)
+
+    chars = np.empty((count, total), dtype=np.uint8)
+    keep = np.ones((count, total), dtype=bool)
+    if prefix:
+        chars[:, :prefix] = np.frombuffer(column.prefix, dtype=np.uint8)
+    if has_sign:
+        chars[:, sign_at] = _MINUS
+        keep[:, sign_at] = negative
+    _digit_columns(chars, keep, whole_at, whole, width, pad=False)
+    if column.decimals:
+        chars[:, dot_at] = _DOT
+        _digit_columns(chars, keep, dot_at + 1, fraction, column.decimals, pad=True)
+    if column.present is not None:
+        keep &= column.present[:, None]
+    return chars, keep
+
+def encode_lines(columns: Sequence, count: int) -> Tuple[bytes, np.ndarray]:
+    """Codifica count líneas a partir de columnas de texto fijo (bytes) o NumberColumn
+
+    Devuelve el texto (cada línea terminada en salto de línea) y la posición
+    final de cada línea dentro de él, para poder cortarlo por trazos.
+    """
+    if count == 0:
+        return b"", np.zeros(0, dtype=np.int64)
+    all_chars, all_keep = [], []
+    for column in list(columns) + [b"\n"]:
+        if isinstance(column, bytes):
+            chars = np.broadcast_to(np.frombuffer(column, dtype=np.uint8), (count, len(column)))
+            keep = np.ones((count, len(column)), dtype=bool)
+        else:
+            chars, keep = _number_chars(column, count)
+        all_chars.append(chars)
+        all_keep.append(keep)
+    chars = np.hstack(all_chars)
+    keep = np.hstack(all_keep)
+    ends = np.cumsum(keep.sum(axis=1))
+    return chars[keep].tobytes(), ends
+
+def format_lines_per_line(xy: np.ndarray, z: np.ndarray, feed: np.ndarray) -> bytes:
+    """Referencia: un f-string por línea, como lo hacía stroke_to_gcode"""
+    lines = [f"G1 X{x:.3f} Y{y:.3f} Z{z_i:.3f} F{feed_i}"
+             for (x, y), z_i, feed_i in zip(xy.tolist(), z.tolist(), feed.tolist())]
+    lines.append("")
+    return '\n'.join(lines).encode('utf-8')
+
+def format_lines_bulk(xy: np.ndarray, z: np.ndarray, feed: np.ndarray) -> bytes:
+    """Las mismas líneas codificadas en bloque"""
+    columns = [b"G1 X", NumberColumn(xy[:, 0], 3), b" Y", NumberColumn(xy[:, 1], 3),
+               b" Z", NumberColumn(z, 3), b" F", NumberColumn(feed)]
+    return encode_lines(columns, len(xy))[0]
+
+def benchmark(line_count: int, chunk: int = BENCHMARK_CHUNK, seed: int = 0) -> dict:
+    """Compara ambos métodos sobre line_count líneas de dibujo sintéticas"""
+    rng = np.random.default_rng(seed)
+    xy = np.cumsum(rng.normal(0.0, 0.5, (line_count, 2)), axis=0) + 100.0
+    z = rng.uniform(0.2, 1.0, line_count)
+    feed = rng.integers(300, 1500, line_count)
+
+    results = {}
+    outputs = {}
+    for name, formatter in (("f-string", format_lines_per_line), ("bloque", format_lines_bulk)):
+        start = time.perf_counter()
+        parts: List[bytes] = [formatter(xy[i:i + chunk], z[i:i + chunk], feed[i:i + chunk])
+                              for i in range(0, line_count, chunk)]
+        results[name] = time.perf_counter() - start
+        outputs[name] = b"".join(parts)
+    results["identical"] = outputs["f-string"] == outputs["bloque"]
+    results["bytes"] = len(outputs["bloque"])
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compara el formateo por línea con la codificación en bloque')
+    parser.add_argument('--lines', type=int, default=1_000_000, help='Líneas de dibujo (default: 1000000)')
+    parser.add_argument('--chunk', type=int, default=BENCHMARK_CHUNK,
+                        help=f'Líneas por bloque (default: {BENCHMARK_CHUNK})')
+
+    args = parser.parse_args(argv)
+    results = benchmark(args.lines, args.chunk)
+    print(f"{args.lines} líneas, {results['bytes'] / 2**20:.1f} MB")
+    print(f"f-string por línea: {results['f-string']:.2f}s")
+    print(f"Codificación en bloque: {results['bloque']:.2f}s "
+          f"({results['f-string'] / results['bloque']:.1f}x)")
+    print(f"Salida idéntica: {'sí' if results['identical'] else 'NO'}")
+    return 0 if results["identical"] else 1
+
+if __name__ == "__main__":
+    exit(main())
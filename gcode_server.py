@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Servidor local de trabajos de G-code con workers precalentados
+Evita pagar el arranque de Python y la importación de OpenCV en cada trabajo
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Límites del protocolo HTTP
+MAX_HEADER_BYTES = 16 * 1024
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Parámetros aceptados en la query string y su tipo
+JOB_PARAMS = {
+    "width": float,
+    "height": float,
+    "z_safe": float,
+    "z_base": float,
+    "z_variation": float,
+    "feed_rate": int,
+    "travel_speed": int,
+    "max_contours": int,
+    "max_points": int,
+    "resample_step": float,
+    "max_job_points": int,
+    "time_limit": float,
+}
+
+AUTO_THRESHOLD_MODES = ("median", "otsu")
+TRACE_MODES = ("outline", "centerline")
+
+# Estado global de cada proceso worker
+_worker_profiles = None
+_worker_config = None
+
+
+def _init_worker() -> None:
+    """Precalienta el proceso worker importando OpenCV y el generador"""
+    global _worker_profiles, _worker_config
+    import cv2  # noqa: F401
+    from advanced_generator import setup_drawing_profiles
+    from config_loader import load_config
+    _worker_profiles = setup_drawing_profiles()
+    _worker_config = load_config()
+
+
+def _job_choices() -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Máquinas y perfiles válidos, leídos en un worker (el proceso principal no importa OpenCV)"""
+    from machine_configs import MACHINE_CONFIGS
+    return tuple(sorted(MACHINE_CONFIGS)), tuple(sorted(_worker_profiles))
+
+
+def _ping(hold: float = 0.1) -> int:
+    """Tarea vacía usada para forzar el arranque de los workers"""
+    # Mantener ocupado al worker para que cada ping caiga en un proceso distinto
+    time.sleep(hold)
+    return os.getpid()
+
+
+def _run_job(image_bytes: bytes, suffix: str, params: Dict) -> str:
+    """Ejecuta un trabajo completo dentro de un worker y devuelve el G-code"""
+    from advanced_generator import AdvancedGCodeGenerator, apply_profile
+    from job_control import JobOptions
+
+    # El plazo cuenta desde que el worker empieza el trabajo, no desde la cola
+    options = JobOptions.with_time_limit(params["time_limit"]) if "time_limit" in params else None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, f"input{suffix}")
+        output_path = os.path.join(tmp_dir, "output.gcode")
+        with open(input_path, 'wb') as f:
+            f.write(image_bytes)
+
+        # Los mensajes del generador no deben ensuciar la salida del servidor
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator = AdvancedGCodeGenerator(
+                machine_type=params.get("machine", "grbl"),
+                canvas_width=params.get("width", 200.0),
+                canvas_height=params.get("height", 200.0),
+                z_safe=params.get("z_safe", 5.0),
+                z_draw_base=params.get("z_base", 0.2),
+                travel_speed=params.get("travel_speed", 3000)
+            )
+            apply_profile(generator, params.get("profile", "artistic"), _worker_profiles)
+            generator.configure_image_processing(_worker_config.get("image_processing", {}))
+            generator.configure_image_processing({
+                key: params[key] for key in ("auto_threshold", "trace_mode", "max_contours", "max_points",
+                                             "resample_step", "max_job_points")
+                if key in params
+            })
+
+            # Overrides explícitos sobre el perfil
+            if "z_variation" in params:
+                generator.z_variation = params["z_variation"]
+            if "feed_rate" in params:
+                generator.feed_rate = params["feed_rate"]
+
+            # Si se agota el plazo se devuelve el programa parcial (herramienta arriba)
+            generator.process_image_to_gcode(input_path, output_path, options)
+
+        with open(output_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+
+class HTTPError(Exception):
+    """Error que se traduce directamente en una respuesta HTTP"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Job:
+    """Trabajo encolado a la espera de un worker"""
+
+    def __init__(self, image_bytes: bytes, suffix: str, params: Dict):
+        self.image_bytes = image_bytes
+        self.suffix = suffix
+        self.params = params
+        self.created = time.perf_counter()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class GCodeJobServer:
+    """Servidor HTTP asyncio con cola acotada y pool de procesos precalentado"""
+
+    def __init__(self, workers: int = 2, queue_size: int = 32, latency_window: int = 1000,
+                 time_limit: Optional[float] = None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.time_limit = time_limit
+        self.queue: Optional[asyncio.Queue] = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # Máquinas y perfiles aceptados; se rellenan al arrancar los workers
+        self.machines: Tuple[str, ...] = ()
+        self.profiles: Tuple[str, ...] = ()
+        self.dispatchers = []
+
+        # Estadísticas
+        self.started_at = time.time()
+        self.active_jobs = 0
+        self.completed_jobs = 0
+        self.failed_jobs = 0
+        self.rejected_jobs = 0
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+
+    async def start(self) -> None:
+        """Arranca el pool de procesos y espera a que todos estén calientes"""
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+        # Lanzar tantas tareas vacías como workers obliga a crearlos todos
+        pids = await asyncio.gather(*[
+            loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)
+        ])
+        print(f"Workers listos: {len(set(pids))}")
+        self.machines, self.profiles = await loop.run_in_executor(self.pool, _job_choices)
+
+        self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Detiene los despachadores y el pool de procesos"""
+        for task in self.dispatchers:
+            task.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        if self.pool:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    async def _dispatch(self) -> None:
+        """Consume trabajos de la cola y los envía al pool de procesos"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            self.active_jobs += 1
+            try:
+                result = await loop.run_in_executor(
+                    self.pool, _run_job, job.image_bytes, job.suffix, job.params)
+                if not job.future.done():
+                    job.future.set_result(result)
+                self.completed_jobs += 1
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                self.failed_jobs += 1
+            finally:
+                self.latencies.append(time.perf_counter() - job.created)
+                self.active_jobs -= 1
+                self.queue.task_done()
+
+    def submit(self, image_bytes: bytes, suffix: str, params: Dict) -> Job:
+        """Encola un trabajo o lo rechaza si la cola está llena (backpressure)"""
+        job = Job(image_bytes, suffix, params)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected_jobs += 1
+            raise HTTPError(503, "Cola de trabajos llena, reintentar más tarde")
+        return job
+
+    def get_stats(self) -> Dict:
+        """Devuelve profundidad de cola, contadores y percentiles de latencia"""
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))
+            return round(latencies[index] * 1000.0, 1)
+
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": self.queue_size,
+            "active_jobs": self.active_jobs,
+            "completed_jobs": self.completed_jobs,
+            "failed_jobs": self.failed_jobs,
+            "rejected_jobs": self.rejected_jobs,
+            "latency_ms": {
+                "samples": len(latencies),
+                "p50": percentile(50),
+                "p90": percentile(90),
+                "p99": percentile(99),
+                "max": round(latencies[-1] * 1000.0, 1) if latencies else None,
+            },
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Atiende una conexión HTTP/1.1 (una petición por conexión)"""
+        try:
+            method, target, headers = await self._read_request_head(reader)
+            path, query = self._parse_target(target)
+
+            if path == "/stats":
+                if method != "GET":
+                    raise HTTPError(405, "Usar GET")
+                await self._send_json(writer, 200, self.get_stats())
+            elif path == "/health":
+                await self._send_json(writer, 200, {"status": "ok"})
+            elif path == "/jobs":
+                if method != "POST":
+                    raise HTTPError(405, "Usar POST con la imagen como cuerpo")
+                body = await self._read_body(reader, headers)
+                suffix, params = self._parse_job_params(query, headers)
+                # El límite del servidor se aplica siempre; el del cliente solo puede acortarlo
+                if self.time_limit is not None:
+                    params["time_limit"] = min(params.get("time_limit", self.time_limit), self.time_limit)
+                job = self.submit(body, suffix, params)
+                gcode = await job.future
+                await self._stream_text(writer, gcode)
+            else:
+                raise HTTPError(404, f"Ruta desconocida: {path}")
+
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"error": e.message})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            with contextlib.suppress(ConnectionError):
+                await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            with contextlib.suppress(ConnectionError):
+                writer.close()
+                await writer.wait_closed()
+
+    async def _read_request_head(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str]]:
+        """Lee la línea de petición y las cabeceras"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Cabeceras demasiado grandes")
+        if len(head) > MAX_HEADER_BYTES:
+            raise HTTPError(413, "Cabeceras demasiado grandes")
+
+        lines = head.decode('latin-1').split("\r\n")
+        parts = lines[0].split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Línea de petición inválida")
+        method, target, _ = parts
+
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return method.upper(), target, headers
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+        """Lee el cuerpo de la petición según Content-Length"""
+        if "content-length" not in headers:
+            raise HTTPError(411, "Se requiere Content-Length")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "Content-Length inválido")
+        if length <= 0:
+            raise HTTPError(400, "Cuerpo vacío: enviar la imagen")
+        if length > MAX_UPLOAD_BYTES:
+            raise HTTPError(413, "Imagen demasiado grande")
+        return await reader.readexactly(length)
+
+    @staticmethod
+    def _parse_target(target: str) -> Tuple[str, Dict[str, str]]:
+        """Separa ruta y parámetros de la URL"""
+        parsed = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        return parsed.path.rstrip("/") or "/", query
+
+    def _parse_job_params(self, query: Dict[str, str], headers: Dict[str, str]) -> Tuple[str, Dict]:
+        """Valida los parámetros de máquina y perfil del trabajo"""
+        params: Dict = {
+            "machine": query.get("machine", "grbl"),
+            "profile": query.get("profile", "artistic"),
+        }
+        # Un nombre desconocido es un error del cliente, no del worker
+        if params["machine"].lower() not in self.machines:
+            raise HTTPError(400, f"machine debe ser una de {list(self.machines)}")
+        if params["profile"] not in self.profiles:
+            raise HTTPError(400, f"profile debe ser uno de {list(self.profiles)}")
+        for name, cast in JOB_PARAMS.items():
+            if name in query:
+                try:
+                    params[name] = cast(query[name])
+                except ValueError:
+                    raise HTTPError(400, f"Valor inválido para '{name}': {query[name]}")
+                # float() acepta 'nan' e 'inf', que no tienen sentido como medida
+                if cast is float and not math.isfinite(params[name]):
+                    raise HTTPError(400, f"Valor inválido para '{name}': {query[name]}")
+        if "time_limit" in params and params["time_limit"] <= 0:
+            raise HTTPError(400, "time_limit debe ser un número de segundos mayor que 0")
+        if "auto_threshold" in query:
+            if query["auto_threshold"] not in AUTO_THRESHOLD_MODES:
+                raise HTTPError(400, f"auto_threshold debe ser uno de {AUTO_THRESHOLD_MODES}")
+            params["auto_threshold"] = query["auto_threshold"]
+        if "trace_mode" in query:
+            if query["trace_mode"] not in TRACE_MODES:
+                raise HTTPError(400, f"trace_mode debe ser uno de {TRACE_MODES}")
+            params["trace_mode"] = query["trace_mode"]
+
+        # La extensión solo orienta al decodificador de OpenCV
+        suffix = os.path.splitext(query.get("filename", ""))[1].lower()
+        if not suffix:
+            content_type = headers.get("content-type", "")
+            suffix = {"image/jpeg": ".jpg", "image/bmp": ".bmp", "image/tiff": ".tiff",
+                      "image/svg+xml": ".svg"}.get(content_type, ".png")
+        return suffix, params
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: Dict) -> None:
+        """Envía una respuesta JSON completa"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        head += "Connection: close\r\n\r\n"
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    @staticmethod
+    async def _stream_text(writer: asyncio.StreamWriter, text: str) -> None:
+        """Envía el G-code en bloques con codificación chunked"""
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/plain; charset=utf-8\r\n"
+                     b"Transfer-Encoding: chunked\r\n"
+                     b"Connection: close\r\n\r\n")
+        data = text.encode('utf-8')
+        for start in range(0, len(data), STREAM_CHUNK_SIZE):
+            chunk = data[start:start + STREAM_CHUNK_SIZE]
+            writer.write(f"{len(chunk):X}\r\n".encode('ascii') + chunk + b"\r\n")
+            # Respetar el ritmo del cliente
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(args) -> None:
+    """Arranca el servidor en TCP local o en un socket Unix"""
+    server = GCodeJobServer(workers=args.workers, queue_size=args.queue_size, time_limit=args.time_limit)
+    await server.start()
+
+    if args.unix_socket:
+        listener = await asyncio.start_unix_server(
+            server.handle_connection, path=args.unix_socket, limit=MAX_HEADER_BYTES)
+        print(f"Servidor escuchando en unix:{args.unix_socket}")
+    else:
+        listener = await asyncio.start_server(
+            server.handle_connection, host=args.host, port=args.port, limit=MAX_HEADER_BYTES)
+        print(f"Servidor escuchando en http://{args.host}:{args.port}")
+
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Servidor local de trabajos de G-code con workers precalentados',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Endpoints:
+  POST /jobs?machine=grbl&profile=artistic&width=200   (cuerpo = imagen)
+  POST /jobs?time_limit=30                              (plazo en segundos)
+  GET  /stats                                           (cola y latencias)
+  GET  /health
+
+Ejemplo:
+  curl --data-binary @dibujo.png "http://127.0.0.1:8765/jobs?machine=plotter&profile=sketch" -o dibujo.gcode
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Dirección de escucha (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto TCP (default: 8765)')
+    parser.add_argument('--unix-socket', help='Escuchar en un socket Unix en lugar de TCP')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help='Número de procesos worker (default: núcleos de CPU)')
+    parser.add_argument('--queue-size', type=int, default=32,
+                        help='Trabajos en espera antes de rechazar con 503 (default: 32)')
+    parser.add_argument('--time-limit', type=float,
+                        help='Segundos máximos por trabajo; al agotarse se devuelve el G-code parcial')
+
+    args = parser.parse_args()
+    if args.time_limit is not None and not (math.isfinite(args.time_limit) and args.time_limit > 0):
+        parser.error("--time-limit debe ser un número de segundos mayor que 0")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("Servidor detenido")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
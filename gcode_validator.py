@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+"""
+Validador de seguridad para archivos G-code
+Recorre el archivo en streaming y comprueba los límites de la sección
+'safety' de config.json y los límites del canvas
+"""
+
+import argparse
+import gzip
+import json
+import lzma
+import math
+import re
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config_loader import load_config
+
+# Códigos de letra como enteros (los bytes se indexan como int)
+_G, _X, _Y, _Z, _F = (ord(c) for c in "GXYZF")
+
+# Tokenizador de respaldo para palabras pegadas ("G1X10Y5") o minúsculas
+_WORD_RE = re.compile(rb'([A-Za-z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+_COMMENT_RE = re.compile(rb';[^\n]*|\([^)\n]*\)')
+# Códigos que no son movimientos a una coordenada (home, fijar origen): sus
+# palabras de eje pueden ir sin valor ("G28 X Y") y la línea no se valida
+_NON_MOTION_RE = re.compile(rb'^[ \t]*[Gg]0*(?:28|92)(?![\d.])[^\n]*', re.MULTILINE)
+
+# Letras que el escaneo vectorizado interpreta; el resto se trata como '#'
+_IS_WORD_LETTER = np.zeros(256, dtype=bool)
+_IS_WORD_LETTER[list(b"GXYZF")] = True
+_IS_ANY_LETTER = np.zeros(256, dtype=bool)
+_IS_ANY_LETTER[list(b"GXYZF#")] = True
+_POWERS_OF_TEN = 10.0 ** np.arange(-30, 31)
+
+def _build_translate_table() -> bytes:
+    """Minúsculas a mayúsculas; cualquier otra letra o símbolo pasa a '#'"""
+    table = bytearray(range(256))
+    for byte in range(256):
+        char = chr(byte)
+        if char in "0123456789.+- \n":
+            continue
+        if char in "\t\r":
+            table[byte] = ord(' ')
+        elif char.upper() in "GXYZF" and char.isalpha():
+            table[byte] = ord(char.upper())
+        else:
+            table[byte] = ord('#')
+    return bytes(table)
+
+_TRANSLATE_TABLE = _build_translate_table()
+
+def _parse_words(raw: bytes):
+    """Tokeniza una línea con expresión regular; devuelve None si no es válida"""
+    words = _WORD_RE.findall(raw)
+    if not words or len(b''.join(letter + value for letter, value in words)) != len(re.sub(rb'\s', b'', raw)):
+        return None
+    values = {}
+    code = None
+    for letter, value in words:
+        letter = letter.upper()
+        if letter == b'G':
+            code = float(value)
+        else:
+            values[letter] = float(value)
+    return values.get(b'X'), values.get(b'Y'), values.get(b'Z'), values.get(b'F'), code
+
+def open_gcode(gcode_path: str):
+    """Abre un archivo G-code en binario, descomprimiendo .gz y .xz"""
+    if gcode_path.endswith(".gz"):
+        return gzip.open(gcode_path, 'rb')
+    if gcode_path.endswith(".xz"):
+        return lzma.open(gcode_path, 'rb')
+    return open(gcode_path, 'rb')
+
+def count_lines(chunk: bytes) -> int:
+    """Líneas de un bloque: una por salto de línea más la última si no termina en él"""
+    if not chunk:
+        return 0
+    return chunk.count(b'\n') + (0 if chunk.endswith(b'\n') else 1)
+
+def split_lines(chunk: bytes) -> List[bytes]:
+    """Divide un bloque en líneas solo por '\n', igual que cuenta parse_columns"""
+    lines = chunk.split(b'\n')
+    if chunk.endswith(b'\n'):
+        lines.pop()
+    return lines if chunk else []
+
+def iter_gcode_chunks(gcode_path: str, chunk_size: int = 512 * 1024) -> Iterable[bytes]:
+    """Lee el archivo por bloques cortados siempre en fin de línea"""
+    with open_gcode(gcode_path) as f:
+        pending = b''
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                if pending:
+                    yield pending
+                return
+            data = pending + data
+            cut = data.rfind(b'\n') + 1
+            if cut == 0:
+                pending = data
+                continue
+            chunk, pending = data[:cut], data[cut:]
+            yield chunk
+
+def parse_columns(chunk: bytes) -> Optional[Dict[int, np.ndarray]]:
+    """Valores G, X, Y, Z y F de cada línea de un bloque (NaN si la palabra no aparece)
+
+    Los números se convierten directamente sobre los bytes con NumPy y se
+    asignan a la letra que los precede. Devuelve None si el bloque contiene
+    tokens que no siguen el formato esperado.
+    """
+    line_count = count_lines(chunk)
+    if b';' in chunk or b'(' in chunk:
+        chunk = _COMMENT_RE.sub(b'', chunk)
+    if b'28' in chunk or b'92' in chunk:
+        chunk = _NON_MOTION_RE.sub(b'', chunk)
+    data = np.frombuffer(chunk.translate(_TRANSLATE_TABLE), dtype=np.uint8)
+    if not len(data):
+        return {letter: np.full(line_count, np.nan) for letter in (_G, _X, _Y, _Z, _F)}
+
+    # Localizar los números: secuencias de dígitos, punto y signo
+    is_digit = (data >= 48) & (data <= 57)
+    is_sign = (data == 43) | (data == 45)
+    is_num = is_digit | is_sign | (data == 46)
+    prev_num = np.zeros_like(is_num)
+    prev_num[1:] = is_num[:-1]
+    token_start = is_num & ~prev_num
+    starts = np.nonzero(token_start)[0]
+
+    # Cada letra relevante debe ir seguida de un número y cada número de una letra
+    is_word = _IS_WORD_LETTER[data]
+    if is_word[-1] or (is_word[:-1] & ~is_num[1:]).any():
+        return None
+    if len(starts) and (starts[0] == 0 or not _IS_ANY_LETTER[data[starts - 1]].all()):
+        return None
+
+    # Conversión vectorizada: suma de dígitos por su potencia de diez
+    token_count = len(starts)
+    token_of = np.cumsum(token_start, dtype=np.int32) - 1
+    sign_pos = np.nonzero(is_sign)[0]
+    if not token_start[sign_pos].all():
+        return None
+    dot_pos = np.nonzero(data == 46)[0]
+    dot_tokens = token_of[dot_pos]
+    if len(dot_tokens) and np.bincount(dot_tokens).max() > 1:
+        return None
+    digit_pos = np.nonzero(is_digit)[0]
+    digit_tokens = token_of[digit_pos]
+    if token_count and np.bincount(digit_tokens, minlength=token_count).min() == 0:
+        return None
+
+    ends = np.nonzero(is_num & ~np.append(is_num[1:], False))[0] + 1
+    point = ends.copy()
+    point[dot_tokens] = dot_pos
+    token_point = point[digit_tokens]
+    exponent = token_point - digit_pos - (digit_pos < token_point)
+    if len(exponent) and (exponent.max() > 30 or exponent.min() < -30):
+        return None
+    weights = (data[digit_pos] - 48) * _POWERS_OF_TEN[exponent + 30]
+    token_values = np.bincount(digit_tokens, weights=weights, minlength=token_count).astype(np.float64)
+    token_values[data[starts] == 45] *= -1.0
+    token_letters = data[starts - 1] if token_count else data[:0]
+
+    newline_pos = np.nonzero(data == 10)[0]
+    token_line = np.searchsorted(newline_pos, starts)
+
+    columns = {}
+    for letter in (_G, _X, _Y, _Z, _F):
+        column = np.full(line_count, np.nan)
+        selected = token_letters == letter
+        column[token_line[selected]] = token_values[selected]
+        columns[letter] = column
+    return columns
+
+def parse_columns_lines(lines: Iterable[bytes]) -> Dict[int, np.ndarray]:
+    """Como parse_columns, línea a línea; las líneas con tokens inválidos quedan vacías"""
+    rows = []
+    for raw in lines:
+        raw = _COMMENT_RE.sub(b' ', raw)
+        parsed = _parse_words(raw) if raw.strip() and not _NON_MOTION_RE.match(raw) else None
+        if parsed is None:
+            rows.append((math.nan,) * 5)
+            continue
+        x, y, z, feed, code = parsed
+        rows.append(tuple(math.nan if value is None else value for value in (code, x, y, z, feed)))
+    table = np.array(rows, dtype=np.float64).reshape(-1, 5)
+    return {letter: table[:, i] for i, letter in enumerate((_G, _X, _Y, _Z, _F))}
+
+def forward_fill(column: np.ndarray, initial: float):
+    """Estado modal: cada NaN toma el último valor presente (o initial)"""
+    present = ~np.isnan(column)
+    index = np.where(present, np.arange(len(column)), -1)
+    np.maximum.accumulate(index, out=index)
+    return np.where(index >= 0, column[np.maximum(index, 0)], initial), present
+
+def motion_modes(g_column: np.ndarray, initial: int) -> np.ndarray:
+    """Modo de movimiento de cada línea: solo G0-G3 cambian el estado modal"""
+    g_column = g_column.copy()
+    g_column[~np.isin(g_column, (0.0, 1.0, 2.0, 3.0))] = np.nan
+    return forward_fill(g_column, initial)[0]
+
+def read_moves(gcode_paths, chunk_size: int = 512 * 1024):
+    """Posiciones XY, Z modal y tipo (dibujo o desplazamiento) de cada movimiento XY
+
+    Recorre uno o varios archivos (las partes de un trabajo) como un solo
+    programa. El movimiento i va del punto i-1 al punto i; el primero parte
+    del origen.
+    """
+    if isinstance(gcode_paths, str):
+        gcode_paths = [gcode_paths]
+    x = y = z = 0.0
+    motion = 0
+    blocks = [(np.zeros((1, 2)), np.zeros(1), np.zeros(1, dtype=bool))]
+    for gcode_path in gcode_paths:
+        for chunk in iter_gcode_chunks(gcode_path, chunk_size):
+            columns = parse_columns(chunk)
+            if columns is None:
+                columns = parse_columns_lines(split_lines(chunk))
+            if not len(columns[_G]):
+                continue
+            motion_column = motion_modes(columns[_G], motion)
+            xs, has_x = forward_fill(columns[_X], x)
+            ys, has_y = forward_fill(columns[_Y], y)
+            zs, _ = forward_fill(columns[_Z], z)
+            moved = has_x | has_y
+            blocks.append((np.column_stack([xs[moved], ys[moved]]), zs[moved], motion_column[moved] != 0))
+            x, y, z = float(xs[-1]), float(ys[-1]), float(zs[-1])
+            motion = int(motion_column[-1])
+    xy, zs, drawing = (np.concatenate(parts) for parts in zip(*blocks))
+    return xy, zs, drawing
+
+class _ScanState:
+    """Estado modal y acumuladores compartidos entre bloques"""
+
+    def __init__(self):
+        self.x = self.y = 0.0
+        self.motion = 0
+        self.line_no = 0
+        self.draw_length = self.travel_length = 0.0
+        self.draw_moves = self.travel_moves = 0
+        self.min_x = self.min_y = self.min_z = math.inf
+        self.max_x = self.max_y = self.max_z = -math.inf
+        self.max_feed = 0.0
+
+    def store(self, report: "ValidationReport") -> None:
+        """Vuelca el resumen acumulado en el informe"""
+        report.lines = self.line_no
+        report.draw_moves = self.draw_moves
+        report.travel_moves = self.travel_moves
+        report.draw_length = self.draw_length
+        report.travel_length = self.travel_length
+        report.min_x, report.max_x = self.min_x, self.max_x
+        report.min_y, report.max_y = self.min_y, self.max_y
+        report.min_z, report.max_z = self.min_z, self.max_z
+        report.max_feed_seen = self.max_feed
+
+class ValidationReport:
+    """Resultado de la validación: infracciones y resumen de la trayectoria"""
+
+    def __init__(self, max_reported: int = 100):
+        self.max_reported = max_reported
+        self.violations: List[Dict] = []
+        self.violation_counts: Dict[str, int] = {}
+
+        # Resumen
+        self.lines = 0
+        self.draw_moves = 0
+        self.travel_moves = 0
+        self.draw_length = 0.0
+        self.travel_length = 0.0
+        self.min_x = self.min_y = self.min_z = math.inf
+        self.max_x = self.max_y = self.max_z = -math.inf
+        self.max_feed_seen = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.violation_counts
+
+    def add_violation(self, kind: str, line_no: int, message: str) -> None:
+        """Registra una infracción (solo se guardan las primeras max_reported)"""
+        self.violation_counts[kind] = self.violation_counts.get(kind, 0) + 1
+        if len(self.violations) < self.max_reported:
+            self.violations.append({"line": line_no, "type": kind, "message": message})
+
+    def to_dict(self) -> Dict:
+        """Representación serializable en JSON"""
+        def finite(value):
+            return round(value, 3) if math.isfinite(value) else None
+
+        return {
+            "ok": self.ok,
+            "lines": self.lines,
+            "violation_counts": self.violation_counts,
+            "violations": self.violations,
+            "extents": {
+                "x": [finite(self.min_x), finite(self.max_x)],
+                "y": [finite(self.min_y), finite(self.max_y)],
+                "z": [finite(self.min_z), finite(self.max_z)],
+            },
+            "draw_moves": self.draw_moves,
+            "travel_moves": self.travel_moves,
+            "draw_length_mm": round(self.draw_length, 3),
+            "travel_length_mm": round(self.travel_length, 3),
+            "max_feed": self.max_feed_seen,
+            "elapsed_s": round(self.elapsed, 3),
+        }
+
+class GCodeValidator:
+    """Comprueba Z, avances y límites XY de un programa G-code"""
+
+    def __init__(self,
+                 max_z_safe: float = 20.0,
+                 min_z_base: float = -2.0,
+                 max_feed_rate: float = 10000,
+                 max_travel_speed: float = 15000,
+                 canvas_width: Optional[float] = 200.0,
+                 canvas_height: Optional[float] = 200.0,
+                 tolerance: float = 0.5,  # mm margen fuera del canvas (temblor)
+                 max_reported: int = 100):
+        self.max_z_safe = max_z_safe
+        self.min_z_base = min_z_base
+        self.max_feed_rate = max_feed_rate
+        self.max_travel_speed = max_travel_speed
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.tolerance = tolerance
+        self.max_reported = max_reported
+
+    @classmethod
+    def from_config(cls, config: Dict, **overrides) -> "GCodeValidator":
+        """Crea un validador a partir de las secciones 'safety' y 'default_settings'"""
+        safety = config.get("safety", {})
+        defaults = config.get("default_settings", {})
+        kwargs = {
+            "max_z_safe": safety.get("max_z_safe", 20.0),
+            "min_z_base": safety.get("min_z_base", -2.0),
+            "max_feed_rate": safety.get("max_feed_rate", 10000),
+            "max_travel_speed": safety.get("max_travel_speed", 15000),
+            "canvas_width": defaults.get("canvas_width", 200.0),
+            "canvas_height": defaults.get("canvas_height", 200.0),
+        }
+        kwargs.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**kwargs)
+
+    def validate_file(self, gcode_path: str, chunk_size: int = 512 * 1024) -> ValidationReport:
+        """Valida un archivo G-code de cualquier tamaño leyéndolo por bloques"""
+        report = ValidationReport(self.max_reported)
+        state = _ScanState()
+        start = time.perf_counter()
+
+        for chunk in iter_gcode_chunks(gcode_path, chunk_size):
+            self._scan_block(chunk, state, report)
+
+        state.store(report)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def validate_lines(self, lines: Iterable[bytes]) -> ValidationReport:
+        """Valida una secuencia de líneas en bytes"""
+        report = ValidationReport(self.max_reported)
+        state = _ScanState()
+        start = time.perf_counter()
+        self._scan_lines(lines, state, report)
+        state.store(report)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _scan_block(self, chunk: bytes, state: "_ScanState", report: ValidationReport) -> None:
+        """Valida un bloque; si tiene tokens irregulares lo divide hasta aislarlos"""
+        if self._scan_chunk(chunk, state, report):
+            return
+        if len(chunk) <= 64 * 1024:
+            # Bloque pequeño: recorrer línea a línea para localizar el problema
+            self._scan_lines(split_lines(chunk), state, report)
+            return
+        middle = chunk.find(b'\n', len(chunk) // 2) + 1
+        if middle == 0 or middle == len(chunk):
+            middle = chunk.rfind(b'\n', 0, len(chunk) // 2) + 1
+        if middle == 0:
+            self._scan_lines(split_lines(chunk), state, report)
+            return
+        self._scan_block(chunk[:middle], state, report)
+        self._scan_block(chunk[middle:], state, report)
+
+    def _scan_chunk(self, chunk: bytes, state: "_ScanState", report: ValidationReport) -> bool:
+        """Valida un bloque de líneas completas de forma vectorizada
+
+        Devuelve False si el bloque contiene tokens que no siguen el formato
+        esperado (ver parse_columns).
+        """
+        columns = parse_columns(chunk)
+        if columns is None:
+            return False
+        line_count = len(columns[_G])
+        if not line_count:
+            return True
+
+        motion = motion_modes(columns[_G], state.motion)
+        xs, has_x = forward_fill(columns[_X], state.x)
+        ys, has_y = forward_fill(columns[_Y], state.y)
+        zs = columns[_Z]
+        feeds = columns[_F]
+        line_numbers = state.line_no + 1 + np.arange(line_count)
+
+        # Avances
+        has_feed = ~np.isnan(feeds)
+        travel_feed = has_feed & (motion == 0)
+        draw_feed = has_feed & (motion != 0)
+        self._collect(report, "travel_speed", travel_feed & (feeds > self.max_travel_speed), line_numbers,
+                      lambda i: f"F{feeds[i]:g} supera max_travel_speed={self.max_travel_speed:g}")
+        self._collect(report, "feed_rate", draw_feed & (feeds > self.max_feed_rate), line_numbers,
+                      lambda i: f"F{feeds[i]:g} supera max_feed_rate={self.max_feed_rate:g}")
+        if has_feed.any():
+            state.max_feed = max(state.max_feed, float(np.nanmax(feeds)))
+
+        # Altura Z
+        has_z = ~np.isnan(zs)
+        self._collect(report, "z_max", has_z & (zs > self.max_z_safe), line_numbers,
+                      lambda i: f"Z{zs[i]:g} supera max_z_safe={self.max_z_safe:g}")
+        self._collect(report, "z_min", has_z & (zs < self.min_z_base), line_numbers,
+                      lambda i: f"Z{zs[i]:g} por debajo de min_z_base={self.min_z_base:g}")
+        if has_z.any():
+            state.min_z = min(state.min_z, float(np.nanmin(zs)))
+            state.max_z = max(state.max_z, float(np.nanmax(zs)))
+
+        # Movimientos XY
+        moved = has_x | has_y
+        if moved.any():
+            if self.canvas_width is not None and self.canvas_height is not None:
+                tol = self.tolerance
+                outside = moved & ((xs < -tol) | (xs > self.canvas_width + tol) |
+                                   (ys < -tol) | (ys > self.canvas_height + tol))
+                self._collect(report, "bounds", outside, line_numbers,
+                              lambda i: f"X{xs[i]:g} Y{ys[i]:g} fuera del canvas "
+                                        f"{self.canvas_width:g}x{self.canvas_height:g}mm")
+
+            distances = np.hypot(np.diff(xs, prepend=state.x), np.diff(ys, prepend=state.y))
+            is_travel = moved & (motion == 0)
+            is_draw = moved & (motion != 0)
+            state.travel_length += float(distances[is_travel].sum())
+            state.draw_length += float(distances[is_draw].sum())
+            state.travel_moves += int(np.count_nonzero(is_travel))
+            state.draw_moves += int(np.count_nonzero(is_draw))
+
+            moved_x, moved_y = xs[moved], ys[moved]
+            state.min_x = min(state.min_x, float(moved_x.min()))
+            state.max_x = max(state.max_x, float(moved_x.max()))
+            state.min_y = min(state.min_y, float(moved_y.min()))
+            state.max_y = max(state.max_y, float(moved_y.max()))
+
+        if line_count:
+            state.x, state.y = float(xs[-1]), float(ys[-1])
+            state.motion = int(motion[-1])
+        state.line_no += line_count
+        return True
+
+    @staticmethod
+    def _collect(report: ValidationReport, kind: str, mask: np.ndarray,
+                 line_numbers: np.ndarray, describe) -> None:
+        """Registra las infracciones marcadas en una máscara por línea"""
+        indices = np.nonzero(mask)[0]
+        if not len(indices):
+            return
+        room = max(0, report.max_reported - len(report.violations))
+        for i in indices[:room]:
+            report.add_violation(kind, int(line_numbers[i]), describe(i))
+        if len(indices) > room:
+            report.violation_counts[kind] = report.violation_counts.get(kind, 0) + len(indices) - room
+
+    def _scan_lines(self, lines: Iterable[bytes], state: "_ScanState", report: ValidationReport) -> None:
+        """Valida línea a línea; tolera palabras pegadas y minúsculas"""
+        # Variables locales para el bucle caliente
+        max_z = self.max_z_safe
+        min_z = self.min_z_base
+        max_feed = self.max_feed_rate
+        max_travel = self.max_travel_speed
+        check_xy = self.canvas_width is not None and self.canvas_height is not None
+        low_x = low_y = -self.tolerance
+        high_x = (self.canvas_width or 0.0) + self.tolerance
+        high_y = (self.canvas_height or 0.0) + self.tolerance
+        hypot = math.hypot
+        add_violation = report.add_violation
+
+        x, y, motion = state.x, state.y, state.motion
+        line_no = state.line_no
+
+        for line_no, raw in enumerate(lines, state.line_no + 1):
+            # Quitar comentarios
+            cut = raw.find(b';')
+            if cut >= 0:
+                raw = raw[:cut]
+            if b'(' in raw:
+                raw = _COMMENT_RE.sub(b' ', raw)
+            words = raw.split()
+            if not words or _NON_MOTION_RE.match(raw):
+                continue
+
+            new_x = new_y = new_z = feed = None
+            try:
+                for w in words:
+                    letter = w[0]
+                    if letter == _X:
+                        new_x = float(w[1:])
+                    elif letter == _Y:
+                        new_y = float(w[1:])
+                    elif letter == _Z:
+                        new_z = float(w[1:])
+                    elif letter == _F:
+                        feed = float(w[1:])
+                    elif letter == _G:
+                        code = float(w[1:])
+                        if code in (0, 1, 2, 3):
+                            motion = int(code)
+                    elif letter >= 97:
+                        raise ValueError(w)
+            except ValueError:
+                # Palabras pegadas ("G1X10Y5") o en minúsculas
+                parsed = _parse_words(raw)
+                if parsed is None:
+                    add_violation("parse", line_no, f"Token inválido: {raw.strip().decode('latin-1')}")
+                    continue
+                new_x, new_y, new_z, feed, code = parsed
+                if code in (0, 1, 2, 3):
+                    motion = int(code)
+
+            if feed is not None:
+                state.max_feed = max(state.max_feed, feed)
+                if motion == 0:
+                    if feed > max_travel:
+                        add_violation("travel_speed", line_no,
+                                      f"F{feed:g} supera max_travel_speed={max_travel:g}")
+                elif feed > max_feed:
+                    add_violation("feed_rate", line_no,
+                                  f"F{feed:g} supera max_feed_rate={max_feed:g}")
+
+            if new_z is not None:
+                if new_z > max_z:
+                    add_violation("z_max", line_no, f"Z{new_z:g} supera max_z_safe={max_z:g}")
+                elif new_z < min_z:
+                    add_violation("z_min", line_no, f"Z{new_z:g} por debajo de min_z_base={min_z:g}")
+                state.min_z = min(state.min_z, new_z)
+                state.max_z = max(state.max_z, new_z)
+
+            if new_x is None and new_y is None:
+                continue
+
+            target_x = x if new_x is None else new_x
+            target_y = y if new_y is None else new_y
+            if check_xy and not (low_x <= target_x <= high_x and low_y <= target_y <= high_y):
+                add_violation("bounds", line_no,
+                              f"X{target_x:g} Y{target_y:g} fuera del canvas "
+                              f"{self.canvas_width:g}x{self.canvas_height:g}mm")
+
+            distance = hypot(target_x - x, target_y - y)
+            if motion == 0:
+                state.travel_length += distance
+                state.travel_moves += 1
+            else:
+                state.draw_length += distance
+                state.draw_moves += 1
+            x, y = target_x, target_y
+
+            state.min_x = min(state.min_x, x)
+            state.max_x = max(state.max_x, x)
+            state.min_y = min(state.min_y, y)
+            state.max_y = max(state.max_y, y)
+
+        state.x, state.y, state.motion = x, y, motion
+        state.line_no = line_no
+
+def print_report(gcode_path: str, report: ValidationReport) -> None:
+    """Muestra el informe de validación en consola"""
+    summary = report.to_dict()
+    print(f"Archivo: {gcode_path}")
+    print(f"Líneas: {summary['lines']} ({summary['elapsed_s']}s)")
+    print(f"Extensión X: {summary['extents']['x']}  Y: {summary['extents']['y']}")
+    print(f"Rango Z: {summary['extents']['z']}")
+    print(f"Dibujo: {summary['draw_length_mm']}mm en {summary['draw_moves']} movimientos")
+    print(f"Desplazamiento: {summary['travel_length_mm']}mm en {summary['travel_moves']} movimientos")
+
+    if report.ok:
+        print("✓ Sin infracciones de seguridad")
+        return
+
+    total = sum(report.violation_counts.values())
+    print(f"✗ {total} infracciones: " +
+          ", ".join(f"{kind}={count}" for kind, count in report.violation_counts.items()))
+    for violation in report.violations:
+        print(f"  línea {violation['line']}: {violation['message']}")
+    if total > len(report.violations):
+        print(f"  ... ({total - len(report.violations)} más)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Valida archivos G-code contra los límites de seguridad')
+    parser.add_argument('gcode_files', nargs='+', help='Archivos G-code a validar')
+    parser.add_argument('--config', help='Archivo de configuración (default: config.json)')
+    parser.add_argument('--width', type=float, help='Ancho del canvas en mm (default: config)')
+    parser.add_argument('--height', type=float, help='Alto del canvas en mm (default: config)')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Margen permitido fuera del canvas en mm (default: 0.5)')
+    parser.add_argument('--max-reported', type=int, default=100,
+                        help='Máximo de infracciones listadas por archivo (default: 100)')
+    parser.add_argument('--json', action='store_true', help='Salida en formato JSON')
+
+    args = parser.parse_args()
+
+    validator = GCodeValidator.from_config(
+        load_config(args.config),
+        canvas_width=args.width,
+        canvas_height=args.height,
+        tolerance=args.tolerance,
+        max_reported=args.max_reported
+    )
+
+    all_ok = True
+    results = {}
+    for gcode_path in args.gcode_files:
+        try:
+            report = validator.validate_file(gcode_path)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            all_ok = False
+            continue
+        all_ok = all_ok and report.ok
+        if args.json:
+            results[gcode_path] = report.to_dict()
+        else:
+            print_report(gcode_path, report)
+            print()
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    return 0 if all_ok else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Escritura de G-code en streaming con compresión opcional y división en partes
+"""
+
+import gzip
+import lzma
+import os
+import queue
+import threading
+from typing import List, Optional
+
+# Extensión y apertura de cada formato de compresión
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "xz": ".xz"}
+
+# Tamaño de los bloques que se pasan al hilo de compresión
+FLUSH_BYTES = 256 * 1024
+
+def detect_compression(output_path: str) -> Optional[str]:
+    """Deduce la compresión a partir de la extensión del archivo"""
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if output_path.endswith(extension):
+            return compression
+    return None
+
+def _open_output(path: str, compression: Optional[str]):
+    """Abre el archivo de salida binario con la compresión indicada"""
+    if compression == "gzip":
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == "xz":
+        # Preset moderado: el nivel por defecto (6) es demasiado lento para cientos de MB
+        return lzma.open(path, 'wb', preset=3)
+    if compression is None:
+        return open(path, 'wb')
+    raise ValueError(f"Compresión no soportada: {compression}")
+
+class _BackgroundSink(threading.Thread):
+    """Hilo que comprime y escribe en disco los bloques recibidos por una cola acotada"""
+
+    def __init__(self, compression: Optional[str], queue_size: int = 16):
+        super().__init__(daemon=True, name="gcode-writer")
+        self.compression = compression
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        handle = None
+        while True:
+            command, payload = self.queue.get()
+            if self.error is not None:
+                # Tras un error solo se drena la cola hasta la orden de parada
+                if command == "stop":
+                    break
+                continue
+            try:
+                if command == "open":
+                    handle = _open_output(payload, self.compression)
+                elif command == "data":
+                    handle.write(payload)
+                elif command == "close":
+                    handle.close()
+                    handle = None
+                elif command == "stop":
+                    break
+            except BaseException as e:
+                self.error = e
+        if handle is not None:
+            handle.close()
+
+    def send(self, command: str, payload=None) -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put((command, payload))
+
+class GCodeWriter:
+    """Escritor de programas G-code por bloques
+
+    Los bloques son unidades seguras de corte (un trazo completo que empieza
+    y termina con la herramienta levantada). Con max_part_bytes o
+    max_part_seconds el programa se divide en archivos parte, cada uno con
+    su header, footer y una reanudación segura.
+    """
+
+    def __init__(self, output_path: str, header: List[str], footer: List[str],
+                 compression: Optional[str] = None,
+                 max_part_bytes: Optional[int] = None,
+                 max_part_seconds: Optional[float] = None,
+                 resume_lines: Optional[List[str]] = None):
+        if compression is None:
+            compression = detect_compression(output_path)
+        extension = COMPRESSION_EXTENSIONS.get(compression, "")
+        if extension and output_path.endswith(extension):
+            output_path = output_path[:-len(extension)]
+
+        self.output_path = output_path
+        self.extension = extension
+        self.compression = compression
+        self.header = header
+        self.footer = footer
+        self.max_part_bytes = max_part_bytes
+        self.max_part_seconds = max_part_seconds
+        self.resume_lines = resume_lines or []
+        self.split = bool(max_part_bytes or max_part_seconds)
+
+        self.paths: List[str] = []
+        self.total_lines = 0
+        self._footer_bytes = self._encoded_size(footer)
+        self._sink = _BackgroundSink(compression)
+        self._sink.start()
+        self._buffer: List[bytes] = []
+        self._buffer_bytes = 0
+        self._part_open = False
+        self._part_blocks = 0
+        self._part_bytes = 0
+        self._part_seconds = 0.0
+
+    def __enter__(self) -> "GCodeWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    @staticmethod
+    def _encoded_size(lines: List[str]) -> int:
+        return sum(len(line.encode('utf-8')) + 1 for line in lines)
+
+    @staticmethod
+    def _encode(lines: List[str]) -> bytes:
+        """Texto UTF-8 de las líneas, cada una terminada en salto de línea"""
+        return ('\n'.join(lines) + '\n').encode('utf-8') if lines else b""
+
+    def _part_path(self) -> str:
+        if not self.split:
+            return self.output_path + self.extension
+        base, ext = os.path.splitext(self.output_path)
+        return f"{base}.part{len(self.paths) + 1:03d}{ext or '.gcode'}{self.extension}"
+
+    def _emit(self, lines: List[str]) -> None:
+        """Acumula líneas y envía bloques grandes al hilo de escritura"""
+        self._emit_encoded(self._encode(lines), len(lines))
+
+    def _emit_encoded(self, data: bytes, line_count: int) -> None:
+        """Acumula texto ya codificado (líneas terminadas en salto de línea)"""
+        self._buffer.append(data)
+        self._buffer_bytes += len(data)
+        self.total_lines += line_count
+        self._part_bytes += len(data) if self.split else 0
+        if self._buffer_bytes >= FLUSH_BYTES:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._sink.send("data", b"".join(self._buffer))
+            self._buffer = []
+            self._buffer_bytes = 0
+
+    def _open_part(self) -> None:
+        path = self._part_path()
+        self.paths.append(path)
+        self._sink.send("open", path)
+        self._part_open = True
+        self._part_blocks = 0
+        self._part_bytes = 0
+        self._part_seconds = 0.0
+
+        lines = list(self.header)
+        if self.split:
+            lines.insert(0, f"; Parte {len(self.paths)} de {os.path.basename(self.output_path)}")
+            if len(self.paths) > 1:
+                lines.extend(self.resume_lines)
+        self._emit(lines)
+
+    def _close_part(self) -> None:
+        self._emit(self.footer)
+        self._flush()
+        self._sink.send("close")
+        self._part_open = False
+
+    def write_block(self, lines: List[str], seconds: float = 0.0) -> None:
+        """Escribe un bloque indivisible; abre una parte nueva si no cabe en la actual"""
+        self.write_encoded(self._encode(lines), len(lines), seconds)
+
+    def write_encoded(self, data: bytes, line_count: int, seconds: float = 0.0) -> None:
+        """Como write_block, con el bloque ya codificado (p. ej. por gcode_encoder)"""
+        if not self._part_open:
+            self._open_part()
+        elif self.split and self._part_blocks:
+            too_big = (self.max_part_bytes and
+                       self._part_bytes + len(data) + self._footer_bytes > self.max_part_bytes)
+            too_long = (self.max_part_seconds and
+                        self._part_seconds + seconds > self.max_part_seconds)
+            if too_big or too_long:
+                self._close_part()
+                self._open_part()
+
+        self._emit_encoded(data, line_count)
+        self._part_blocks += 1
+        self._part_seconds += seconds
+
+    def close(self) -> List[str]:
+        """Cierra la última parte, espera al hilo de escritura y devuelve las rutas"""
+        if self._sink.is_alive():
+            try:
+                if not self._part_open and not self.paths:
+                    self._open_part()
+                if self._part_open:
+                    self._close_part()
+            finally:
+                self._sink.queue.put(("stop", None))
+                self._sink.join()
+        if self._sink.error is not None:
+            raise self._sink.error
+        return self.paths
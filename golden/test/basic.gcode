@@ -0,0 +1,43 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 levantamientos
+; Extensión: X 38.0..162.0 Y 38.0..162.0 Z 0.28..5.00 mm
+; Duración estimada: 0m 30s
+; G-code generado para simular trazos a mano alzada
+; Dimensiones del canvas: 200.0x200.0mm
+; Altura segura: 5.0mm
+; Altura base de dibujo: 0.2mm
+; Variación Z: 0.8mm
+
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home todos los ejes
+G0 Z5.00 ; Mover a altura segura
+M3 S1000 ; Encender herramienta (ajustar según máquina)
+G4 P2 ; Pausa 2 segundos
+
+; Contorno 1
+G0 Z5.00
+G0 X95.000 Y162.000 F3000
+G1 Z0.400 F250
+G1 X75.046 Y157.025 Z0.380 F927
+G1 X51.060 Y138.013 Z0.360 F925
+G1 X40.035 Y115.998 F980
+G1 X38.045 Y94.032 Z0.340 F1090
+G1 X46.999 Y66.977 Z0.320 F1022
+G1 X62.016 Y50.996 Z0.300 F1053
+G1 X83.984 Y40.038 Z0.320 F1087
+G1 X104.967 Y37.997 Z0.300 F1032
+G1 X132.977 Y47.023 Z0.280 F1006
+G1 X150.002 Y62.980 Z0.300 F1043
+G1 X159.931 Y83.962 Z0.320 F1010
+G1 X161.959 Y104.985 Z0.360 F1070
+G1 X155.954 Y126.982 Z0.380 F1147
+G1 X137.964 Y149.005 F1070
+G1 X115.971 Y159.993 F1050
+G0 Z5.00
+
+
+; Finalización
+G0 Z5.00 ; Subir a altura segura
+G0 X0 Y0 ; Volver al origen
+M5 ; Apagar herramienta
+M30 ; Fin del programa
@@ -0,0 +1,44 @@
+; Resumen: dibujo 367 mm, desplazamiento 281 mm, 1 levantamientos
+; Extensión: X 0.0..124.0 Y 0.1..124.0 Z 0.44..5.00 mm
+; Duración estimada: 0m 33s
+; G-code generado para Grbl CNC
+; Generador de trazos a mano alzada
+; Dimensiones: 162.0x162.0mm
+
+; Configuración para Grbl CNC
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G17 ; Plano XY
+$H ; Home automático (opcional)
+G0 Z5.0 ; Altura segura
+M3 S1000 ; Encender husillo
+G4 P2 ; Pausa 2 segundos
+
+; Máquina 1 de 1 (región X100.0-200.0 Y100.0-200.0 mm): 1 trazos, estimado 0m 35s
+; Origen X0 Y0 = X38.000 Y38.000 mm del canvas completo; área 162.0x162.0 mm
+; Contorno 1
+G0 Z5.00
+G0 X57.000 Y124.000 F3000
+G1 Z0.600 F200
+G1 X37.065 Y118.997 Z0.600 F712
+G1 X13.108 Y100.011 Z0.580 F710
+G1 X2.081 Y77.990 Z0.540 F776
+G1 X0.032 Y55.974 Z0.480 F909
+G1 X8.984 Y29.032 Z0.460 F827
+G1 X23.953 Y12.965 Z0.480 F864
+G1 X45.993 Y1.939 Z0.520 F904
+G1 X67.008 Y0.053 Z0.500 F838
+G1 X94.939 Y8.883 Z0.440 F807
+G1 X111.909 Y24.960 Z0.460 F851
+G1 X121.929 Y46.019 Z0.440 F813
+G1 X124.008 Y66.992 F884
+G1 X117.977 Y88.992 Z0.500 F977
+G1 X100.039 Y110.997 Z0.580 F885
+G1 X78.069 Y122.039 Z0.620 F860
+G0 Z5.00
+
+
+G0 Z5.0 ; Subir a altura segura
+G0 X0 Y0 ; Volver al origen
+M5 ; Apagar husillo
+M30 ; Fin del programa
@@ -0,0 +1,42 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 levantamientos
+; Extensión: X 38.0..162.0 Y 38.0..162.0 Z 0.22..5.00 mm
+; Duración estimada: 1m 06s
+; G-code generado para Grbl CNC
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Grbl CNC
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G17 ; Plano XY
+$H ; Home automático (opcional)
+G0 Z5.0 ; Altura segura
+M3 S1000 ; Encender husillo
+G4 P2 ; Pausa 2 segundos
+
+; Contorno 1
+G0 Z5.00
+G0 X95.000 Y162.000 F3000
+G1 Z0.260 F100
+G1 X74.996 Y156.988 Z0.260 F398
+G1 X50.998 Y138.010 Z0.240 F392
+G1 X40.018 Y116.002 F393
+G1 X37.999 Y93.992 F393
+G1 X47.004 Y66.997 F392
+G1 X62.023 Y51.001 Z0.220 F393
+G1 X84.010 Y40.013 F394
+G1 X105.020 Y38.005 F399
+G1 X133.001 Y47.003 F405
+G1 X150.006 Y62.997 Z0.240 F408
+G1 X160.016 Y83.990 F405
+G1 X162.018 Y105.004 F403
+G1 X156.025 Y126.997 F402
+G1 X138.019 Y149.005 Z0.260 F405
+G1 X116.013 Y159.990 F405
+G0 Z5.00
+
+
+G0 Z5.0 ; Subir a altura segura
+G0 X0 Y0 ; Volver al origen
+M5 ; Apagar husillo
+M30 ; Fin del programa
@@ -0,0 +1,38 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 apagados del láser
+; Extensión: X 38.0..162.0 Y 38.1..162.0 mm
+; Duración estimada: 0m 34s
+; G-code generado para Laser Engraver
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Grabadora Láser
+; ADVERTENCIA: Usar protección ocular
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+M5 ; Láser apagado
+; Potencia del láser se controla con S (200-1000) según la presión simulada
+M4 S0 ; Potencia dinámica: el láser solo emite en movimientos G1
+
+; Contorno 1
+G0 X95.000 Y162.000 F3000
+G1 X75.065 Y156.997 S787 F712
+G1 X51.108 Y138.011 S797 F710
+G1 X40.081 Y115.990 S819 F776
+G1 X38.032 Y93.974 S851 F909
+G1 X46.984 Y67.032 S861 F827
+G1 X61.953 Y50.965 S851 F864
+G1 X83.993 Y39.939 S829 F904
+G1 X105.008 Y38.053 S840 F838
+G1 X132.939 Y46.883 S872 F807
+G1 X149.909 Y62.960 S861 F851
+G1 X159.929 Y84.019 S872 F813
+G1 X162.008 Y104.992 F884
+G1 X155.977 Y126.992 S840 F977
+G1 X138.039 Y148.997 S797 F885
+G1 X116.069 Y160.039 S776 F860
+
+
+M5 ; Apagar láser
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
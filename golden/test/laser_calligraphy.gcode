@@ -0,0 +1,38 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 apagados del láser
+; Extensión: X 38.1..162.0 Y 38.0..162.0 mm
+; Duración estimada: 0m 44s
+; G-code generado para Laser Engraver
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Grabadora Láser
+; ADVERTENCIA: Usar protección ocular
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+M5 ; Láser apagado
+; Potencia del láser se controla con S (200-1000) según la presión simulada
+M4 S0 ; Potencia dinámica: el láser solo emite en movimientos G1
+
+; Contorno 1
+G0 X95.000 Y162.000 F3000
+G1 X74.978 Y157.017 S808 F571
+G1 X51.008 Y138.018 S856 F563
+G1 X40.048 Y116.019 S904 F557
+G1 X38.057 Y94.007 S888 F558
+G1 X47.028 Y66.998 S856 F588
+G1 X62.054 Y50.982 S872 F634
+G1 X84.039 Y40.031 S904 F643
+G1 X105.002 Y37.982 F623
+G1 X133.012 Y46.955 S872 F622
+G1 X150.015 Y63.002 S856 F632
+G1 X159.983 Y84.000 F651
+G1 X161.993 Y105.016 S824 F660
+G1 X156.004 Y127.012 S792 F668
+G1 X137.967 Y148.998 S760 F608
+G1 X115.981 Y159.998 F604
+
+
+M5 ; Apagar láser
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
@@ -0,0 +1,38 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 apagados del láser
+; Extensión: X 38.0..162.0 Y 38.0..162.0 mm
+; Duración estimada: 1m 03s
+; G-code generado para Laser Engraver
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Grabadora Láser
+; ADVERTENCIA: Usar protección ocular
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+M5 ; Láser apagado
+; Potencia del láser se controla con S (200-1000) según la presión simulada
+M4 S0 ; Potencia dinámica: el láser solo emite en movimientos G1
+
+; Contorno 1
+G0 X95.000 Y162.000 F3000
+G1 X74.996 Y156.988 S760 F398
+G1 X50.998 Y138.010 S840 F392
+G1 X40.018 Y116.002 F393
+G1 X37.999 Y93.992 F393
+G1 X47.004 Y66.997 F392
+G1 X62.023 Y51.001 S920 F393
+G1 X84.010 Y40.013 F394
+G1 X105.020 Y38.005 F399
+G1 X133.001 Y47.003 F405
+G1 X150.006 Y62.997 S840 F408
+G1 X160.016 Y83.990 F405
+G1 X162.018 Y105.004 F403
+G1 X156.025 Y126.997 F402
+G1 X138.019 Y149.005 S760 F405
+G1 X116.013 Y159.990 F405
+
+
+M5 ; Apagar láser
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
@@ -0,0 +1,38 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 apagados del láser
+; Extensión: X 38.0..162.0 Y 37.9..162.0 mm
+; Duración estimada: 0m 22s
+; G-code generado para Laser Engraver
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Grabadora Láser
+; ADVERTENCIA: Usar protección ocular
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+M5 ; Láser apagado
+; Potencia del láser se controla con S (200-1000) según la presión simulada
+M4 S0 ; Potencia dinámica: el láser solo emite en movimientos G1
+
+; Contorno 1
+G0 X95.000 Y162.000 F3000
+G1 X75.026 Y156.961 S780 F1392
+G1 X51.054 Y137.966 S800 F1534
+G1 X40.090 Y116.047 S820 F1561
+G1 X38.010 Y93.999 F1621
+G1 X46.934 Y66.932 S840 F1503
+G1 X61.987 Y50.959 S880 F1639
+G1 X83.896 Y39.994 S920 F1566
+G1 X104.889 Y37.947 F1808
+G1 X133.002 Y46.967 F1559
+G1 X150.036 Y62.917 S900 F1647
+G1 X160.036 Y84.012 S860 F1573
+G1 X162.031 Y105.052 S840 F1550
+G1 X156.117 Y127.168 S800 F1693
+G1 X138.005 Y149.058 S760 F1714
+G1 X116.002 Y160.061 F1627
+
+
+M5 ; Apagar láser
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
@@ -0,0 +1,38 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 apagados del láser
+; Extensión: X 38.0..162.0 Y 38.0..162.0 mm
+; Duración estimada: 0m 26s
+; G-code generado para Laser Engraver
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Grabadora Láser
+; ADVERTENCIA: Usar protección ocular
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+M5 ; Láser apagado
+; Potencia del láser se controla con S (200-1000) según la presión simulada
+M4 S0 ; Potencia dinámica: el láser solo emite en movimientos G1
+
+; Contorno 1
+G0 X95.000 Y162.000 F3000
+G1 X74.988 Y156.992 S787 F1188
+G1 X51.023 Y138.014 F1156
+G1 X40.001 Y116.000 S840 F1162
+G1 X38.018 Y93.982 F1163
+G1 X47.045 Y67.002 S893 F1155
+G1 X62.039 Y51.010 F1158
+G1 X84.008 Y40.000 F1166
+G1 X105.013 Y37.996 F1195
+G1 X133.043 Y46.985 F1235
+G1 X150.028 Y63.017 F1253
+G1 X160.021 Y83.999 F1230
+G1 X162.001 Y104.989 S840 F1223
+G1 X155.995 Y126.986 S787 F1214
+G1 X138.026 Y149.000 F1233
+G1 X116.006 Y160.006 F1234
+
+
+M5 ; Apagar láser
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
@@ -0,0 +1,42 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 levantamientos
+; Extensión: X 38.0..162.0 Y 38.0..162.0 Z 0.24..5.00 mm
+; Duración estimada: 0m 27s
+; G-code generado para LinuxCNC
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para LinuxCNC
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G17 ; Plano XY
+G64 P0.01 ; Control de trayectoria
+G0 Z5.0 ; Altura segura
+M3 S1000 ; Encender husillo
+G4 P2 ; Pausa 2 segundos
+
+; Contorno 1
+G0 Z5.00
+G0 X95.000 Y162.000 F3000
+G1 Z0.300 F300
+G1 X74.988 Y156.992 Z0.280 F1188
+G1 X51.023 Y138.014 F1156
+G1 X40.001 Y116.000 Z0.260 F1162
+G1 X38.018 Y93.982 F1163
+G1 X47.045 Y67.002 Z0.240 F1155
+G1 X62.039 Y51.010 F1158
+G1 X84.008 Y40.000 F1166
+G1 X105.013 Y37.996 F1195
+G1 X133.043 Y46.985 F1235
+G1 X150.028 Y63.017 F1253
+G1 X160.021 Y83.999 F1230
+G1 X162.001 Y104.989 Z0.260 F1223
+G1 X155.995 Y126.986 Z0.280 F1214
+G1 X138.026 Y149.000 F1233
+G1 X116.006 Y160.006 F1234
+G0 Z5.00
+
+
+G0 Z5.0 ; Subir a altura segura
+G0 X0 Y0 ; Volver al origen
+M5 ; Apagar husillo
+M2 ; Fin del programa
@@ -0,0 +1,39 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 levantamientos
+; Extensión: X 38.0..162.0 Y 38.1..162.0 Z 0.44..5.00 mm
+; Duración estimada: 0m 36s
+; G-code generado para Pen Plotter
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Plotter de Pluma
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+G0 Z1.0 ; Levantar pluma
+; M3 = Bajar pluma, M5 = Levantar pluma
+
+; Contorno 1
+G0 Z5.00
+G0 X95.000 Y162.000 F3000
+G1 Z0.600 F200
+G1 X75.065 Y156.997 Z0.600 F712
+G1 X51.108 Y138.011 Z0.580 F710
+G1 X40.081 Y115.990 Z0.540 F776
+G1 X38.032 Y93.974 Z0.480 F909
+G1 X46.984 Y67.032 Z0.460 F827
+G1 X61.953 Y50.965 Z0.480 F864
+G1 X83.993 Y39.939 Z0.520 F904
+G1 X105.008 Y38.053 Z0.500 F838
+G1 X132.939 Y46.883 Z0.440 F807
+G1 X149.909 Y62.960 Z0.460 F851
+G1 X159.929 Y84.019 Z0.440 F813
+G1 X162.008 Y104.992 F884
+G1 X155.977 Y126.992 Z0.500 F977
+G1 X138.039 Y148.997 Z0.580 F885
+G1 X116.069 Y160.039 Z0.620 F860
+G0 Z5.00
+
+
+M5 ; Levantar pluma
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
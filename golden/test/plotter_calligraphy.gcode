@@ -0,0 +1,39 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 levantamientos
+; Extensión: X 38.1..162.0 Y 38.0..162.0 Z 0.32..5.00 mm
+; Duración estimada: 0m 46s
+; G-code generado para Pen Plotter
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Plotter de Pluma
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+G0 Z1.0 ; Levantar pluma
+; M3 = Bajar pluma, M5 = Levantar pluma
+
+; Contorno 1
+G0 Z5.00
+G0 X95.000 Y162.000 F3000
+G1 Z0.440 F150
+G1 X74.978 Y157.017 Z0.440 F571
+G1 X51.008 Y138.018 Z0.380 F563
+G1 X40.048 Y116.019 Z0.320 F557
+G1 X38.057 Y94.007 Z0.340 F558
+G1 X47.028 Y66.998 Z0.380 F588
+G1 X62.054 Y50.982 Z0.360 F634
+G1 X84.039 Y40.031 Z0.320 F643
+G1 X105.002 Y37.982 F623
+G1 X133.012 Y46.955 Z0.360 F622
+G1 X150.015 Y63.002 Z0.380 F632
+G1 X159.983 Y84.000 F651
+G1 X161.993 Y105.016 Z0.420 F660
+G1 X156.004 Y127.012 Z0.460 F668
+G1 X137.967 Y148.998 Z0.500 F608
+G1 X115.981 Y159.998 F604
+G0 Z5.00
+
+
+M5 ; Levantar pluma
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
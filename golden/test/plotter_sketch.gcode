@@ -0,0 +1,39 @@
+; Resumen: dibujo 367 mm, desplazamiento 385 mm, 1 levantamientos
+; Extensión: X 38.0..162.0 Y 37.9..162.0 Z 0.28..5.00 mm
+; Duración estimada: 0m 22s
+; G-code generado para Pen Plotter
+; Generador de trazos a mano alzada
+; Dimensiones: 200.0x200.0mm
+
+; Configuración para Plotter de Pluma
+G21 ; Unidades en milímetros
+G90 ; Posicionamiento absoluto
+G28 ; Home
+G0 Z1.0 ; Levantar pluma
+; M3 = Bajar pluma, M5 = Levantar pluma
+
+; Contorno 1
+G0 Z5.00
+G0 X95.000 Y162.000 F3000
+G1 Z0.420 F375
+G1 X75.026 Y156.961 Z0.420 F1392
+G1 X51.054 Y137.966 Z0.400 F1534
+G1 X40.090 Y116.047 Z0.380 F1561
+G1 X38.010 Y93.999 F1621
+G1 X46.934 Y66.932 Z0.360 F1503
+G1 X61.987 Y50.959 Z0.320 F1639
+G1 X83.896 Y39.994 Z0.280 F1566
+G1 X104.889 Y37.947 F1808
+G1 X133.002 Y46.967 F1559
+G1 X150.036 Y62.917 Z0.300 F1647
+G1 X160.036 Y84.012 Z0.340 F1573
+G1 X162.031 Y105.052 Z0.360 F1550
+G1 X156.117 Y127.168 Z0.400 F1693
+G1 X138.005 Y149.058 Z0.440 F1714
+G1 X116.002 Y160.061 F1627
+G0 Z5.00
+
+
+M5 ; Levantar pluma
+G0 X0 Y0 ; Volver al origen
+M30 ; Fin del programa
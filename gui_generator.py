@@ -6,9 +6,16 @@ Permite seleccionar imágenes desde el explorador de archivos y configurar pará
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import copy
 import os
 import threading
+import time
 from image_to_gcode import HandDrawnGCodeGenerator
+from job_control import CancellationToken, JobOptions
+from preview_renderer import preview_path, render_gcode_preview, render_toolpath_preview
+
+# Lado mayor de la vista previa mostrada en la ventana (px)
+PREVIEW_WINDOW_SIZE = 600
 
 class GCodeGeneratorGUI:
     def __init__(self, root):
@@ -27,6 +34,19 @@ class GCodeGeneratorGUI:
         self.z_variation = tk.DoubleVar(value=0.8)
         self.feed_rate = tk.IntVar(value=1000)
         self.travel_speed = tk.IntVar(value=3000)
+        self.progress = tk.DoubleVar(value=0.0)
+        self.progress_stage = tk.StringVar(value="")
+        self.progressive = tk.BooleanVar(value=True)
+        
+        # Generador reutilizado entre ejecuciones para aprovechar su caché
+        self.generator = None
+        self.last_outputs = []
+        # Token e hilo del trabajo en curso (None si no hay ninguno)
+        self.cancel_token = None
+        self.job_thread = None
+        # Ventana de vista previa reutilizada entre la rápida y la definitiva
+        self.preview_window = None
+        self.preview_label = None
         
         self.setup_ui()
         
@@ -105,13 +125,22 @@ class GCodeGeneratorGUI:
         ttk.Spinbox(speed_frame, from_=500, to=10000, textvariable=self.travel_speed, 
                    width=10).grid(row=0, column=3, padx=(5, 0))
         
+        ttk.Checkbutton(speed_frame, text="Vista previa progresiva (rápida y después definitiva)",
+                        variable=self.progressive).grid(row=1, column=0, columnspan=4, sticky=tk.W,
+                                                        pady=(5, 0))
+        
         # Botones de acción
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.grid(row=5, column=0, columnspan=3, pady=(20, 0))
         
-        ttk.Button(buttons_frame, text="Generar G-code", command=self.generate_gcode, 
-                  style='Accent.TButton').pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(buttons_frame, text="Salir", command=self.root.quit).pack(side=tk.LEFT)
+        self.generate_button = ttk.Button(buttons_frame, text="Generar G-code", command=self.generate_gcode,
+                                          style='Accent.TButton')
+        self.generate_button.pack(side=tk.LEFT, padx=(0, 10))
+        self.cancel_button = ttk.Button(buttons_frame, text="Cancelar", command=self.cancel_generation,
+                                        state='disabled')
+        self.cancel_button.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="Vista previa", command=self.show_preview).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="Salir", command=self.quit).pack(side=tk.LEFT)
         
         # Área de estado/log
         log_frame = ttk.LabelFrame(main_frame, text="Estado", padding="10")
@@ -128,14 +157,21 @@ class GCodeGeneratorGUI:
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
+        # Progreso de la etapa en curso
+        ttk.Progressbar(log_frame, variable=self.progress, maximum=1.0).grid(
+            row=1, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        ttk.Label(log_frame, textvariable=self.progress_stage, width=16).grid(
+            row=1, column=1, sticky=tk.W, padx=(5, 0), pady=(10, 0))
+        
         # Mensaje inicial
         self.log_message("¡Bienvenido al Generador de G-code!\nSelecciona una imagen para comenzar.")
         
     def browse_input_file(self):
         """Abrir diálogo para seleccionar archivo de imagen"""
         filetypes = [
-            ('Imágenes', '*.png *.jpg *.jpeg *.bmp *.tiff *.gif'),
+            ('Imágenes', '*.png *.jpg *.jpeg *.bmp *.tiff *.gif *.svg'),
             ('PNG', '*.png'),
+            ('SVG', '*.svg'),
             ('JPEG', '*.jpg *.jpeg'),
             ('Todos los archivos', '*.*')
         ]
@@ -174,10 +210,32 @@ class GCodeGeneratorGUI:
             self.log_message(f"Archivo de salida: {os.path.basename(filename)}")
     
     def log_message(self, message):
-        """Añadir mensaje al área de log"""
+        """Añadir mensaje al área de log (desde cualquier hilo: se aplica en el de Tk)"""
+        self.root.after(0, self.append_log, message)
+    
+    def append_log(self, message):
         self.log_text.insert(tk.END, message + "\n")
         self.log_text.see(tk.END)
-        self.root.update()
+    
+    def report_progress(self, stage, fraction):
+        """Callback de progreso del generador (llamado desde el hilo de trabajo)"""
+        self.root.after(0, self.show_progress, stage, fraction)
+    
+    def show_progress(self, stage, fraction):
+        self.progress.set(fraction)
+        self.progress_stage.set(f"{stage} {fraction:.0%}")
+    
+    def cancel_generation(self):
+        """Pide al trabajo en curso que se detenga tras el contorno actual"""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+            self.log_message("Cancelando...")
+    
+    def quit(self):
+        """Salir cancelando el trabajo en curso"""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        self.root.quit()
     
     def clear_log(self):
         """Limpiar el área de log"""
@@ -199,70 +257,179 @@ class GCodeGeneratorGUI:
         
         return True
     
-    def generate_gcode_thread(self):
-        """Ejecutar la generación de G-code en un hilo separado"""
+    def read_parameters(self):
+        """Parámetros de la GUI como atributos del generador (leídos en el hilo de la interfaz)"""
+        return {
+            "canvas_width": self.canvas_width.get(),
+            "canvas_height": self.canvas_height.get(),
+            "z_safe": self.z_safe.get(),
+            "z_draw_base": self.z_base.get(),
+            "z_variation": self.z_variation.get(),
+            "feed_rate": self.feed_rate.get(),
+            "travel_speed": self.travel_speed.get(),
+        }
+    
+    def render_quick_preview(self, input_path, output_path, params):
+        """Dibuja la trayectoria de la imagen muy reducida y devuelve el PNG y la copia usada
+        
+        Trabaja sobre una copia del generador, así que puede ejecutarse
+        mientras el trabajo anterior todavía se está deteniendo. La copia
+        guarda el SVG leído para que el trabajo completo no lo vuelva a leer.
+        """
+        start = time.perf_counter()
+        generator = copy.copy(self.generator) if self.generator is not None else HandDrawnGCodeGenerator()
+        for name, value in params.items():
+            setattr(generator, name, value)
+        paths = [generator.scale_path(path) for path in generator.preview_toolpath(input_path)]
+        png_path = render_toolpath_preview(paths, preview_path(output_path),
+                                           extent=(generator.canvas_width, generator.canvas_height),
+                                           size=PREVIEW_WINDOW_SIZE)
+        self.log_message(f"Vista previa rápida en {time.perf_counter() - start:.2f}s "
+                         f"({len(paths)} trazos); calculando la versión definitiva...")
+        return png_path, generator
+    
+    def generate_gcode_thread(self, input_path, output_path, params, progressive, token, previous):
+        """Ejecutar la generación de G-code en un hilo separado
+        
+        Con progressive se muestra antes una vista previa rápida. previous es
+        el hilo de la ejecución anterior, ya cancelada: se espera a que
+        termine antes de tocar el generador compartido.
+        """
         try:
-            # Crear el generador con los parámetros de la GUI
-            generator = HandDrawnGCodeGenerator(
-                canvas_width=self.canvas_width.get(),
-                canvas_height=self.canvas_height.get(),
-                z_safe=self.z_safe.get(),
-                z_draw_base=self.z_base.get(),
-                z_variation=self.z_variation.get(),
-                feed_rate=self.feed_rate.get(),
-                travel_speed=self.travel_speed.get()
-            )
-            
             self.log_message("Iniciando procesamiento...")
-            self.log_message(f"Imagen: {os.path.basename(self.input_file.get())}")
-            self.log_message(f"Canvas: {self.canvas_width.get()}x{self.canvas_height.get()}mm")
+            self.log_message(f"Imagen: {os.path.basename(input_path)}")
+            self.log_message(f"Canvas: {params['canvas_width']}x{params['canvas_height']}mm")
+            
+            preview_generator = None
+            if progressive:
+                png_path, preview_generator = self.render_quick_preview(input_path, output_path, params)
+                if not token.cancelled:
+                    self.root.after(0, self.display_preview, png_path,
+                                    f"Vista previa rápida - {os.path.basename(input_path)}")
+            if previous is not None:
+                previous.join()
+            if token.cancelled:
+                return
+            
+            # Actualizar el generador con los parámetros de la GUI; si solo
+            # cambian canvas, Z o velocidades no se repite el procesamiento
+            if self.generator is None:
+                self.generator = HandDrawnGCodeGenerator()
+            generator = self.generator
+            for name, value in params.items():
+                setattr(generator, name, value)
+            if preview_generator is not None:
+                generator.reuse_parsed_svg(preview_generator)
+            
             self.log_message("Procesando imagen...")
             
             # Procesar la imagen
-            generator.process_image_to_gcode(self.input_file.get(), self.output_file.get())
+            options = JobOptions(progress=self.report_progress, cancel_token=token)
+            outputs = generator.process_image_to_gcode(input_path, output_path, options)
+            
+            # Una ejecución sustituida por otra más nueva no informa ni muestra nada
+            if token is not self.cancel_token:
+                return
+            self.last_outputs = outputs
+            
+            if generator.last_stop_reason:
+                self.log_message(f"Trabajo detenido ({generator.last_stop_reason}): G-code parcial "
+                                 "con la herramienta levantada")
+                self.log_message(f"Archivo guardado: {os.path.basename(output_path)}")
+                return
             
             self.log_message("¡G-code generado exitosamente!")
-            self.log_message(f"Archivo guardado: {os.path.basename(self.output_file.get())}")
+            self.log_message(f"Archivo guardado: {os.path.basename(output_path)}")
+            
+            # La vista previa definitiva sustituye a la rápida
+            if progressive:
+                png_path = render_gcode_preview(outputs, preview_path(output_path),
+                                                extent=(params["canvas_width"], params["canvas_height"]),
+                                                size=PREVIEW_WINDOW_SIZE)
+                self.root.after(0, self.display_preview, png_path, f"Vista previa - {os.path.basename(output_path)}")
+                self.log_message("Vista previa definitiva lista")
+                return
             
             # Mostrar mensaje de éxito
-            messagebox.showinfo("Éxito", 
-                              f"G-code generado exitosamente!\n\nArchivo: {self.output_file.get()}")
+            self.root.after(0, messagebox.showinfo, "Éxito",
+                            f"G-code generado exitosamente!\n\nArchivo: {output_path}")
             
         except Exception as e:
+            if token is not self.cancel_token:
+                return
             error_msg = f"Error al generar G-code: {str(e)}"
             self.log_message(error_msg)
-            messagebox.showerror("Error", error_msg)
+            self.root.after(0, messagebox.showerror, "Error", error_msg)
         
         finally:
-            # Reactivar el botón
-            self.generate_button.configure(state='normal', text='Generar G-code')
+            self.root.after(0, self.finish_generation, token)
+    
+    def finish_generation(self, token):
+        """Solo la ejecución vigente desactiva la cancelación (en el hilo de Tk)"""
+        if token is self.cancel_token:
+            self.cancel_token = None
+            self.cancel_button.configure(state='disabled')
+    
+    def show_preview(self):
+        """Renderizar el último G-code generado y mostrarlo en una ventana"""
+        outputs = self.last_outputs
+        if not outputs and os.path.exists(self.output_file.get()):
+            outputs = [self.output_file.get()]
+        if not outputs:
+            messagebox.showerror("Error", "Genera primero el G-code")
+            return
+        
+        try:
+            png_path = render_gcode_preview(
+                outputs, preview_path(self.output_file.get()),
+                extent=(self.canvas_width.get(), self.canvas_height.get()),
+                size=PREVIEW_WINDOW_SIZE
+            )
+        except Exception as e:
+            error_msg = f"Error al generar la vista previa: {str(e)}"
+            self.log_message(error_msg)
+            messagebox.showerror("Error", error_msg)
+            return
+        
+        self.root.after(0, self.display_preview, png_path, f"Vista previa - {os.path.basename(outputs[0])}")
+        self.log_message(f"Vista previa guardada: {os.path.basename(png_path)}")
+    
+    def display_preview(self, png_path, title):
+        """Muestra el PNG en la ventana de vista previa, reemplazando la imagen anterior"""
+        if self.preview_window is None or not self.preview_window.winfo_exists():
+            self.preview_window = tk.Toplevel(self.root)
+            self.preview_label = ttk.Label(self.preview_window)
+            self.preview_label.pack()
+        self.preview_window.title(title)
+        photo = tk.PhotoImage(file=png_path)
+        self.preview_label.configure(image=photo)
+        self.preview_label.image = photo  # mantener la referencia mientras la ventana exista
     
     def generate_gcode(self):
         """Generar G-code con validación"""
         if not self.validate_inputs():
             return
         
-        # Desactivar el botón durante el procesamiento
-        self.generate_button = None
-        for widget in self.root.winfo_children():
-            if isinstance(widget, ttk.Frame):
-                for child in widget.winfo_children():
-                    if isinstance(child, ttk.Frame):
-                        for button in child.winfo_children():
-                            if isinstance(button, ttk.Button) and "Generar" in button['text']:
-                                self.generate_button = button
-                                break
-        
-        if self.generate_button:
-            self.generate_button.configure(state='disabled', text='Procesando...')
+        # Una nueva ejecución deja obsoleta la anterior: se cancela y la nueva
+        # espera a que termine antes de usar el generador
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        token = CancellationToken()
+        self.cancel_token = token
+        self.cancel_button.configure(state='normal')
+        self.progress.set(0.0)
+        self.progress_stage.set("")
         
         # Limpiar log anterior
         self.clear_log()
         
         # Ejecutar en hilo separado para no bloquear la GUI
-        thread = threading.Thread(target=self.generate_gcode_thread)
+        args = (self.input_file.get(), self.output_file.get(), self.read_parameters(),
+                self.progressive.get(), token, self.job_thread)
+        thread = threading.Thread(target=self.generate_gcode_thread, args=args)
         thread.daemon = True
         thread.start()
+        self.job_thread = thread
 
 def main():
     """Función principal"""
@@ -7,10 +7,81 @@ Procesa una imagen y genera G-code con movimientos Z variables
 import cv2
 import numpy as np
 import argparse
+import copy
 import os
 import random
 import math
-from typing import List, Tuple, Optional
+import struct
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Optional
+
+from contour_features import ContourTable
+from gcode_encoder import NumberColumn, encode_lines
+from gcode_writer import GCodeWriter
+from job_control import STAGE_IMAGE, STAGE_STROKES, STAGE_WRITE, JobOptions, JobStopped
+from job_metrics import JobMetrics, format_duration, reset_peak_rss
+from centerline import threshold_line_art, trace_skeleton, zhang_suen_thinning
+from path_resampling import resample_polyline, resolve_step, simplify_to_budget
+from stroke_noise import StrokeNoise
+from svg_input import is_svg_file, polyline_lengths, read_svg
+from z_planner import plan_pressure_z
+
+# Trazos por bloque al medir el trabajo en modo de poca memoria y al formatear la salida
+STROKE_CHUNK = 256
+
+# Lado mayor (en píxeles útiles) de la imagen reducida de la vista previa rápida
+PREVIEW_MAX_SIDE = 256
+
+# Factores de decodificación reducida que OpenCV soporta de forma nativa
+REDUCED_GRAYSCALE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+REDUCED_COLOR_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+def read_image_size(image_path: str) -> Optional[Tuple[int, int]]:
+    """Lee (ancho, alto) de la cabecera de PNG, JPEG o BMP sin decodificar la imagen"""
+    try:
+        with open(image_path, 'rb') as f:
+            head = f.read(26)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                width, height = struct.unpack('>II', head[16:24])
+                return width, height
+            if head[:2] == b'BM':
+                width, height = struct.unpack('<ii', head[18:26])
+                return width, abs(height)
+            if head[:2] == b'\xff\xd8':
+                # Recorrer los marcadores JPEG hasta el primer SOFn
+                f.seek(2)
+                while True:
+                    marker = f.read(2)
+                    if len(marker) < 2 or marker[0] != 0xFF:
+                        return None
+                    code = marker[1]
+                    if code == 0xFF:
+                        f.seek(-1, os.SEEK_CUR)
+                        continue
+                    if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+                        continue
+                    length_bytes = f.read(2)
+                    if len(length_bytes) < 2:
+                        return None
+                    length = struct.unpack('>H', length_bytes)[0]
+                    if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                        sof = f.read(5)
+                        if len(sof) < 5:
+                            return None
+                        height, width = struct.unpack('>HH', sof[1:5])
+                        return width, height
+                    f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+    return None
 
 class HandDrawnGCodeGenerator:
     def __init__(self, 
@@ -20,7 +91,8 @@ class HandDrawnGCodeGenerator:
                  z_draw_base: float = 0.2,  # mm altura base de dibujo
                  z_variation: float = 0.8,  # mm variación en Z
                  feed_rate: int = 1000,  # mm/min
-                 travel_speed: int = 3000):  # mm/min
+                 travel_speed: int = 3000,  # mm/min
+                 pen_width: float = 0.5):  # mm ancho del trazo (0 = resolución completa)
         
         self.canvas_width = canvas_width
         self.canvas_height = canvas_height
@@ -29,49 +101,334 @@ class HandDrawnGCodeGenerator:
         self.z_variation = z_variation
         self.feed_rate = feed_rate
         self.travel_speed = travel_speed
+        self.pen_width = pen_width
+        
+        # Píxeles por ancho de pluma al reducir la resolución de entrada
+        self.pixels_per_pen = 2.0
+        
+        # Procesamiento de imagen (sección image_processing de config.json)
+        self.blur_kernel = 5
+        self.canny_low = 50
+        self.canny_high = 150
+        self.min_contour_area = 50  # px²
+        self.min_contour_area_mm2 = None  # mm² del canvas (None = sin filtro)
+        self.min_contour_length_mm = None  # mm de perímetro o longitud (None = sin filtro)
+        self.contour_approximation = 0.005  # fracción del perímetro
+        self.auto_threshold = None  # None, "median" u "otsu"
+        self.low_memory = False  # liberar intermedios en cuanto se consumen
+        self.trace_mode = "outline"  # "outline" (bordes de Canny) o "centerline" (esqueleto)
+        self.min_spur_length = 5  # px - ramas sueltas más cortas se descartan (centerline)
+        self.max_contours = None  # presupuesto de contornos (pen lifts)
+        self.max_points = None  # presupuesto de puntos tras simplificar
+        self.last_canny_thresholds = (self.canny_low, self.canny_high)
+        self.svg_tolerance = 0.05  # mm - error máximo al aproximar curvas de SVG
+        
+        # Remuestreo por longitud de arco de la trayectoria en mm
+        self.resample_step = None  # mm entre puntos (None = solo vértices simplificados)
+        self.curve_densify = 2.0  # densificación extra junto a giros fuertes
+        self.max_job_points = None  # presupuesto de puntos emitidos por trabajo
+        self.last_resample_step = None
+        
+        # Salida: compresión ("gzip"/"xz") y división en partes por tamaño o duración
+        self.output_compression = None
+        self.max_part_bytes = None
+        self.max_part_seconds = None
+        self.write_metrics = False  # escribir nombre.metrics.json junto al programa
+        
+        # Caché para regenerar sin repetir el procesamiento de imagen
+        self.last_contours: Optional[List[np.ndarray]] = None
+        self.last_contour_table: Optional[ContourTable] = None
+        self.last_image_shape: Optional[Tuple[int, int]] = None
+        self.last_toolpath: Optional[List[np.ndarray]] = None  # polilíneas en el cuadrado unidad
+        self._contours_key = None
+        self._toolpath_key = None
+        self._decoded_full_resolution = False
+        self._svg_drawing = None
+        self._svg_key = None
+        self.contours_from_cache = False
         
         # Parámetros para simular trazo manual
         self.tremor_amplitude = 0.1  # mm - temblor en XY
         self.pressure_variation = 0.3  # variación de presión (afecta Z)
         self.speed_variation = 0.2  # variación de velocidad
         
-    def load_and_process_image(self, image_path: str, blur_kernel: int = 5) -> np.ndarray:
-        """Carga y procesa la imagen para extraer contornos"""
+        # Ruido coherente: frecuencia máxima de cada efecto a lo largo del trazo
+        self.tremor_frequency = 0.5  # ciclos/mm
+        self.pressure_frequency = 0.05  # ciclos/mm
+        self.speed_frequency = 0.05  # ciclos/mm
+        self.noise_exponent = 1.0  # ruido 1/f
+        self.seed = None  # None = derivada de random (respeta random.seed)
+        
+        # Planificación de Z: que los cambios de presión no frenen el movimiento XY
+        self.z_planning = True
+        self.z_smoothing = 4.0  # mm - ventana del filtro paso bajo de la presión
+        self.z_deadband = 0.02  # mm - cambios de Z menores no se emiten (segmento solo XY)
+        self.z_speed_ratio = None  # velocidad máxima de Z / de XY (None = sin límite de pendiente)
+        self.noise: Optional[StrokeNoise] = None
+        self.noise_seed: Optional[int] = None
+        self.last_metrics: Optional[JobMetrics] = None
+        self.last_stop_reason: Optional[str] = None  # motivo si el último trabajo se detuvo antes de tiempo
+        self.job_options = JobOptions()  # opciones del trabajo en curso (cancelación entre etapas)
+        self._peak_rss_reset = False  # pico de memoria reiniciado al empezar el trabajo en curso
+        
+    def configure_image_processing(self, settings: dict) -> None:
+        """Aplica la sección image_processing de config.json"""
+        if "default_blur" in settings:
+            self.blur_kernel = int(settings["default_blur"])
+        if "canny_low" in settings:
+            self.canny_low = settings["canny_low"]
+        if "canny_high" in settings:
+            self.canny_high = settings["canny_high"]
+        if "min_contour_area" in settings:
+            self.min_contour_area = settings["min_contour_area"]
+        if "min_contour_area_mm2" in settings:
+            self.min_contour_area_mm2 = settings["min_contour_area_mm2"]
+        if "min_contour_length_mm" in settings:
+            self.min_contour_length_mm = settings["min_contour_length_mm"]
+        if "contour_approximation" in settings:
+            self.contour_approximation = settings["contour_approximation"]
+        if "auto_threshold" in settings:
+            self.auto_threshold = settings["auto_threshold"]
+        if "max_contours" in settings:
+            self.max_contours = settings["max_contours"]
+        if "max_points" in settings:
+            self.max_points = settings["max_points"]
+        if "trace_mode" in settings:
+            self.trace_mode = settings["trace_mode"]
+        if "resample_step" in settings:
+            self.resample_step = settings["resample_step"]
+        if "curve_densify" in settings:
+            self.curve_densify = settings["curve_densify"]
+        if "max_job_points" in settings:
+            self.max_job_points = settings["max_job_points"]
+        if "svg_tolerance" in settings:
+            self.svg_tolerance = settings["svg_tolerance"]
+    
+    def get_useful_resolution(self) -> Optional[Tuple[int, int]]:
+        """Resolución (ancho, alto) en píxeles que el canvas y la pluma pueden reproducir"""
+        if self.pen_width <= 0:
+            return None
+        width = int(math.ceil(self.canvas_width / self.pen_width * self.pixels_per_pen))
+        height = int(math.ceil(self.canvas_height / self.pen_width * self.pixels_per_pen))
+        return max(width, 1), max(height, 1)
+    
+    def load_grayscale_image(self, image_path: str) -> np.ndarray:
+        """Carga la imagen directamente en escala de grises a la resolución útil"""
+        return self.load_image(image_path, color=False)
+    
+    def load_image(self, image_path: str, color: bool = False) -> np.ndarray:
+        """Carga la imagen (gris o BGR) reducida en la decodificación a la resolución útil"""
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"No se encontró la imagen: {image_path}")
         
-        # Cargar imagen
-        image = cv2.imread(image_path)
+        target = self.get_useful_resolution()
+        size = read_image_size(image_path) if target else None
+        
+        # Elegir el mayor factor de reducción que no baje de la resolución útil
+        flag = cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE
+        reduced_flags = REDUCED_COLOR_FLAGS if color else REDUCED_GRAYSCALE_FLAGS
+        if size:
+            scale = min(size[0] / target[0], size[1] / target[1])
+            for factor in (8, 4, 2):
+                if scale >= factor:
+                    flag = reduced_flags[factor]
+                    break
+        
+        image = cv2.imread(image_path, flag)
         if image is None:
             raise ValueError(f"No se pudo cargar la imagen: {image_path}")
         
-        # Convertir a escala de grises
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Ajuste fino por promedio de área (también cubre formatos sin cabecera conocida)
+        if target:
+            img_height, img_width = image.shape[:2]
+            scale = max(target[0] / img_width, target[1] / img_height)
+            if scale < 1.0:
+                new_size = (max(1, int(round(img_width * scale))), max(1, int(round(img_height * scale))))
+                image = cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+        
+        return image
+    
+    def load_and_process_image(self, image_path: str, blur_kernel: Optional[int] = None) -> np.ndarray:
+        """Carga y procesa la imagen para extraer contornos"""
+        # Cargar imagen en escala de grises sin pasar por color
+        gray = self.load_grayscale_image(image_path)
+        self.job_options.check()
+        
+        # Aplicar filtro gaussiano para suavizar (el kernel debe ser impar)
+        kernel_size = blur_kernel if blur_kernel is not None else self.blur_kernel
+        kernel_size = max(1, int(kernel_size)) | 1
+        # En modo de poca memoria el desenfoque reutiliza el buffer de la imagen
+        blurred = cv2.GaussianBlur(gray, (kernel_size, kernel_size), 0,
+                                   dst=gray if self.low_memory else None)
+        del gray
+        self.job_options.check()
         
-        # Aplicar filtro gaussiano para suavizar
-        blurred = cv2.GaussianBlur(gray, (blur_kernel, blur_kernel), 0)
+        # Umbrales de Canny: fijos o estimados a partir de la imagen
+        low, high = self.estimate_canny_thresholds(blurred)
+        edges = self.detect_edges(blurred, low, high)
         
-        # Detectar bordes con Canny
-        edges = cv2.Canny(blurred, 50, 150)
+        # Subir los umbrales hasta entrar en el presupuesto de contornos/puntos
+        if self.max_contours or self.max_points:
+            for _ in range(8):
+                self.job_options.check()
+                if self.fits_budget(self.find_contour_table(edges, apply_budget=False)):
+                    break
+                low, high = low * 1.3, high * 1.3
+                edges = self.detect_edges(blurred, low, high)
+        
+        self.last_canny_thresholds = (low, high)
+        return edges
+    
+    def estimate_canny_thresholds(self, blurred: np.ndarray) -> Tuple[float, float]:
+        """Calcula los umbrales de Canny según auto_threshold"""
+        if self.auto_threshold == "median":
+            # Umbrales alrededor de la mediana de intensidad
+            median = float(np.median(blurred))
+            sigma = 0.33
+            return max(0.0, (1.0 - sigma) * median), min(255.0, (1.0 + sigma) * median)
+        if self.auto_threshold == "otsu":
+            otsu, _ = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            return 0.5 * otsu, float(otsu)
+        if self.auto_threshold:
+            raise ValueError(f"Modo de umbral automático desconocido: {self.auto_threshold}")
+        return self.canny_low, self.canny_high
+    
+    def detect_edges(self, blurred: np.ndarray, low: float, high: float) -> np.ndarray:
+        """Detecta bordes con Canny y cierra huecos pequeños"""
+        edges = cv2.Canny(blurred, low, high)
         
         # Aplicar operación morfológica para conectar líneas cercanas
         kernel = np.ones((3,3), np.uint8)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+        cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel, dst=edges)
         
         return edges
     
-    def find_contours(self, edges: np.ndarray) -> List[np.ndarray]:
-        """Encuentra contornos en la imagen procesada"""
+    def simplify_contour(self, contour: np.ndarray, perimeter: Optional[float] = None) -> np.ndarray:
+        """Simplifica un contorno con approxPolyDP según contour_approximation"""
+        # Las líneas centrales son abiertas (los ciclos ya repiten su primer punto)
+        closed = self.trace_mode != "centerline"
+        if perimeter is None:
+            perimeter = cv2.arcLength(contour, closed)
+        return cv2.approxPolyDP(contour, self.contour_approximation * perimeter, closed)
+    
+    def simplify_table(self, table: ContourTable) -> Iterator[np.ndarray]:
+        """Simplifica los contornos de la tabla reutilizando su columna de perímetro"""
+        reuse = table.closed == (self.trace_mode != "centerline")
+        for i in range(len(table)):
+            yield self.simplify_contour(table.contour(i), table.perimeter[i] if reuse else None)
+    
+    def contour_scale(self, img_shape: Tuple[int, int]) -> Tuple[float, float]:
+        """mm del canvas por píxel de la imagen en X e Y"""
+        img_height, img_width = img_shape
+        return self.canvas_width / img_width, self.canvas_height / img_height
+    
+    def fits_budget(self, table: ContourTable) -> bool:
+        """Comprueba si los contornos caben en los presupuestos configurados"""
+        if self.max_contours and len(table) > self.max_contours:
+            return False
+        if self.max_points:
+            total_points = sum(len(simplified) for simplified in self.simplify_table(table))
+            if total_points > self.max_points:
+                return False
+        return True
+    
+    def find_contour_table(self, edges: np.ndarray, apply_budget: bool = True) -> ContourTable:
+        """Tabla de características de los contornos de la imagen procesada"""
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        table = ContourTable.from_contours(contours, scale=self.contour_scale(edges.shape))
         
-        # Filtrar contornos muy pequeños
-        min_area = 50
-        filtered_contours = [cnt for cnt in contours if cv2.contourArea(cnt) > min_area]
+        # Filtrar contornos muy pequeños (en px² y, si se configuran, en mm² y mm)
+        table = table.take(table.mask(self.min_contour_area, self.min_contour_area_mm2,
+                                      self.min_contour_length_mm))
         
         # Ordenar por área (más grandes primero)
-        filtered_contours.sort(key=cv2.contourArea, reverse=True)
+        table = table.order_by("area", descending=True)
+        
+        # Recortar a los presupuestos conservando los contornos más grandes
+        if apply_budget and self.max_contours:
+            table = table.take(slice(None, self.max_contours))
+        if apply_budget and self.max_points:
+            total_points = 0
+            for i, simplified in enumerate(self.simplify_table(table)):
+                total_points += len(simplified)
+                if total_points > self.max_points:
+                    table = table.take(slice(None, i))
+                    break
+        
+        return table
+    
+    def find_contours(self, edges: np.ndarray, apply_budget: bool = True) -> List[np.ndarray]:
+        """Encuentra contornos en la imagen procesada"""
+        return self.find_contour_table(edges, apply_budget).contours()
+    
+    def find_centerline_table(self, gray: np.ndarray) -> ContourTable:
+        """Tabla de características de las líneas centrales del dibujo (contornos abiertos)"""
+        # En modo de poca memoria la máscara se calcula sobre el buffer de gray
+        mask = threshold_line_art(gray, self.blur_kernel, in_place=self.low_memory)
+        self.job_options.check()
+        skeleton = zhang_suen_thinning(mask)
+        del mask
+        self.job_options.check()
+        polylines = trace_skeleton(skeleton, self.min_spur_length)
+        del skeleton
+        self.job_options.check()
+        table = ContourTable.from_contours(polylines, closed=False,
+                                           scale=self.contour_scale(gray.shape))
+        if self.min_contour_length_mm:
+            table = table.take(table.mask(min_length_mm=self.min_contour_length_mm))
         
-        return filtered_contours
+        # Más largas primero, igual que los contornos por área
+        table = table.order_by("perimeter", descending=True)
+        if self.max_contours:
+            table = table.take(slice(None, self.max_contours))
+        return table
+    
+    def find_centerlines(self, gray: np.ndarray) -> List[np.ndarray]:
+        """Líneas centrales del dibujo como contornos abiertos de OpenCV (N, 1, 2)"""
+        return self.find_centerline_table(gray).contours()
+    
+    def toolpath_length_mm(self, toolpath: List[np.ndarray]) -> float:
+        """Longitud de dibujo de una trayectoria normalizada escalada al canvas"""
+        return sum(float(np.hypot(*np.diff(self.scale_path(path), axis=0).T).sum())
+                   for path in toolpath if len(path) > 1)
+    
+    def compare_trace_modes(self, image_path: str) -> dict:
+        """Longitud de dibujo y número de trazos en modo contorno y línea central"""
+        current = self.trace_mode
+        results = {}
+        try:
+            # El modo actual al final: su trayectoria queda en caché para la emisión
+            for mode in sorted(("outline", "centerline"), key=lambda m: m == current):
+                self.trace_mode = mode
+                toolpath = self.get_toolpath(image_path)
+                results[mode] = {"length_mm": self.toolpath_length_mm(toolpath),
+                                 "strokes": len(toolpath)}
+        finally:
+            self.trace_mode = current
+        return results
+    
+    def compare_z_planning(self, image_path: str) -> dict:
+        """Velocidad efectiva de dibujo sin y con planificación de Z (mismo ruido)"""
+        paths = self.scale_toolpath(self.get_toolpath(image_path))
+        seed = self.seed if self.seed is not None else random.getrandbits(32)
+        current = self.z_planning
+        results = {}
+        try:
+            for planning in (False, True):
+                self.z_planning = planning
+                self.prepare_noise(seed)
+                metrics = self.create_job_metrics()
+                for start in range(0, len(paths), STROKE_CHUNK):
+                    metrics.add_strokes([self.compute_stroke(path) if len(path) >= 2 else None
+                                         for path in paths[start:start + STROKE_CHUNK]])
+                results["planned" if planning else "raw"] = {
+                    "speed_mm_min": metrics.effective_drawing_speed,
+                    "drawing_seconds": metrics.drawing_seconds,
+                    "z_move_fraction": metrics.z_move_fraction,
+                }
+        finally:
+            self.z_planning = current
+        return results
     
     def image_to_machine_coords(self, point: Tuple[int, int], img_shape: Tuple[int, int]) -> Tuple[float, float]:
         """Convierte coordenadas de imagen a coordenadas de máquina"""
@@ -84,80 +441,424 @@ class HandDrawnGCodeGenerator:
         
         return x_machine, y_machine
     
-    def add_hand_tremor(self, x: float, y: float) -> Tuple[float, float]:
-        """Añade temblor natural al punto"""
-        tremor_x = random.uniform(-self.tremor_amplitude, self.tremor_amplitude)
-        tremor_y = random.uniform(-self.tremor_amplitude, self.tremor_amplitude)
-        return x + tremor_x, y + tremor_y
+    def contour_to_gcode(self, contour: np.ndarray, img_shape: Tuple[int, int]) -> List[str]:
+        """Convierte un contorno a comandos G-code"""
+        # Simplificar contorno para reducir puntos
+        simplified = self.simplify_contour(contour)
+        
+        if len(simplified) < 2:
+            return []
+        
+        path = self.normalize_points(simplified.reshape(-1, 2), img_shape)
+        return self.polyline_to_gcode(self.scale_path(path))
+    
+    def prepare_noise(self, seed: Optional[int] = None) -> StrokeNoise:
+        """Precalcula las tablas de ruido del trabajo (con la misma semilla se repite el ruido)"""
+        if seed is None:
+            seed = self.seed if self.seed is not None else random.getrandbits(32)
+        self.noise_seed = seed
+        self.noise = StrokeNoise(
+            seed=seed,
+            tremor_frequency=self.tremor_frequency,
+            pressure_frequency=self.pressure_frequency,
+            speed_frequency=self.speed_frequency,
+            exponent=self.noise_exponent
+        )
+        return self.noise
     
-    def calculate_pressure_z(self, progress: float, segment_length: float) -> float:
-        """Calcula la altura Z basada en presión simulada"""
-        # Presión base
-        base_pressure = 1.0
+    def z_max_rate(self) -> Optional[float]:
+        """Velocidad máxima del eje Z en mm/min (None si no se conoce)"""
+        if not self.z_speed_ratio:
+            return None
+        return self.z_speed_ratio * self.travel_speed
+    
+    def max_z_slope(self) -> Optional[float]:
+        """dZ/mm que Z puede seguir sin frenar XY al avance de dibujo más rápido"""
+        z_rate = self.z_max_rate()
+        if z_rate is None:
+            return None
+        return z_rate / (self.feed_rate * (1.0 + self.speed_variation))
+    
+    def compute_stroke(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Calcula de forma vectorizada XY con temblor, Z de presión y avance de cada punto"""
+        if self.noise is None:
+            self.prepare_noise()
+        noise = self.noise
+        n = len(points)
         
-        # Variación por posición en el trazo (más presión al inicio y final)
-        position_factor = 1.0 + 0.3 * math.sin(progress * math.pi)
+        # Posición a lo largo del trazo en mm
+        arc = np.zeros(n)
+        if n > 1:
+            np.cumsum(np.hypot(*np.diff(points, axis=0).T), out=arc[1:])
+        offset_x, offset_y, offset_p, offset_s = noise.stroke_offsets()
         
-        # Variación aleatoria para simular inconsistencia humana
-        random_factor = 1.0 + random.uniform(-self.pressure_variation, self.pressure_variation)
+        # Temblor coherente (el primer punto es el de posicionamiento, sin temblor)
+        xy = points.astype(np.float64, copy=True)
+        xy[1:, 0] += self.tremor_amplitude * noise.tremor_x.sample(arc[1:], offset_x)
+        xy[1:, 1] += self.tremor_amplitude * noise.tremor_y.sample(arc[1:], offset_y)
         
-        # Presión total
-        total_pressure = base_pressure * position_factor * random_factor
+        # Presión: más al inicio y final del trazo, modulada por ruido
+        progress = np.arange(n) / n
+        position_factor = 1.0 + 0.3 * np.sin(progress * math.pi)
+        random_factor = 1.0 + self.pressure_variation * noise.pressure.sample(arc, offset_p)
+        total_pressure = np.minimum(position_factor * random_factor, 1.5)
+        z = self.z_draw_base + self.z_variation * (1.0 - total_pressure / 1.5)
+        if self.z_planning:
+            z = plan_pressure_z(z, arc, self.z_smoothing, self.max_z_slope(), self.z_deadband,
+                                self.z_draw_base, self.z_draw_base + self.z_variation)
         
-        # Convertir presión a altura Z (más presión = menor Z)
-        z_offset = self.z_variation * (1.0 - min(total_pressure, 1.5) / 1.5)
+        # Velocidad variable
+        variation = self.speed_variation * noise.speed.sample(arc, offset_s)
+        feed = np.maximum(100, (self.feed_rate * (1.0 + variation)).astype(np.int64))
         
-        return self.z_draw_base + z_offset
+        return xy, z, feed
     
-    def calculate_feed_rate(self, base_rate: int) -> int:
-        """Calcula velocidad variable para simular trazo manual"""
-        variation = random.uniform(-self.speed_variation, self.speed_variation)
-        return max(100, int(base_rate * (1.0 + variation)))
+    def polyline_to_gcode(self, points: np.ndarray) -> List[str]:
+        """Convierte una polilínea en mm a comandos G-code con efectos de trazo manual"""
+        if len(points) < 2:
+            return []
+        return self.stroke_to_gcode(*self.compute_stroke(points))
     
-    def contour_to_gcode(self, contour: np.ndarray, img_shape: Tuple[int, int]) -> List[str]:
-        """Convierte un contorno a comandos G-code"""
-        gcode_lines = []
+    def stroke_lead_lines(self, xy: np.ndarray, z: np.ndarray, feed: np.ndarray) -> List[str]:
+        """Líneas previas al dibujo: levantar, posicionar en el primer punto y bajar"""
+        x, y = xy[0]
+        return [
+            f"G0 Z{self.z_safe:.2f}",  # Levantar
+            f"G0 X{x:.3f} Y{y:.3f} F{self.travel_speed}",  # Posicionar
+            f"G1 Z{z[0]:.3f} F{self.feed_rate // 4}",  # Bajar para empezar a dibujar
+        ]
+    
+    def stroke_end_lines(self) -> List[str]:
+        """Líneas tras el dibujo: levantar al final del trazo"""
+        return [f"G0 Z{self.z_safe:.2f}"]
+    
+    def drawing_columns(self, xy: np.ndarray, z: np.ndarray, feed: np.ndarray,
+                        first: np.ndarray) -> list:
+        """Columnas de gcode_encoder para los movimientos de dibujo
+
+        Reciben los puntos de varios trazos concatenados (sin el punto de
+        posicionamiento); first marca el primer movimiento de cada trazo.
+        """
+        # Z es modal: se omite cuando no cambia y el segmento queda solo en XY
+        z_steps = np.rint(z * 1000.0)
+        changed = first.copy()
+        changed[1:] |= z_steps[1:] != z_steps[:-1]
+        return [b"G1 X", NumberColumn(xy[:, 0], 3), b" Y", NumberColumn(xy[:, 1], 3),
+                NumberColumn(z, 3, prefix=b" Z", present=changed), b" F", NumberColumn(feed)]
+    
+    def stroke_to_gcode(self, xy: np.ndarray, z: np.ndarray, feed: np.ndarray) -> List[str]:
+        """Formatea un trazo ya calculado (XY, Z y avance por punto) como G-code"""
+        first = np.zeros(len(xy) - 1, dtype=bool)
+        first[:1] = True
+        body, _ = encode_lines(self.drawing_columns(xy[1:], z[1:], feed[1:], first), len(xy) - 1)
+        return self.stroke_lead_lines(xy, z, feed) + body.decode('ascii').splitlines() + self.stroke_end_lines()
+    
+    def encode_stroke_blocks(self, number: int, strokes: list) -> List[Tuple[bytes, int]]:
+        """Bloques de stroke_block ya codificados, (texto, líneas), numerados desde number
+
+        Los movimientos de dibujo de todos los trazos se formatean de una vez
+        con gcode_encoder y el texto se corta por trazos; el resultado es
+        idéntico al de stroke_block.
+        """
+        valid = [stroke for stroke in strokes if stroke is not None]
+        body, ends = b"", np.zeros(0, dtype=np.int64)
+        if valid:
+            counts = np.array([len(stroke[0]) - 1 for stroke in valid])
+            first = np.zeros(int(counts.sum()), dtype=bool)
+            first[(np.cumsum(counts) - counts)[counts > 0]] = True
+            columns = self.drawing_columns(np.concatenate([stroke[0][1:] for stroke in valid]),
+                                           np.concatenate([stroke[1][1:] for stroke in valid]),
+                                           np.concatenate([stroke[2][1:] for stroke in valid]), first)
+            body, ends = encode_lines(columns, len(first))
         
-        # Simplificar contorno para reducir puntos
-        epsilon = 0.005 * cv2.arcLength(contour, True)
-        simplified = cv2.approxPolyDP(contour, epsilon, True)
+        blocks = []
+        row = 0
+        end_text = '\n'.join(self.stroke_end_lines() + [""]) + '\n'
+        end_count = len(self.stroke_end_lines()) + 1
+        for offset, stroke in enumerate(strokes):
+            comment = f"; Contorno {number + offset}"
+            if stroke is None:
+                blocks.append((f"{comment}\n\n".encode('utf-8'), 2))
+                continue
+            lead = [comment] + self.stroke_lead_lines(*stroke)
+            count = len(stroke[0]) - 1
+            start = int(ends[row - 1]) if row else 0
+            stop = int(ends[row + count - 1]) if count else start
+            row += count
+            text = ('\n'.join(lead) + '\n').encode('utf-8') + body[start:stop] + end_text.encode('utf-8')
+            blocks.append((text, len(lead) + count + end_count))
+        return blocks
+    
+    def compute_job_strokes(self, paths: List[np.ndarray],
+                            options: Optional[JobOptions] = None) -> Tuple[Iterable, List[float], JobMetrics]:
+        """Calcula los trazos del trabajo y sus métricas antes de escribir
+
+        Devuelve los trazos (None si la polilínea tiene menos de 2 puntos), la
+        duración estimada de cada uno y las métricas del trabajo. En modo de
+        poca memoria los trazos no se guardan: se miden por bloques y se
+        devuelve un generador que los recalcula con la misma semilla de ruido.
+        Si options pide parar, solo se devuelven los trazos ya calculados y el
+        motivo queda en last_stop_reason.
+        """
+        options = options or JobOptions()
+        # Un trabajo detenido durante el procesamiento de imagen llega sin trazos
+        self.last_stop_reason = options.stop_reason()
+        self.prepare_noise()
+        metrics = self.create_job_metrics()
         
-        if len(simplified) < 2:
-            return gcode_lines
-        
-        points = simplified.reshape(-1, 2)
-        
-        # Primer punto - mover sin dibujar
-        x, y = self.image_to_machine_coords((points[0][0], points[0][1]), img_shape)
-        gcode_lines.append(f"G0 Z{self.z_safe:.2f}")  # Levantar
-        gcode_lines.append(f"G0 X{x:.3f} Y{y:.3f} F{self.travel_speed}")  # Posicionar
-        
-        # Bajar para empezar a dibujar
-        z_start = self.calculate_pressure_z(0.0, len(points))
-        gcode_lines.append(f"G1 Z{z_start:.3f} F{self.feed_rate // 4}")
-        
-        # Dibujar el contorno
-        for i in range(1, len(points)):
-            progress = i / len(points)
-            
-            # Coordenadas base
-            x, y = self.image_to_machine_coords((points[i][0], points[i][1]), img_shape)
-            
-            # Añadir temblor
-            x, y = self.add_hand_tremor(x, y)
-            
-            # Calcular Z con variación de presión
-            z = self.calculate_pressure_z(progress, len(points))
-            
-            # Velocidad variable
-            feed = self.calculate_feed_rate(self.feed_rate)
-            
-            gcode_lines.append(f"G1 X{x:.3f} Y{y:.3f} Z{z:.3f} F{feed}")
-        
-        # Levantar al final del trazo
-        gcode_lines.append(f"G0 Z{self.z_safe:.2f}")
-        
-        return gcode_lines
+        if not self.low_memory:
+            strokes = []
+            for path in paths:
+                self.last_stop_reason = options.stop_reason()
+                if self.last_stop_reason:
+                    break
+                strokes.append(self.compute_stroke(path) if len(path) >= 2 else None)
+                options.report(STAGE_STROKES, len(strokes) / len(paths))
+            seconds = metrics.add_strokes(strokes)
+            metrics.finish()
+            self.last_metrics = metrics
+            return strokes, seconds, metrics
+        
+        seconds = []
+        for start in range(0, len(paths), STROKE_CHUNK):
+            chunk = []
+            for path in paths[start:start + STROKE_CHUNK]:
+                self.last_stop_reason = options.stop_reason()
+                if self.last_stop_reason:
+                    break
+                chunk.append(self.compute_stroke(path) if len(path) >= 2 else None)
+                options.report(STAGE_STROKES, (start + len(chunk)) / len(paths))
+            seconds.extend(metrics.add_strokes(chunk))
+            if self.last_stop_reason:
+                break
+        metrics.finish()
+        self.last_metrics = metrics
+        
+        self.prepare_noise(self.noise_seed)
+        strokes = (self.compute_stroke(path) if len(path) >= 2 else None for path in paths[:len(seconds)])
+        return strokes, seconds, metrics
+    
+    def create_job_metrics(self) -> JobMetrics:
+        """Métricas vacías con las alturas y velocidades del trabajo"""
+        return JobMetrics(self.z_safe, self.travel_speed, max(self.feed_rate // 4, 1),
+                          z_rate=self.z_max_rate())
+    
+    def stroke_block(self, number: int, stroke) -> List[str]:
+        """Bloque de un contorno: comentario, comandos y línea en blanco"""
+        block = [f"; Contorno {number}"]
+        if stroke is not None:
+            block.extend(self.stroke_to_gcode(*stroke))
+        block.append("")
+        return block
+    
+    def normalize_points(self, points: np.ndarray, img_shape: Tuple[int, int]) -> np.ndarray:
+        """Convierte puntos de imagen al cuadrado unidad con Y hacia arriba"""
+        img_height, img_width = img_shape
+        normalized = np.empty((len(points), 2), dtype=np.float64)
+        normalized[:, 0] = points[:, 0] / img_width
+        normalized[:, 1] = (img_height - points[:, 1]) / img_height
+        return normalized
+    
+    def scale_path(self, path: np.ndarray) -> np.ndarray:
+        """Escala una polilínea normalizada a mm del canvas"""
+        return path * (self.canvas_width, self.canvas_height)
+    
+    def scale_toolpath(self, toolpath: List[np.ndarray]) -> List[np.ndarray]:
+        """Escala la trayectoria al canvas y la remuestrea según resample_step"""
+        paths = [self.scale_path(path) for path in toolpath]
+        if not self.resample_step:
+            self.last_resample_step = None
+            return self.fit_point_budget(paths)
+        
+        # El paso se ajusta una vez por trabajo para respetar el presupuesto de puntos
+        step = resolve_step(paths, self.resample_step, self.curve_densify, self.max_job_points)
+        self.last_resample_step = step
+        if math.isinf(step):
+            return self.fit_point_budget(paths)
+        if step > self.resample_step:
+            print(f"Paso de remuestreo ampliado a {step:.2f} mm por el presupuesto de puntos")
+        return [resample_polyline(path, step, self.curve_densify) for path in paths]
+    
+    def fit_point_budget(self, paths: List[np.ndarray]) -> List[np.ndarray]:
+        """Simplifica (y si hace falta descarta los trazos más cortos) hasta max_job_points"""
+        if not self.max_job_points:
+            return paths
+        vertices = sum(len(path) for path in paths)
+        if vertices <= self.max_job_points:
+            return paths
+        fitted = simplify_to_budget(paths, self.max_job_points)
+        dropped = sum(1 for path in fitted if len(path) == 0)
+        print(f"Vértices simplificados de {vertices} a {sum(len(path) for path in fitted)} "
+              f"por el presupuesto de {self.max_job_points} puntos"
+              + (f" ({dropped} trazos cortos descartados)" if dropped else ""))
+        return fitted
+    
+    def _contours_cache_key(self, image_path: str) -> tuple:
+        """Clave de caché: archivo de entrada y parámetros del procesamiento de imagen"""
+        stat = os.stat(image_path)
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size,
+                self.pen_width, self.pixels_per_pen, self.blur_kernel,
+                self.canny_low, self.canny_high, self.auto_threshold,
+                self.min_contour_area, self.max_contours, self.max_points,
+                # Los mínimos en mm dependen del tamaño del canvas
+                self.min_contour_area_mm2, self.min_contour_length_mm,
+                (self.canvas_width, self.canvas_height)
+                if self.min_contour_area_mm2 or self.min_contour_length_mm else None,
+                self.trace_mode, self.min_spur_length, self.low_memory,
+                # El presupuesto de puntos y el modo de poca memoria dependen de la simplificación
+                self.contour_approximation if self.max_points or self.low_memory else None)
+    
+    def _cached_resolution_is_enough(self) -> bool:
+        """Indica si la imagen en caché tiene detalle suficiente para el canvas actual"""
+        if self._decoded_full_resolution:
+            return True
+        target = self.get_useful_resolution()
+        if target is None:
+            return False
+        img_height, img_width = self.last_image_shape
+        return max(target[0] / img_width, target[1] / img_height) <= 1.0 + 1e-6
+    
+    def get_contours(self, image_path: str) -> Tuple[List[np.ndarray], Tuple[int, int]]:
+        """Devuelve los contornos de la imagen, reutilizando los de la última ejecución si sirven"""
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"No se encontró la imagen: {image_path}")
+        
+        key = self._contours_cache_key(image_path)
+        if key == self._contours_key and self._cached_resolution_is_enough():
+            self.contours_from_cache = True
+            return self.last_contours, self.last_image_shape
+        self.contours_from_cache = False
+        
+        # Procesar imagen
+        if self.trace_mode == "centerline":
+            edges = self.load_grayscale_image(image_path)
+            self.job_options.check()
+            table = self.find_centerline_table(edges)
+        elif self.trace_mode == "outline":
+            edges = self.load_and_process_image(image_path)
+            table = self.find_contour_table(edges)
+            low, high = self.last_canny_thresholds
+            print(f"Umbrales Canny: {low:.0f}/{high:.0f}")
+        else:
+            raise ValueError(f"Modo de trazado desconocido: {self.trace_mode}")
+        
+        img_shape = edges.shape
+        del edges
+        self.job_options.check()
+        if self.low_memory:
+            # Solo se conservan los puntos simplificados (int32), no la cadena completa
+            contours = list(self.simplify_table(table))
+            table = None
+        else:
+            contours = table.contours()
+        
+        # La imagen no se redujo si su tamaño ya estaba por debajo de la resolución útil
+        size = read_image_size(image_path)
+        self._decoded_full_resolution = size is not None and size == (img_shape[1], img_shape[0])
+        
+        self.last_contours = contours
+        self.last_contour_table = table
+        self.last_image_shape = img_shape
+        self._contours_key = key
+        self._toolpath_key = None
+        return contours, img_shape
+    
+    def get_toolpath(self, image_path: str) -> List[np.ndarray]:
+        """Devuelve la trayectoria simplificada en el cuadrado unidad (con caché)"""
+        if is_svg_file(image_path):
+            return self.get_svg_toolpath(image_path)
+        contours, img_shape = self.get_contours(image_path)
+        
+        key = (self._contours_key, self.contour_approximation)
+        if key == self._toolpath_key:
+            return self.last_toolpath
+        
+        # En modo de poca memoria get_contours ya devuelve los contornos simplificados
+        toolpath = []
+        for simplified in contours if self.low_memory else self.simplify_table(self.last_contour_table):
+            self.job_options.check()
+            if len(simplified) >= 2:
+                toolpath.append(self.normalize_points(simplified.reshape(-1, 2), img_shape))
+        
+        self.last_toolpath = toolpath
+        self._toolpath_key = key
+        return toolpath
+    
+    def get_svg_toolpath(self, svg_path: str) -> List[np.ndarray]:
+        """Trayectoria de un SVG en el cuadrado unidad, sin rasterizar ni detectar bordes
+
+        Las curvas se aproximan con svg_tolerance mm en el canvas actual. Los
+        trazos pasan por los mismos filtros, orden (más largos primero, como
+        las líneas centrales) y presupuesto de contornos que los de una imagen.
+        """
+        if not os.path.exists(svg_path):
+            raise FileNotFoundError(f"No se encontró el SVG: {svg_path}")
+        stat = os.stat(svg_path)
+        file_key = (os.path.abspath(svg_path), stat.st_mtime_ns, stat.st_size)
+        key = (file_key, self.svg_tolerance, self.canvas_width, self.canvas_height,
+               self.max_contours, self.min_contour_length_mm)
+        self.contours_from_cache = key == self._toolpath_key
+        if self.contours_from_cache:
+            return self.last_toolpath
+        
+        # La geometría leída sirve para otro canvas o tolerancia sin volver a parsear
+        if file_key != self._svg_key:
+            self._svg_drawing = read_svg(svg_path)
+            self._svg_key = file_key
+        self.job_options.check()
+        paths = [path for path in self._svg_drawing.polylines_mm(
+                     self.canvas_width, self.canvas_height, self.svg_tolerance) if len(path) >= 2]
+        self.job_options.check()
+        
+        lengths = polyline_lengths(paths)
+        keep = np.flatnonzero(lengths >= (self.min_contour_length_mm or 0.0))
+        order = keep[np.argsort(-lengths[keep], kind="stable")]
+        if self.max_contours:
+            order = order[:self.max_contours]
+        canvas = (self.canvas_width, self.canvas_height)
+        toolpath = [paths[i] / canvas for i in order]
+        
+        self._contours_key = None
+        self.last_contours = None
+        self.last_contour_table = None
+        self.last_toolpath = toolpath
+        self._toolpath_key = key
+        return toolpath
+    
+    def preview_toolpath(self, image_path: str, max_side: int = PREVIEW_MAX_SIDE) -> List[np.ndarray]:
+        """Trayectoria aproximada de la imagen muy reducida, en una fracción de segundo
+
+        Se calcula sobre una copia del generador con la resolución útil
+        limitada a max_side píxeles en el lado mayor (una pluma equivalente más
+        gruesa), así que los contornos guardados no cambian. En un SVG se usa
+        una tolerancia de curvas igual de gruesa sobre la misma lectura del
+        archivo, que queda guardada para el trabajo completo.
+        """
+        preview = copy.copy(self)
+        preview.invalidate_cache()
+        preview.reuse_parsed_svg(self)
+        coarse = max(self.canvas_width, self.canvas_height) / max_side
+        preview.pen_width = max(self.pen_width, coarse * self.pixels_per_pen)
+        preview.svg_tolerance = max(self.svg_tolerance, coarse)
+        toolpath = preview.get_toolpath(image_path)
+        self.reuse_parsed_svg(preview)
+        return toolpath
+    
+    def reuse_parsed_svg(self, other: "HandDrawnGCodeGenerator") -> None:
+        """Toma el SVG ya leído por otro generador (la lectura no depende de la tolerancia)"""
+        if other._svg_drawing is not None and other._svg_key != self._svg_key:
+            self._svg_drawing = other._svg_drawing
+            self._svg_key = other._svg_key
+    
+    def invalidate_cache(self) -> None:
+        """Descarta los contornos y la trayectoria guardados"""
+        self._contours_key = None
+        self._toolpath_key = None
+        self._svg_key = None
+        self._svg_drawing = None
+        self.last_contours = None
+        self.last_contour_table = None
+        self.last_toolpath = None
     
     def generate_gcode_header(self) -> List[str]:
         """Genera el header del archivo G-code"""
@@ -188,36 +889,140 @@ class HandDrawnGCodeGenerator:
             "M30 ; Fin del programa"
         ]
     
-    def process_image_to_gcode(self, image_path: str, output_path: str) -> None:
-        """Procesa una imagen completa y genera el archivo G-code"""
+    def process_image_to_gcode(self, image_path: str, output_path: str,
+                               options: Optional[JobOptions] = None) -> List[str]:
+        """Procesa una imagen completa y genera el archivo G-code
+
+        options (JobOptions) recibe el progreso por etapas y permite cancelar
+        el trabajo o fijarle un plazo. Si se detiene, el archivo contiene los
+        contornos terminados y se cierra con el footer (herramienta arriba);
+        el motivo queda en last_stop_reason.
+        """
+        options = options or JobOptions()
+        # El pico de memoria del trabajo incluye el procesamiento de imagen
+        self._peak_rss_reset = reset_peak_rss()
         print(f"Procesando imagen: {image_path}")
         
-        # Procesar imagen
-        edges = self.load_and_process_image(image_path)
-        img_shape = edges.shape
-        
-        # Encontrar contornos
-        contours = self.find_contours(edges)
-        print(f"Encontrados {len(contours)} contornos")
+        # Contornos y trayectoria normalizada (reutilizados si solo cambió la emisión);
+        # si se pide parar entre etapas se escribe un programa sin trazos
+        options.report(STAGE_IMAGE, 0.0)
+        self.job_options = options
+        try:
+            toolpath = self.get_toolpath(image_path)
+        except JobStopped as stopped:
+            print(f"Procesamiento de imagen detenido ({stopped.reason})")
+            toolpath = []
+        else:
+            if self.contours_from_cache:
+                print("Reutilizando contornos de la ejecución anterior")
+            if is_svg_file(image_path):
+                print(f"Leídos {len(toolpath)} trazos vectoriales")
+            else:
+                print(f"Encontrados {len(self.last_contours)} contornos")
+            options.report(STAGE_IMAGE, 1.0)
+        finally:
+            self.job_options = JobOptions()
         
-        # Generar G-code
-        gcode_lines = []
-        gcode_lines.extend(self.generate_gcode_header())
+        return self.write_toolpath_gcode(toolpath, output_path, options)
+    
+    def generate_resume_lines(self) -> List[str]:
+        """Líneas para reanudar con seguridad al inicio de una parte"""
+        return [f"G0 Z{self.z_safe:.2f} ; Reanudación: herramienta arriba antes de reposicionar"]
+    
+    def generate_tool_change_lines(self, pen_number: int, color: str) -> List[str]:
+        """Pausa para cambiar de pluma con la herramienta levantada"""
+        return [
+            f"; Pluma {pen_number}: {color}",
+            f"G0 Z{self.z_safe:.2f} ; Herramienta arriba para el cambio",
+            f"M0 ; Pausa: colocar la pluma {pen_number} ({color})",
+        ]
+    
+    def write_toolpath_gcode(self, toolpath: List[np.ndarray], output_path: str,
+                             options: Optional[JobOptions] = None) -> List[str]:
+        """Escala una trayectoria normalizada al canvas y escribe el G-code en streaming"""
+        return self.write_layers_gcode([([], toolpath)], output_path, options)
+    
+    def write_layers_gcode(self, layers: List[Tuple[List[str], List[np.ndarray]]],
+                           output_path: str, options: Optional[JobOptions] = None) -> List[str]:
+        """Escribe varias capas (líneas de cambio de herramienta, trayectoria) en un programa"""
+        options = options or JobOptions()
+        peak_rss_tracked = self._peak_rss_reset or reset_peak_rss()
+        self._peak_rss_reset = False
+        # El remuestreo y su presupuesto se resuelven sobre el trabajo completo
+        scaled_paths = self.scale_toolpath([path for _, toolpath in layers for path in toolpath])
         
-        for i, contour in enumerate(contours):
-            gcode_lines.append(f"; Contorno {i+1}")
-            contour_gcode = self.contour_to_gcode(contour, img_shape)
-            gcode_lines.extend(contour_gcode)
-            gcode_lines.append("")
+        # Los trazos se calculan antes de escribir para poner el resumen en el header;
+        # si el trabajo se detiene, solo se escriben los ya calculados
+        strokes, seconds, metrics = self.compute_job_strokes(scaled_paths, options)
+        metrics.peak_rss_tracked = peak_rss_tracked
         
-        gcode_lines.extend(self.generate_gcode_footer())
+        writer = GCodeWriter(
+            output_path,
+            header=metrics.summary_lines() + self.generate_gcode_header(),
+            footer=self.generate_gcode_footer(),
+            compression=self.output_compression,
+            max_part_bytes=self.max_part_bytes,
+            max_part_seconds=self.max_part_seconds,
+            resume_lines=self.generate_resume_lines()
+        )
         
-        # Guardar archivo
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(gcode_lines))
+        contour = 0
+        written = len(seconds)
+        stroke_iter = iter(strokes)
+        with writer:
+            for change_lines, toolpath in layers:
+                if contour == written and self.last_stop_reason:
+                    break
+                if change_lines:
+                    writer.write_block(change_lines)
+                # Los trazos se formatean en bloque, STROKE_CHUNK cada vez
+                for start in range(0, len(toolpath), STROKE_CHUNK):
+                    # En modo de poca memoria los trazos se recalculan aquí: también se puede parar
+                    if not self.last_stop_reason:
+                        self.last_stop_reason = options.stop_reason()
+                        if self.last_stop_reason:
+                            written = contour
+                            break
+                    chunk = list(islice(stroke_iter, min(STROKE_CHUNK, len(toolpath) - start)))
+                    for text, line_count in self.encode_stroke_blocks(contour + 1, chunk):
+                        writer.write_encoded(text, line_count, seconds[contour])
+                        contour += 1
+                    options.report(STAGE_WRITE, contour / max(len(seconds), 1))
+            if self.last_stop_reason:
+                # El último bloque terminó con la herramienta arriba; el footer cierra el programa
+                writer.write_block([f"; Trabajo detenido ({self.last_stop_reason}): "
+                                    f"{contour} de {len(scaled_paths)} contornos"])
         
-        print(f"G-code generado: {output_path}")
-        print(f"Total de líneas: {len(gcode_lines)}")
+        if self.last_stop_reason:
+            print(f"Trabajo detenido ({self.last_stop_reason}) tras {contour} de {len(scaled_paths)} contornos")
+        for path in writer.paths:
+            print(f"G-code generado: {path}")
+        print(f"Total de líneas: {writer.total_lines}")
+        if self.write_metrics:
+            print(f"Métricas: {metrics.write_sidecar(output_path, writer.paths)}")
+        if metrics.peak_rss_bytes:
+            print(f"Memoria pico del trabajo: {metrics.peak_rss_bytes / 2**20:.0f} MB")
+        elif metrics.process_peak_rss_bytes:
+            print(f"Memoria pico del proceso: {metrics.process_peak_rss_bytes / 2**20:.0f} MB")
+        return writer.paths
+
+def print_trace_comparison(results: dict) -> None:
+    """Muestra la longitud de dibujo de cada modo de trazado"""
+    outline, centerline = results["outline"], results["centerline"]
+    print(f"Contornos:      {outline['length_mm']:.0f} mm en {outline['strokes']} trazos")
+    print(f"Línea central:  {centerline['length_mm']:.0f} mm en {centerline['strokes']} trazos")
+    if outline["length_mm"] > 0:
+        print(f"Longitud de dibujo: {centerline['length_mm'] / outline['length_mm']:.0%} del modo contorno")
+
+def print_z_comparison(results: dict) -> None:
+    """Muestra la velocidad efectiva de dibujo sin y con planificación de Z"""
+    raw, planned = results["raw"], results["planned"]
+    print(f"Sin planificar Z:  {raw['speed_mm_min']:.0f} mm/min efectivos, "
+          f"{raw['z_move_fraction']:.0%} de segmentos con Z, dibujo {format_duration(raw['drawing_seconds'])}")
+    print(f"Con planificación: {planned['speed_mm_min']:.0f} mm/min efectivos, "
+          f"{planned['z_move_fraction']:.0%} de segmentos con Z, dibujo {format_duration(planned['drawing_seconds'])}")
+    if raw["speed_mm_min"] > 0:
+        print(f"Velocidad efectiva: {planned['speed_mm_min'] / raw['speed_mm_min']:.2f}x")
 
 def main():
     parser = argparse.ArgumentParser(description='Genera G-code con trazos a mano alzada desde una imagen')
@@ -230,6 +1035,22 @@ def main():
     parser.add_argument('--z-variation', type=float, default=0.8, help='Variación máxima en Z en mm (default: 0.8)')
     parser.add_argument('--feed-rate', type=int, default=1000, help='Velocidad de dibujo en mm/min (default: 1000)')
     parser.add_argument('--travel-speed', type=int, default=3000, help='Velocidad de desplazamiento en mm/min (default: 3000)')
+    parser.add_argument('--pen-width', type=float, default=0.5, help='Ancho del trazo en mm para reducir la resolución de entrada, 0 = completa (default: 0.5)')
+    parser.add_argument('--auto-threshold', choices=['median', 'otsu'], help='Calcular los umbrales de Canny a partir de la imagen')
+    parser.add_argument('--centerline', action='store_true', help='Trazar la línea central de cada trazo (dibujos de línea) en lugar de sus bordes')
+    parser.add_argument('--max-contours', type=int, help='Presupuesto máximo de contornos (levantamientos de pluma)')
+    parser.add_argument('--max-points', type=int, help='Presupuesto máximo de puntos de trayectoria')
+    parser.add_argument('--resample-step', type=float, help='Remuestrear los trazos con un punto cada N mm')
+    parser.add_argument('--max-job-points', type=int, help='Presupuesto máximo de puntos emitidos (amplía el paso de remuestreo)')
+    parser.add_argument('--low-memory', action='store_true', help='Liberar las imágenes y trazos intermedios en cuanto se consumen')
+    parser.add_argument('--compress', choices=['gzip', 'xz'], help='Comprimir la salida (también se deduce de .gz/.xz)')
+    parser.add_argument('--max-part-mb', type=float, help='Dividir la salida en partes de como máximo N MB')
+    parser.add_argument('--max-part-minutes', type=float, help='Dividir la salida en partes de como máximo N minutos estimados')
+    parser.add_argument('--preview', action='store_true', help='Guardar una vista previa PNG del G-code (nombre.preview.png)')
+    parser.add_argument('--metrics', action='store_true', help='Guardar las métricas del trabajo (nombre.metrics.json)')
+    parser.add_argument('--z-speed-ratio', type=float, help='Velocidad máxima de Z respecto a XY; limita dZ/mm para no frenar XY')
+    parser.add_argument('--no-z-planning', action='store_true', help='Emitir la presión sin suavizar ni agrupar cambios de Z')
+    parser.add_argument('--compare-z', action='store_true', help='Medir la velocidad efectiva de dibujo sin y con planificación de Z')
     
     args = parser.parse_args()
     
@@ -246,11 +1067,37 @@ def main():
         z_draw_base=args.z_base,
         z_variation=args.z_variation,
         feed_rate=args.feed_rate,
-        travel_speed=args.travel_speed
+        travel_speed=args.travel_speed,
+        pen_width=args.pen_width
     )
+    generator.auto_threshold = args.auto_threshold
+    if args.centerline:
+        generator.trace_mode = "centerline"
+    generator.max_contours = args.max_contours
+    generator.max_points = args.max_points
+    generator.resample_step = args.resample_step
+    generator.low_memory = args.low_memory
+    generator.max_job_points = args.max_job_points
+    generator.output_compression = args.compress
+    generator.write_metrics = args.metrics
+    if args.max_part_mb:
+        generator.max_part_bytes = int(args.max_part_mb * 1024 * 1024)
+    if args.max_part_minutes:
+        generator.max_part_seconds = args.max_part_minutes * 60.0
+    generator.z_speed_ratio = args.z_speed_ratio
+    generator.z_planning = not args.no_z_planning
     
     try:
-        generator.process_image_to_gcode(args.input_image, args.output)
+        if args.centerline:
+            print_trace_comparison(generator.compare_trace_modes(args.input_image))
+        if args.compare_z:
+            print_z_comparison(generator.compare_z_planning(args.input_image))
+        output_paths = generator.process_image_to_gcode(args.input_image, args.output)
+        if args.preview:
+            from preview_renderer import preview_path, render_gcode_preview
+            preview = render_gcode_preview(output_paths, preview_path(args.output),
+                                           extent=(args.width, args.height))
+            print(f"Vista previa: {preview}")
         print("¡Proceso completado exitosamente!")
     except Exception as e:
         print(f"Error: {e}")
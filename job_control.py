@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Progreso y cancelación cooperativa de trabajos
+El generador informa de su avance por etapas con un callback limitado en
+frecuencia y comprueba si debe detenerse (token de cancelación o plazo)
+entre las etapas del procesamiento de imagen y entre contornos. Una llamada
+de OpenCV ya empezada no se interrumpe. Al detenerse el programa se cierra
+con su footer, así que el archivo parcial es válido y termina con la
+herramienta levantada
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+# Etapas de un trabajo, en orden
+STAGE_IMAGE = "imagen"
+STAGE_STROKES = "trazos"
+STAGE_WRITE = "escritura"
+
+# Motivos de parada
+STOP_CANCELLED = "cancelado"
+STOP_DEADLINE = "plazo agotado"
+
+ProgressCallback = Callable[[str, float], None]
+
+class JobStopped(Exception):
+    """Se pidió detener el trabajo entre dos etapas del procesamiento de imagen"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class CancellationToken:
+    """Señal de cancelación que otro hilo puede activar en cualquier momento"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+class JobOptions:
+    """Opciones de ejecución de un trabajo del generador
+
+    progress recibe (etapa, fracción de 0 a 1). Dentro de una etapa se llama
+    como mucho cada progress_interval segundos, más el inicio y el final, así
+    que informar no frena el bucle de trazos. deadline es un instante de
+    time.monotonic() a partir del cual el trabajo se detiene entre contornos.
+    """
+
+    def __init__(self, progress: Optional[ProgressCallback] = None,
+                 cancel_token: Optional[CancellationToken] = None,
+                 deadline: Optional[float] = None, progress_interval: float = 0.2):
+        self.progress = progress
+        self.cancel_token = cancel_token
+        self.deadline = deadline
+        self.progress_interval = progress_interval
+        self._stage: Optional[str] = None
+        self._next_report = 0.0
+
+    @classmethod
+    def with_time_limit(cls, seconds: float, **kwargs) -> "JobOptions":
+        """Opciones con un plazo de seconds segundos a partir de ahora"""
+        return cls(deadline=time.monotonic() + seconds, **kwargs)
+
+    def report(self, stage: str, fraction: float) -> None:
+        """Informa del avance si toca (cambio de etapa, final o intervalo cumplido)"""
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if stage == self._stage and fraction < 1.0 and now < self._next_report:
+            return
+        self._stage = stage
+        self._next_report = now + self.progress_interval
+        self.progress(stage, min(max(fraction, 0.0), 1.0))
+
+    def stop_reason(self) -> Optional[str]:
+        """Motivo para detener el trabajo, o None si puede seguir"""
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            return STOP_CANCELLED
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return STOP_DEADLINE
+        return None
+
+    def check(self) -> None:
+        """Lanza JobStopped si el trabajo debe detenerse (entre etapas de imagen)"""
+        reason = self.stop_reason()
+        if reason:
+            raise JobStopped(reason)
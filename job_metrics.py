@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Métricas de un trabajo de G-code calculadas durante la emisión
+Longitudes de dibujo y desplazamiento, levantamientos, extensión, rango Z,
+histograma de avances y duración estimada; se guardan en un JSON junto al G-code
+"""
+
+import json
+import math
+import os
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Anchura de los intervalos del histograma de avances (mm/min)
+FEED_BIN = 100
+
+def sidecar_path(output_path: str, suffix: str = ".metrics.json") -> str:
+    """Ruta de un archivo adjunto al G-code: dibujo.gcode(.gz) -> dibujo.metrics.json"""
+    base = output_path
+    for extension in ('.gz', '.xz'):
+        if base.endswith(extension):
+            base = base[:-len(extension)]
+    return os.path.splitext(base)[0] + suffix
+
+def reset_peak_rss() -> bool:
+    """Reinicia el pico de memoria residente del proceso a la memoria actual
+
+    Solo en Linux (/proc/self/clear_refs); devuelve False si no se puede, y
+    entonces el pico por trabajo no se puede medir.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def read_job_peak_rss() -> Optional[int]:
+    """Pico de memoria residente en bytes desde el último reset_peak_rss (VmHWM)"""
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def read_process_peak_rss() -> Optional[int]:
+    """Pico de memoria residente de toda la vida del proceso en bytes (None si no se puede medir)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB y macOS en bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def format_duration(seconds: float) -> str:
+    """Duración legible: 1h 02m 03s"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m {seconds:02d}s"
+    return f"{minutes}m {seconds:02d}s"
+
+class JobMetrics:
+    """Acumula las métricas de los trazos emitidos, vectorizadas sobre todo el trabajo"""
+
+    def __init__(self, z_safe: float, travel_speed: float, plunge_feed: float, z_moves: bool = True,
+                 z_rate: Optional[float] = None):
+        self.z_safe = z_safe
+        self.travel_speed = travel_speed
+        self.plunge_feed = plunge_feed
+        # Sin Z (láser) no hay subidas ni bajadas entre trazos
+        self.z_moves = z_moves
+        # Velocidad máxima del eje Z (mm/min): un segmento no dura menos que su dZ a esa velocidad
+        self.z_rate = z_rate
+
+        self.drawing_length = 0.0
+        self.travel_length = 0.0
+        self.pen_lifts = 0
+        self.drawing_seconds = 0.0
+        self.travel_seconds = 0.0
+        self.bbox_min = np.array([math.inf, math.inf])
+        self.bbox_max = np.array([-math.inf, -math.inf])
+        self.z_min = math.inf
+        self.z_max = -math.inf
+        self.feed_counts = np.zeros(0, dtype=np.int64)
+        self.drawing_segments = 0
+        self.z_segments = 0  # segmentos de dibujo que también mueven Z
+        self.position = np.zeros(2)
+        # El generador activa peak_rss_tracked si pudo reiniciar el pico al empezar el trabajo
+        self.peak_rss_tracked = False
+        self.peak_rss_bytes: Optional[int] = None
+        self.process_peak_rss_bytes: Optional[int] = None
+
+    def add_strokes(self, strokes: list) -> List[float]:
+        """Registra los trazos emitidos (xy, z, feed o None) y devuelve la duración de cada uno
+
+        Todo el trabajo se procesa concatenado: las diferencias entre el último
+        punto de un trazo y el primero del siguiente son los desplazamientos.
+        """
+        valid = [i for i, stroke in enumerate(strokes) if stroke is not None]
+        seconds = np.zeros(len(strokes))
+        if not valid:
+            return seconds.tolist()
+
+        xy = np.concatenate([strokes[i][0] for i in valid])
+        z = np.concatenate([strokes[i][1] for i in valid])
+        feed = np.concatenate([strokes[i][2] for i in valid])
+        counts = np.array([len(strokes[i][0]) for i in valid])
+        starts = np.cumsum(counts) - counts
+        ends = starts + counts - 1
+
+        # Segmentos de dibujo: todos salvo los que unen un trazo con el siguiente
+        segments = np.hypot(*np.diff(xy, axis=0).T)
+        drawing_mask = np.ones(len(segments), dtype=bool)
+        drawing_mask[starts[1:] - 1] = False
+        drawing_time = np.where(drawing_mask, segments / feed[1:], 0.0) * 60.0
+        if self.z_moves:
+            # Cambios de Z visibles con 3 decimales: el planificador mueve tres ejes
+            z_steps = np.abs(np.diff(z))
+            moves_z = drawing_mask & (z_steps >= 5e-4)
+            self.drawing_segments += int(drawing_mask.sum())
+            self.z_segments += int(moves_z.sum())
+            if self.z_rate:
+                np.maximum(drawing_time, np.where(moves_z, z_steps / self.z_rate * 60.0, 0.0), out=drawing_time)
+        cumulative = np.concatenate(([0.0], np.cumsum(np.where(drawing_mask, segments, 0.0))))
+        cumulative_time = np.concatenate(([0.0], np.cumsum(drawing_time)))
+        stroke_drawing = cumulative[ends] - cumulative[starts]
+        stroke_drawing_time = cumulative_time[ends] - cumulative_time[starts]
+
+        # Desplazamiento hasta el inicio, bajada al feed de entrada y subida final
+        previous = np.vstack([self.position[None, :], xy[ends[:-1]]])
+        travel = np.hypot(*(xy[starts] - previous).T)
+        lift = self.z_safe - z[ends] if self.z_moves else 0.0
+        travel_time = (travel + lift) / self.travel_speed * 60.0
+        if self.z_moves:
+            travel_time += np.maximum(self.z_safe - z[starts], 0.0) / self.plunge_feed * 60.0
+
+        self.drawing_length += float(stroke_drawing.sum())
+        self.travel_length += float(travel.sum())
+        self.drawing_seconds += float(stroke_drawing_time.sum())
+        self.travel_seconds += float(travel_time.sum())
+        self.pen_lifts += len(valid)
+        np.minimum(self.bbox_min, xy.min(axis=0), out=self.bbox_min)
+        np.maximum(self.bbox_max, xy.max(axis=0), out=self.bbox_max)
+        if self.z_moves:
+            self.z_min = min(self.z_min, float(z.min()))
+            self.z_max = max(self.z_max, float(z.max()))
+
+        # Histograma del avance de cada movimiento de dibujo
+        counts = np.bincount(feed[1:][drawing_mask] // FEED_BIN)
+        if len(counts) > len(self.feed_counts):
+            counts[:len(self.feed_counts)] += self.feed_counts
+            self.feed_counts = counts
+        else:
+            self.feed_counts[:len(counts)] += counts
+
+        self.position = xy[-1].astype(np.float64)
+        seconds[valid] = stroke_drawing_time + travel_time
+        return seconds.tolist()
+
+    def finish(self) -> None:
+        """Añade el regreso al origen del footer"""
+        travel = float(np.hypot(*self.position))
+        self.travel_length += travel
+        self.travel_seconds += travel / self.travel_speed * 60.0
+        self.position = np.zeros(2)
+
+    @property
+    def estimated_seconds(self) -> float:
+        return self.drawing_seconds + self.travel_seconds
+
+    @property
+    def effective_drawing_speed(self) -> float:
+        """Velocidad media de dibujo en mm/min, incluidas las esperas del eje Z"""
+        return self.drawing_length / self.drawing_seconds * 60.0 if self.drawing_seconds > 0 else 0.0
+
+    @property
+    def z_move_fraction(self) -> float:
+        """Fracción de los segmentos de dibujo que mueven también Z"""
+        return self.z_segments / self.drawing_segments if self.drawing_segments else 0.0
+
+    def feed_histogram(self) -> dict:
+        """Movimientos de dibujo por intervalo de avance, p. ej. {"800-900": 1234}"""
+        return {f"{i * FEED_BIN}-{(i + 1) * FEED_BIN}": int(count)
+                for i, count in enumerate(self.feed_counts) if count}
+
+    def to_dict(self, outputs: Optional[List[str]] = None) -> dict:
+        # Pico desde el inicio del trabajo (incluye el procesamiento de imagen); donde no
+        # se puede reiniciar solo queda el de toda la vida del proceso, que en un
+        # worker de larga duración incluye trabajos anteriores
+        self.peak_rss_bytes = read_job_peak_rss() if self.peak_rss_tracked else None
+        self.process_peak_rss_bytes = None if self.peak_rss_bytes else read_process_peak_rss()
+        has_strokes = self.pen_lifts > 0
+        report = {
+            "drawing_length_mm": round(self.drawing_length, 3),
+            "travel_length_mm": round(self.travel_length, 3),
+            "pen_lifts": self.pen_lifts,
+            "bounding_box_mm": {
+                "x": [round(float(self.bbox_min[0]), 3), round(float(self.bbox_max[0]), 3)],
+                "y": [round(float(self.bbox_min[1]), 3), round(float(self.bbox_max[1]), 3)],
+            } if has_strokes else None,
+            "z_range_mm": ([round(self.z_min, 3), round(max(self.z_max, self.z_safe), 3)]
+                           if has_strokes and self.z_moves else None),
+            "feed_histogram": self.feed_histogram(),
+            "effective_drawing_speed_mm_min": round(self.effective_drawing_speed, 1),
+            "z_move_fraction": round(self.z_move_fraction, 3) if self.z_moves else None,
+            "estimated_seconds": round(self.estimated_seconds, 1),
+            "peak_rss_mb": round(self.peak_rss_bytes / 2**20, 1) if self.peak_rss_bytes else None,
+            "process_peak_rss_mb": (round(self.process_peak_rss_bytes / 2**20, 1)
+                                    if self.process_peak_rss_bytes else None),
+        }
+        if outputs is not None:
+            report["outputs"] = [os.path.basename(path) for path in outputs]
+        return report
+
+    def summary_lines(self) -> List[str]:
+        """Resumen compacto para los comentarios del header"""
+        # Sin eje Z (láser) cada trazo termina apagando el láser, no levantando la herramienta
+        lifts = "levantamientos" if self.z_moves else "apagados del láser"
+        lines = [
+            f"; Resumen: dibujo {self.drawing_length:.0f} mm, desplazamiento {self.travel_length:.0f} mm, "
+            f"{self.pen_lifts} {lifts}",
+            f"; Duración estimada: {format_duration(self.estimated_seconds)}",
+        ]
+        if self.pen_lifts:
+            extent = (f"; Extensión: X {self.bbox_min[0]:.1f}..{self.bbox_max[0]:.1f} "
+                      f"Y {self.bbox_min[1]:.1f}..{self.bbox_max[1]:.1f}")
+            if self.z_moves:
+                extent += f" Z {self.z_min:.2f}..{max(self.z_max, self.z_safe):.2f}"
+            lines.insert(1, extent + " mm")
+        return lines
+
+    def write_sidecar(self, output_path: str, outputs: Optional[List[str]] = None) -> str:
+        """Escribe el JSON de métricas junto al G-code y devuelve su ruta"""
+        path = sidecar_path(output_path)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(outputs), f, indent=2, ensure_ascii=False)
+        return path
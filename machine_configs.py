@@ -12,9 +12,22 @@ class MachineConfig:
         self.gcode_footer = []
         self.tool_on_command = "M3 S1000"
         self.tool_off_command = "M5"
+        self.pause_command = "M0"  # pausa hasta que el operador reanude
         self.units = "G21"  # mm
         self.positioning = "G90"  # absoluto
         
+        # Capacidades de la máquina: el emisor elige con ellas la salida más barata
+        self.supports_z = True  # eje Z para subir la herramienta y simular la presión
+        self.supports_power = False  # potencia S modulable en cada movimiento (láser)
+        self.power_range = (0, 1000)  # S para la menor y la mayor presión
+        self.dynamic_power_command = "M4"  # potencia dinámica: apagado en G0 y sin avance
+        self.z_speed_ratio = None  # velocidad máxima de Z / de XY (None = desconocida)
+        
+    def capabilities(self) -> list:
+        """Nombres de las capacidades declaradas, p. ej. ['Z', 'S']"""
+        return [name for name, supported in (("Z", self.supports_z),
+                                             ("S", self.supports_power)) if supported]
+        
     def get_header(self) -> list:
         return self.gcode_header
     
@@ -26,6 +39,7 @@ class GrblConfig(MachineConfig):
     
     def __init__(self):
         super().__init__("Grbl CNC")
+        self.z_speed_ratio = 0.25
         self.gcode_header = [
             "; Configuración para Grbl CNC",
             "G21 ; Unidades en milímetros",
@@ -48,6 +62,7 @@ class MarlinConfig(MachineConfig):
     
     def __init__(self):
         super().__init__("Marlin 3D Printer")
+        self.z_speed_ratio = 0.05  # Z por husillo, mucho más lento que XY
         self.gcode_header = [
             "; Configuración para Impresora 3D Marlin (modo dibujo)",
             "G21 ; Unidades en milímetros",
@@ -72,6 +87,7 @@ class LinuxCNCConfig(MachineConfig):
     
     def __init__(self):
         super().__init__("LinuxCNC")
+        self.z_speed_ratio = 0.25
         self.gcode_header = [
             "; Configuración para LinuxCNC",
             "G21 ; Unidades en milímetros",
@@ -94,6 +110,7 @@ class PlotterConfig(MachineConfig):
     
     def __init__(self):
         super().__init__("Pen Plotter")
+        self.z_speed_ratio = 0.5  # Z ligero de pluma
         self.tool_on_command = "M3 S100"  # Bajar pluma
         self.tool_off_command = "M5"      # Levantar pluma
         self.gcode_header = [
@@ -115,15 +132,20 @@ class LaserEngraverConfig(MachineConfig):
     
     def __init__(self):
         super().__init__("Laser Engraver")
+        # Sin Z: la presión simulada se convierte en potencia y los levantamientos
+        # en desplazamientos G0, que con M4 se hacen con el láser apagado
+        self.supports_z = False
+        self.supports_power = True
+        self.power_range = (200, 1000)  # por debajo de ~20% el láser apenas marca
         self.gcode_header = [
             "; Configuración para Grabadora Láser",
             "; ADVERTENCIA: Usar protección ocular",
             "G21 ; Unidades en milímetros",
             "G90 ; Posicionamiento absoluto",
             "G28 ; Home",
-            "G0 Z0 ; Altura de trabajo",
             "M5 ; Láser apagado",
-            "; Potencia del láser se controla con S (0-1000)"
+            "; Potencia del láser se controla con S (200-1000) según la presión simulada",
+            "M4 S0 ; Potencia dinámica: el láser solo emite en movimientos G1"
         ]
         self.gcode_footer = [
             "M5 ; Apagar láser",
@@ -131,22 +153,23 @@ class LaserEngraverConfig(MachineConfig):
             "M30 ; Fin del programa"
         ]
 
+# Tipos de máquina disponibles y su clase de configuración
+MACHINE_CONFIGS = {
+    "grbl": GrblConfig,
+    "marlin": MarlinConfig,
+    "linuxcnc": LinuxCNCConfig,
+    "plotter": PlotterConfig,
+    "laser": LaserEngraverConfig
+}
+
 def get_machine_config(machine_type: str) -> MachineConfig:
     """Obtiene la configuración para un tipo de máquina específico"""
     
-    configs = {
-        "grbl": GrblConfig,
-        "marlin": MarlinConfig,
-        "linuxcnc": LinuxCNCConfig,
-        "plotter": PlotterConfig,
-        "laser": LaserEngraverConfig
-    }
-    
-    if machine_type.lower() not in configs:
+    if machine_type.lower() not in MACHINE_CONFIGS:
         print(f"Tipo de máquina '{machine_type}' no reconocido. Usando Grbl por defecto.")
         return GrblConfig()
     
-    return configs[machine_type.lower()]()
+    return MACHINE_CONFIGS[machine_type.lower()]()
 
 def list_available_machines():
     """Lista todas las configuraciones de máquinas disponibles"""
@@ -161,7 +184,8 @@ def list_available_machines():
     
     print("Configuraciones de máquinas disponibles:")
     for key, description in machines.items():
-        print(f"  {key}: {description}")
+        capabilities = ", ".join(MACHINE_CONFIGS[key]().capabilities())
+        print(f"  {key}: {description} [{capabilities}]")
 
 if __name__ == "__main__":
     list_available_machines()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Anidado de varias imágenes en un mismo canvas
+Coloca cada imagen con su tamaño en mm mediante un empaquetado skyline
+(abajo a la izquierda), extrae los contornos de cada pieza en paralelo y
+emite un solo programa con las piezas y los trazos ordenados por cercanía
+"""
+
+import argparse
+import copy
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from advanced_generator import create_generator
+from config_loader import load_config
+from image_to_gcode import HandDrawnGCodeGenerator, read_image_size
+from svg_input import is_svg_file, svg_document_size
+
+# Tamaño de una pieza tras los dos puntos: 40x30, 40 (alto según la imagen) y *N copias
+_SIZE_SPEC = re.compile(r'^(\d+(?:\.\d+)?)(?:x(\d+(?:\.\d+)?))?(?:\*(\d+))?$')
+
+class NestItem:
+    """Imagen a colocar en el canvas con su tamaño final en mm"""
+
+    def __init__(self, image_path: str, width: float, height: float):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Tamaño no válido para {image_path}: {width}x{height} mm")
+        self.image_path = image_path
+        self.width = width
+        self.height = height
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.image_path)
+
+    @property
+    def area(self) -> float:
+        return self.width * self.height
+
+    @property
+    def key(self) -> tuple:
+        """Las copias de una misma imagen y tamaño comparten los contornos"""
+        return (os.path.abspath(self.image_path), self.width, self.height)
+
+class Placement:
+    """Posición de una pieza en el canvas (esquina inferior izquierda, en mm)"""
+
+    def __init__(self, item: NestItem, x: float, y: float, rotated: bool = False):
+        self.item = item
+        self.x = x
+        self.y = y
+        self.rotated = rotated
+
+    @property
+    def width(self) -> float:
+        return self.item.height if self.rotated else self.item.width
+
+    @property
+    def height(self) -> float:
+        return self.item.width if self.rotated else self.item.height
+
+    @property
+    def center(self) -> np.ndarray:
+        return np.array([self.x + self.width / 2, self.y + self.height / 2])
+
+def image_aspect(image_path: str) -> float:
+    """Relación alto/ancho de la imagen (leída de la cabecera si es posible)"""
+    if is_svg_file(image_path):
+        size = svg_document_size(image_path) or (1.0, 1.0)
+        return size[1] / size[0]
+    size = read_image_size(image_path)
+    if size is None:
+        image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"No se pudo cargar la imagen: {image_path}")
+        size = (image.shape[1], image.shape[0])
+    return size[1] / size[0]
+
+def parse_item_spec(spec: str) -> List[NestItem]:
+    """Interpreta 'imagen.png:40x30', 'imagen.png:40' o 'imagen.png:40x30*6'
+
+    Sin alto se conserva la proporción de la imagen. La ruta puede contener
+    dos puntos (unidades de Windows): se separa por los últimos.
+    """
+    path, _, size = spec.rpartition(':')
+    match = _SIZE_SPEC.match(size) if path else None
+    if match is None:
+        raise ValueError(f"Falta el tamaño en mm de la pieza (imagen.png:ANCHOxALTO): {spec}")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No se encontró la imagen: {path}")
+    width = float(match.group(1))
+    height = float(match.group(2)) if match.group(2) else width * image_aspect(path)
+    copies = int(match.group(3) or 1)
+    return [NestItem(path, width, height) for _ in range(copies)]
+
+class Skyline:
+    """Perfil superior de las piezas colocadas: segmentos (x, y, ancho) de izquierda a derecha"""
+
+    def __init__(self, width: float, height: float):
+        self.width = width
+        self.height = height
+        self.segments: List[List[float]] = [[0.0, 0.0, width]]
+
+    def fit(self, index: int, width: float, height: float) -> Optional[float]:
+        """Altura a la que cabe una pieza que empieza en el segmento index (None si no cabe)"""
+        x = self.segments[index][0]
+        if x + width > self.width + 1e-9:
+            return None
+        y = 0.0
+        remaining = width
+        for segment in self.segments[index:]:
+            y = max(y, segment[1])
+            if y + height > self.height + 1e-9:
+                return None
+            remaining -= segment[2]
+            if remaining <= 1e-9:
+                break
+        return y
+
+    def find(self, width: float, height: float) -> Optional[Tuple[float, float, int]]:
+        """Mejor posición abajo a la izquierda: (techo resultante, x, índice)"""
+        best = None
+        for index in range(len(self.segments)):
+            y = self.fit(index, width, height)
+            if y is None:
+                continue
+            candidate = (y + height, self.segments[index][0], index)
+            if best is None or candidate[:2] < best[:2]:
+                best = candidate
+        return best
+
+    def place(self, index: int, width: float, height: float) -> Tuple[float, float]:
+        """Añade la pieza al perfil y devuelve su esquina inferior izquierda"""
+        x = self.segments[index][0]
+        y = self.fit(index, width, height)
+        right = x + width
+        segments = self.segments[:index] + [[x, y + height, width]]
+        # Recortar los segmentos que quedan bajo la pieza
+        for segment in self.segments[index:]:
+            end = segment[0] + segment[2]
+            if end <= right + 1e-9:
+                continue
+            start = max(segment[0], right)
+            segments.append([start, segment[1], end - start])
+        # Unir vecinos a la misma altura
+        merged = [segments[0]]
+        for segment in segments[1:]:
+            if abs(segment[1] - merged[-1][1]) <= 1e-9:
+                merged[-1][2] += segment[2]
+            else:
+                merged.append(segment)
+        self.segments = merged
+        return x, y
+
+def pack_items(items: Sequence[NestItem], canvas_width: float, canvas_height: float,
+               spacing: float = 0.0, margin: float = 0.0,
+               allow_rotation: bool = True) -> Tuple[List[Placement], List[NestItem]]:
+    """Empaqueta las piezas con skyline abajo a la izquierda; devuelve (colocadas, sobrantes)
+
+    Las piezas se colocan de la más alta a la más baja, probando ambas
+    orientaciones. El espaciado se añade a cada pieza y al borde útil para
+    que solo quede entre piezas.
+    """
+    skyline = Skyline(canvas_width - 2 * margin + spacing, canvas_height - 2 * margin + spacing)
+    order = sorted(items, key=lambda item: (max(item.width, item.height) if allow_rotation else item.height,
+                                            item.area), reverse=True)
+    placements, leftover = [], []
+    for item in order:
+        best = None
+        for rotated in ((False, True) if allow_rotation and item.width != item.height else (False,)):
+            width, height = (item.height, item.width) if rotated else (item.width, item.height)
+            candidate = skyline.find(width + spacing, height + spacing)
+            if candidate is not None and (best is None or candidate[:2] < best[0][:2]):
+                best = (candidate, rotated, width, height)
+        if best is None:
+            leftover.append(item)
+            continue
+        (_, _, index), rotated, width, height = best
+        x, y = skyline.place(index, width + spacing, height + spacing)
+        placements.append(Placement(item, margin + x, margin + y, rotated))
+    return placements, leftover
+
+def item_toolpath(generator: HandDrawnGCodeGenerator, item: NestItem) -> List[np.ndarray]:
+    """Trayectoria normalizada de una pieza, extraída a la resolución útil de su tamaño
+
+    Cada pieza usa su propia copia del generador para que las cachés no se
+    compartan entre hilos.
+    """
+    item_generator = copy.copy(generator)
+    item_generator.invalidate_cache()
+    item_generator.canvas_width = item.width
+    item_generator.canvas_height = item.height
+    return item_generator.get_toolpath(item.image_path)
+
+def place_toolpath(toolpath: List[np.ndarray], placement: Placement) -> List[np.ndarray]:
+    """Lleva la trayectoria del cuadrado unidad a mm del canvas dentro de su hueco"""
+    item = placement.item
+    paths = []
+    for path in toolpath:
+        placed = np.empty_like(path)
+        if placement.rotated:
+            # Giro de 90° antihorario: el ancho de la pieza pasa a ser su alto
+            placed[:, 0] = placement.x + (1.0 - path[:, 1]) * item.height
+            placed[:, 1] = placement.y + path[:, 0] * item.width
+        else:
+            placed[:, 0] = placement.x + path[:, 0] * item.width
+            placed[:, 1] = placement.y + path[:, 1] * item.height
+        paths.append(placed)
+    return paths
+
+def order_strokes(paths: List[np.ndarray], position: np.ndarray) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Ordena los trazos por vecino más cercano (invirtiendo los que convenga)
+
+    Devuelve los trazos ordenados y la posición final de la herramienta.
+    """
+    if not paths:
+        return [], position
+    starts = np.array([path[0] for path in paths])
+    ends = np.array([path[-1] for path in paths])
+    pending = np.ones(len(paths), dtype=bool)
+    ordered = []
+    for _ in range(len(paths)):
+        to_start = np.where(pending, np.square(starts - position).sum(axis=1), np.inf)
+        to_end = np.where(pending, np.square(ends - position).sum(axis=1), np.inf)
+        nearest_start, nearest_end = int(to_start.argmin()), int(to_end.argmin())
+        if to_end[nearest_end] < to_start[nearest_start]:
+            index, path = nearest_end, paths[nearest_end][::-1]
+        else:
+            index, path = nearest_start, paths[nearest_start]
+        pending[index] = False
+        ordered.append(path)
+        position = path[-1]
+    return ordered, position
+
+def order_placements(placements: List[Placement], position: np.ndarray) -> List[Placement]:
+    """Ordena las piezas por vecino más cercano entre sus centros"""
+    pending = list(placements)
+    ordered = []
+    while pending:
+        nearest = min(range(len(pending)), key=lambda i: float(np.square(pending[i].center - position).sum()))
+        ordered.append(pending.pop(nearest))
+        position = ordered[-1].center
+    return ordered
+
+def canvas_usage(placements: Sequence[Placement], canvas_width: float, canvas_height: float) -> Dict[str, float]:
+    """Fracción del canvas cubierta por las piezas y alto ocupado en mm"""
+    area = sum(placement.item.area for placement in placements)
+    used_height = max((placement.y + placement.height for placement in placements), default=0.0)
+    return {"utilization": area / (canvas_width * canvas_height), "used_height_mm": used_height}
+
+def nest_images_to_gcode(generator: HandDrawnGCodeGenerator, items: Sequence[NestItem], output_path: str,
+                         spacing: float = 2.0, margin: float = 0.0, allow_rotation: bool = True,
+                         max_workers: Optional[int] = None) -> Tuple[List[str], List[Placement], List[NestItem]]:
+    """Empaqueta las piezas en el canvas del generador y escribe un único programa
+
+    Devuelve (archivos escritos, piezas colocadas, piezas que no cupieron).
+    """
+    placements, leftover = pack_items(items, generator.canvas_width, generator.canvas_height,
+                                      spacing, margin, allow_rotation)
+    if not placements:
+        raise ValueError("Ninguna pieza cabe en el canvas")
+
+    # Una extracción por imagen y tamaño distintos; OpenCV libera el GIL en hilos
+    unique = {}
+    for placement in placements:
+        unique.setdefault(placement.item.key, placement.item)
+    workers = max_workers or min(len(unique), os.cpu_count() or 1)
+    with ThreadPoolExecutor(workers, thread_name_prefix="nest") as executor:
+        toolpaths = dict(zip(unique, executor.map(lambda item: item_toolpath(generator, item), unique.values())))
+
+    usage = canvas_usage(placements, generator.canvas_width, generator.canvas_height)
+    layers = []
+    position = np.zeros(2)
+    scale = np.array([generator.canvas_width, generator.canvas_height])
+    for number, placement in enumerate(order_placements(placements, position), 1):
+        paths, position = order_strokes(place_toolpath(toolpaths[placement.item.key], placement), position)
+        item = placement.item
+        change_lines = [f"; Pieza {number}: {item.name} {item.width:g}x{item.height:g} mm "
+                        f"en X{placement.x:.1f} Y{placement.y:.1f}" + (" (girada)" if placement.rotated else "")]
+        if number == 1:
+            change_lines.insert(0, f"; Anidado: {len(placements)} piezas, "
+                                   f"{usage['utilization']:.0%} del canvas ocupado")
+        # write_layers_gcode espera la trayectoria en fracciones del canvas
+        layers.append((change_lines, [path / scale for path in paths]))
+
+    print(f"Piezas colocadas: {len(placements)} de {len(items)}")
+    print(f"Aprovechamiento del canvas: {usage['utilization']:.1%} "
+          f"(alto ocupado {usage['used_height_mm']:.1f} de {generator.canvas_height:g} mm)")
+    return generator.write_layers_gcode(layers, output_path), placements, leftover
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Anida varias imágenes en un mismo canvas y genera un único G-code',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  %(prog)s logo.png:40x30 sello.png:25 -o hoja.gcode
+  %(prog)s "insignia.png:30x30*12" --width 300 --height 200 --spacing 3
+        """
+    )
+    parser.add_argument('items', nargs='+',
+                        help='Piezas como imagen.png:ANCHOxALTO en mm (sin alto se conserva la proporción; *N copias)')
+    parser.add_argument('-o', '--output', default='anidado.gcode', help='Archivo G-code de salida (default: anidado.gcode)')
+    parser.add_argument('--machine', default='grbl', help='Tipo de máquina (default: grbl)')
+    parser.add_argument('--profile', default='artistic', help='Perfil de dibujo (default: artistic)')
+    parser.add_argument('--width', type=float, default=200.0, help='Ancho del canvas en mm (default: 200)')
+    parser.add_argument('--height', type=float, default=200.0, help='Alto del canvas en mm (default: 200)')
+    parser.add_argument('--config', help='Archivo de configuración (default: config.json)')
+    parser.add_argument('--spacing', type=float, default=2.0, help='Separación entre piezas en mm (default: 2)')
+    parser.add_argument('--margin', type=float, default=0.0, help='Margen en el borde del canvas en mm (default: 0)')
+    parser.add_argument('--no-rotate', action='store_true', help='No girar piezas 90° para aprovechar el canvas')
+    parser.add_argument('--workers', type=int, help='Hilos de extracción de contornos (default: CPUs)')
+    parser.add_argument('--preview', action='store_true', help='Guardar una vista previa PNG del G-code (nombre.preview.png)')
+
+    args = parser.parse_args()
+
+    try:
+        items = [item for spec in args.items for item in parse_item_spec(spec)]
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    generator = create_generator(args.machine, args.profile, load_config(args.config),
+                                 canvas_width=args.width, canvas_height=args.height)
+    try:
+        outputs, _, leftover = nest_images_to_gcode(generator, items, args.output, spacing=args.spacing,
+                                                    margin=args.margin, allow_rotation=not args.no_rotate,
+                                                    max_workers=args.workers)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for item in leftover:
+        print(f"✗ No cabe: {item.name} ({item.width:g}x{item.height:g} mm)")
+
+    if args.preview:
+        from preview_renderer import preview_path, render_gcode_preview
+        print(f"Vista previa: {render_gcode_preview(outputs, preview_path(args.output), extent=(args.width, args.height))}")
+
+    return 0 if not leftover else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Remuestreo por longitud de arco de las polilíneas de la trayectoria
+Garantiza una separación máxima entre puntos en mm, con más densidad en curvas
+"""
+
+import math
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+def turning_angles(points: np.ndarray) -> np.ndarray:
+    """Ángulo de giro (radianes, 0..pi) en cada vértice; 0 en los extremos"""
+    angles = np.zeros(len(points))
+    if len(points) < 3:
+        return angles
+    incoming = points[1:-1] - points[:-2]
+    outgoing = points[2:] - points[1:-1]
+    cross = incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0]
+    dot = (incoming * outgoing).sum(axis=1)
+    angles[1:-1] = np.abs(np.arctan2(cross, dot))
+    return angles
+
+def segment_steps(points: np.ndarray, step: float, curve_densify: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Longitud de cada segmento y paso local (menor junto a vértices con giro fuerte)"""
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    if curve_densify <= 0:
+        return lengths, np.full(len(lengths), step)
+    angles = turning_angles(points)
+    sharpness = np.maximum(angles[:-1], angles[1:]) / math.pi
+    return lengths, step / (1.0 + curve_densify * sharpness)
+
+def count_resampled_points(points: np.ndarray, step: float, curve_densify: float = 0.0) -> int:
+    """Número de puntos que produciría resample_polyline"""
+    if len(points) < 2:
+        return len(points)
+    lengths, steps = segment_steps(points, step, curve_densify)
+    return int(np.maximum(1, np.ceil(lengths / steps)).sum()) + 1
+
+def resample_polyline(points: np.ndarray, step: float, curve_densify: float = 0.0) -> np.ndarray:
+    """Inserta puntos en cada segmento para que ninguno supere el paso local
+
+    Los vértices originales se conservan (las esquinas no se redondean) y cada
+    segmento se divide en partes iguales.
+    """
+    if len(points) < 2 or not math.isfinite(step):
+        return points
+    lengths, steps = segment_steps(points, step, curve_densify)
+    pieces = np.maximum(1, np.ceil(lengths / steps)).astype(np.int64)
+
+    # Índice de segmento y fracción de cada punto nuevo, sin bucles de Python
+    segment = np.repeat(np.arange(len(pieces)), pieces)
+    first = np.repeat(np.cumsum(pieces) - pieces, pieces)
+    t = (np.arange(len(segment)) - first) / pieces[segment]
+
+    resampled = np.empty((len(segment) + 1, 2), dtype=np.float64)
+    resampled[:-1] = points[segment] + (points[segment + 1] - points[segment]) * t[:, None]
+    resampled[-1] = points[-1]
+    return resampled
+
+def resolve_step(paths: List[np.ndarray], step: float, curve_densify: float = 0.0,
+                 max_points: Optional[int] = None) -> float:
+    """Ajusta el paso para que el total de puntos del trabajo no supere max_points
+
+    Si ni siquiera los vértices originales caben en el presupuesto se devuelve
+    un paso infinito (no se añade ningún punto).
+    """
+    if not max_points:
+        return step
+    total = sum(count_resampled_points(path, step, curve_densify) for path in paths)
+    if total <= max_points:
+        return step
+
+    vertices = sum(len(path) for path in paths)
+    if vertices >= max_points:
+        return math.inf
+
+    # La longitud total predice el número de puntos; unas pocas iteraciones absorben el redondeo
+    for _ in range(20):
+        extra_needed = total - vertices
+        extra_allowed = max_points - vertices
+        step *= max(1.05, extra_needed / max(extra_allowed, 1))
+        total = sum(count_resampled_points(path, step, curve_densify) for path in paths)
+        if total <= max_points:
+            return step
+    return math.inf
+
+def simplify_to_budget(paths: List[np.ndarray], max_points: int) -> List[np.ndarray]:
+    """Reduce los vértices de la trayectoria hasta que quepan en max_points
+
+    Cada trazo se simplifica con Douglas-Peucker (approxPolyDP) con una
+    tolerancia en mm que crece hasta que el total cabe; los extremos se
+    conservan. Si ni con dos puntos por trazo cabe, antes se descartan los
+    trazos más cortos: quedan como polilíneas vacías para que la lista siga
+    alineada con la de entrada (las capas se reparten por posición).
+    """
+    if not max_points or sum(len(path) for path in paths) <= max_points:
+        return paths
+
+    # Suelo de dos puntos por trazo: sobran los trazos más cortos
+    floor = np.array([min(len(path), 2) for path in paths])
+    if floor.sum() > max_points:
+        lengths = np.array([np.hypot(*np.diff(path, axis=0).T).sum() for path in paths])
+        by_length = np.argsort(-lengths, kind="stable")
+        dropped = by_length[np.cumsum(floor[by_length]) > max_points]
+        paths = list(paths)
+        for i in dropped:
+            paths[i] = np.empty((0, 2))
+
+    # Tolerancia creciente desde una fracción del tamaño del dibujo
+    points = np.concatenate(paths)
+    extent = float(np.ptp(points, axis=0).max()) or 1.0
+    originals = [np.ascontiguousarray(path, dtype=np.float32).reshape(-1, 1, 2) for path in paths]
+
+    def simplify(epsilon: float) -> List[np.ndarray]:
+        return [cv2.approxPolyDP(path, epsilon, False).reshape(-1, 2).astype(np.float64)
+                if len(path) else np.empty((0, 2)) for path in originals]
+
+    # Crecer hasta que quepa y afinar entre la última tolerancia que no cabía y la que sí
+    low, high = 0.0, extent * 1e-4
+    best = simplify(high)
+    while sum(len(path) for path in best) > max_points and high <= extent:
+        low, high = high, high * 2.0
+        best = simplify(high)
+    for _ in range(8):
+        middle = (low + high) / 2.0
+        candidate = simplify(middle)
+        if sum(len(path) for path in candidate) <= max_points:
+            high, best = middle, candidate
+        else:
+            low = middle
+    return best
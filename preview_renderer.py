@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Vista previa sin pantalla de trayectorias y archivos G-code
+Dibuja todas las polilíneas con unas pocas llamadas agrupadas a cv2.polylines
+(una por grosor) y guarda el resultado como PNG para revisar la salida
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from gcode_validator import read_moves
+from job_metrics import sidecar_path
+
+# Lado mayor de la imagen en píxeles
+PREVIEW_SIZE = 1600
+PREVIEW_MARGIN = 10
+
+# Colores BGR
+BACKGROUND_COLOR = (255, 255, 255)
+DRAW_COLOR = (90, 40, 20)
+TRAVEL_COLOR = (170, 170, 255)
+
+# Grosor máximo del trazo (px) para la Z más baja, es decir, la mayor presión
+MAX_THICKNESS = 4
+
+# Bits fraccionarios de las coordenadas que recibe cv2.polylines
+SHIFT = 2
+
+def preview_path(output_path: str) -> str:
+    """Ruta del PNG de vista previa: dibujo.gcode(.gz) -> dibujo.preview.png"""
+    return sidecar_path(output_path, ".preview.png")
+
+def toolpath_moves(paths: Sequence[np.ndarray],
+                   z_values: Optional[Sequence[np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Convierte polilíneas en mm al formato de read_moves (desde el origen)
+
+    Sin Z todos los trazos se dibujan con el grosor mínimo.
+    """
+    if z_values is None:
+        z_values = [np.zeros(len(path)) for path in paths]
+    pairs = [(path, z) for path, z in zip(paths, z_values) if len(path)]
+    if not pairs:
+        return np.zeros((1, 2)), np.zeros(1), np.zeros(1, dtype=bool)
+    xy = np.concatenate([np.zeros((1, 2))] + [np.asarray(path, dtype=np.float64) for path, _ in pairs])
+    z = np.concatenate([np.zeros(1)] + [np.asarray(z, dtype=np.float64) for _, z in pairs])
+    # El primer punto de cada trazo se alcanza con un desplazamiento
+    drawing = np.ones(len(xy), dtype=bool)
+    counts = np.array([len(path) for path, _ in pairs])
+    drawing[0] = False
+    drawing[1 + np.cumsum(counts) - counts] = False
+    return xy, z, drawing
+
+def thickness_levels(z: np.ndarray, drawing: np.ndarray, max_thickness: int = MAX_THICKNESS) -> np.ndarray:
+    """Grosor en px de cada movimiento de dibujo: más fino cuanto más alta la Z"""
+    levels = np.ones(len(z), dtype=np.int64)
+    if max_thickness <= 1 or not drawing.any():
+        return levels
+    z_draw = z[drawing]
+    top, bottom = float(z_draw.max()), float(z_draw.min())
+    if top - bottom <= 1e-9:
+        return levels
+    depth = (top - z) / (top - bottom)
+    levels[drawing] = 1 + np.rint(depth[drawing] * (max_thickness - 1)).astype(np.int64)
+    return levels
+
+def render_moves(xy: np.ndarray, z: np.ndarray, drawing: np.ndarray,
+                 extent: Optional[Tuple[float, float]] = None,
+                 size: int = PREVIEW_SIZE,
+                 max_thickness: int = MAX_THICKNESS,
+                 show_travel: bool = True) -> np.ndarray:
+    """Imagen BGR de los movimientos; extent fija el canvas (ancho, alto) en mm
+
+    Los movimientos consecutivos con el mismo tipo y grosor forman una sola
+    polilínea, y todas las de un mismo grosor se dibujan en una llamada.
+    """
+    low = np.minimum(xy.min(axis=0), 0.0)
+    high = xy.max(axis=0)
+    if extent is not None:
+        high = np.maximum(high, extent)
+    span = max(float((high - low).max()), 1e-9)
+    scale = (size - 2 * PREVIEW_MARGIN) / span
+    width = int(np.ceil((high[0] - low[0]) * scale)) + 2 * PREVIEW_MARGIN
+    height = int(np.ceil((high[1] - low[1]) * scale)) + 2 * PREVIEW_MARGIN
+
+    # Coordenadas de imagen en punto fijo (Y hacia abajo)
+    points = np.empty((len(xy), 2), dtype=np.int32)
+    points[:, 0] = np.rint((PREVIEW_MARGIN + (xy[:, 0] - low[0]) * scale) * (1 << SHIFT))
+    points[:, 1] = np.rint((height - PREVIEW_MARGIN - (xy[:, 1] - low[1]) * scale) * (1 << SHIFT))
+
+    # Categoría del movimiento i (del punto i al i+1): 0 desplazamiento, n grosor
+    travel_alpha = np.zeros((height, width), dtype=np.uint8)
+    draw_alpha = np.zeros((height, width), dtype=np.uint8)
+    category = np.where(drawing, thickness_levels(z, drawing, max_thickness), 0)[1:]
+    if len(category):
+        change = np.flatnonzero(np.diff(category)) + 1
+        run_starts = np.concatenate(([0], change))
+        run_ends = np.append(change, len(category))
+        run_category = category[run_starts]
+
+        for value in np.unique(run_category):
+            if value == 0 and not show_travel:
+                continue
+            selected = np.flatnonzero(run_category == value)
+            runs = [points[start:end + 1] for start, end in zip(run_starts[selected], run_ends[selected])]
+            # Las líneas gruesas de OpenCV cuestan un polígono por segmento: se dibujan
+            # de 1 px y se engrosan con una sola dilatación por nivel
+            layer = travel_alpha if value == 0 else np.zeros_like(draw_alpha)
+            cv2.polylines(layer, runs, False, 255, 1, cv2.LINE_AA, SHIFT)
+            if value > 1:
+                kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (int(value), int(value)))
+                cv2.dilate(layer, kernel, dst=layer)
+            if value > 0:
+                np.maximum(draw_alpha, layer, out=draw_alpha)
+
+    # Mezclar sobre el fondo (primero los desplazamientos y encima el dibujo) con
+    # una tabla indexada por el par de alfas en lugar de aritmética por píxel
+    pair = travel_alpha.astype(np.uint16) << 8
+    pair |= draw_alpha
+    return _blend_table()[pair]
+
+def _blend_table() -> np.ndarray:
+    """Color BGR resultante para cada par (alfa de desplazamiento, alfa de dibujo)"""
+    alpha = np.arange(256, dtype=np.float64) / 255.0
+    background = np.array(BACKGROUND_COLOR, dtype=np.float64)
+    travel = background + (np.array(TRAVEL_COLOR) - background) * alpha[:, None]
+    table = travel[:, None, :] + (np.array(DRAW_COLOR) - travel[:, None, :]) * alpha[None, :, None]
+    return np.rint(table).astype(np.uint8).reshape(-1, 3)
+
+def render_gcode_preview(gcode_paths, output_path: Optional[str] = None,
+                         extent: Optional[Tuple[float, float]] = None, **options) -> str:
+    """Renderiza uno o varios archivos G-code (partes de un trabajo) en un PNG"""
+    if isinstance(gcode_paths, str):
+        gcode_paths = [gcode_paths]
+    output_path = output_path or preview_path(gcode_paths[0])
+    image = render_moves(*read_moves(gcode_paths), extent=extent, **options)
+    if not cv2.imwrite(output_path, image):
+        raise OSError(f"No se pudo escribir la vista previa: {output_path}")
+    return output_path
+
+def render_toolpath_preview(paths: Sequence[np.ndarray], output_path: str,
+                            z_values: Optional[Sequence[np.ndarray]] = None,
+                            extent: Optional[Tuple[float, float]] = None, **options) -> str:
+    """Renderiza polilíneas en mm (con Z opcional por punto) en un PNG"""
+    image = render_moves(*toolpath_moves(paths, z_values), extent=extent, **options)
+    if not cv2.imwrite(output_path, image):
+        raise OSError(f"No se pudo escribir la vista previa: {output_path}")
+    return output_path
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Genera una vista previa PNG de archivos G-code')
+    parser.add_argument('gcode_files', nargs='+', help='Archivo G-code o partes de un mismo trabajo')
+    parser.add_argument('-o', '--output', help='PNG de salida (default: nombre.preview.png)')
+    parser.add_argument('--width', type=float, help='Ancho del canvas en mm (default: extensión del trabajo)')
+    parser.add_argument('--height', type=float, help='Alto del canvas en mm (default: extensión del trabajo)')
+    parser.add_argument('--size', type=int, default=PREVIEW_SIZE,
+                        help=f'Lado mayor de la imagen en px (default: {PREVIEW_SIZE})')
+    parser.add_argument('--max-thickness', type=int, default=MAX_THICKNESS,
+                        help=f'Grosor en px de la Z más baja (default: {MAX_THICKNESS})')
+    parser.add_argument('--no-travel', action='store_true', help='No dibujar los desplazamientos')
+
+    args = parser.parse_args(argv)
+    extent = (args.width or 0.0, args.height or 0.0) if args.width or args.height else None
+
+    start = time.perf_counter()
+    try:
+        path = render_gcode_preview(args.gcode_files, args.output, extent=extent, size=args.size,
+                                    max_thickness=args.max_thickness, show_travel=not args.no_travel)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Vista previa: {path} ({time.perf_counter() - start:.2f}s)")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Regresión contra archivos dorados
+Ejecuta los generadores con semilla fija sobre un corpus de imágenes y todas las
+combinaciones de máquina y perfil, y compara cada G-code con su archivo dorado
+analizando ambos programas con tolerancia numérica (no byte a byte)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from advanced_generator import create_generator, setup_drawing_profiles
+from gcode_validator import iter_gcode_chunks, parse_columns, parse_columns_lines
+from image_to_gcode import HandDrawnGCodeGenerator
+from machine_configs import MACHINE_CONFIGS
+from sharding import makespan_summary, shard_by_region, write_shards
+
+HARNESS_SEED = 1234
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(BASE_DIR, "golden")
+DEFAULT_CORPUS = [os.path.join(BASE_DIR, "test.png")]
+# Casos de reparto por regiones: caso -> (caso base, máquinas); con más máquinas
+# que trazos del corpus, las regiones vacías no deben generar programa
+SHARD_CASES = {"grbl_artistic_reparto4": ("grbl_artistic", 4)}
+
+# Tolerancias por defecto: mm para X, Y y Z, mm/min para F
+POSITION_TOLERANCE = 0.002
+FEED_TOLERANCE = 1.0
+
+AXES = "XYZF"
+_AXIS_CODES = tuple(ord(axis) for axis in AXES)
+_COMMENT_RE = re.compile(rb';[^\n]*|\([^)\n]*\)')
+# Palabras que se comparan con tolerancia; el resto de la línea se compara como texto
+_NUMERIC_WORD_RE = re.compile(rb'[XYZFxyzf][ \t]*[-+]?(?:\d+\.?\d*|\.\d+)')
+
+def _is_program_line(line: bytes) -> bool:
+    """Falso para líneas vacías o que solo contienen un comentario"""
+    head = line.lstrip()[:1]
+    if not head or head == b';':
+        return False
+    return head != b'(' or bool(_COMMENT_RE.sub(b'', line).strip())
+
+def iter_program_blocks(gcode_path: str, chunk_size: int = 512 * 1024
+                        ) -> Iterator[Tuple[np.ndarray, List[bytes]]]:
+    """Bloques de líneas de programa (número de línea y texto) sin líneas vacías ni de comentario"""
+    line_no = 0
+    for chunk in iter_gcode_chunks(gcode_path, chunk_size):
+        lines = chunk.split(b'\n')
+        if chunk.endswith(b'\n'):
+            lines.pop()
+        kept = [i for i, line in enumerate(lines) if _is_program_line(line)]
+        if kept:
+            yield line_no + 1 + np.array(kept), [lines[i] for i in kept]
+        line_no += len(lines)
+
+def parse_rows(lines: List[bytes]) -> Tuple[List[bytes], np.ndarray]:
+    """Resto normalizado (texto sin X Y Z F ni comentarios) y valores X Y Z F de cada línea
+
+    El resto contiene los códigos G y M y las demás palabras, y se compara
+    como texto; los valores ausentes son NaN.
+    """
+    program = b'\n'.join(lines)
+    if b';' in program or b'(' in program:
+        program = _COMMENT_RE.sub(b'', program)
+    residues = [b' '.join(rest.split()).upper() for rest in _NUMERIC_WORD_RE.sub(b'', program).split(b'\n')]
+    columns = parse_columns(program)
+    if columns is None:
+        columns = parse_columns_lines(program.split(b'\n'))
+    return residues, np.column_stack([columns[code] for code in _AXIS_CODES])
+
+class _BlockBuffer:
+    """Líneas de un programa pendientes de comparar, rellenadas bloque a bloque"""
+
+    def __init__(self, blocks: Iterable):
+        self.blocks = iter(blocks)
+        self.numbers = np.zeros(0, dtype=np.int64)
+        self.lines: List[bytes] = []
+
+    def fill(self) -> int:
+        """Líneas disponibles (0 si el programa terminó)"""
+        while not len(self.numbers):
+            block = next(self.blocks, None)
+            if block is None:
+                return 0
+            self.numbers, self.lines = block
+        return len(self.numbers)
+
+    def take(self, count: int) -> Tuple[np.ndarray, List[bytes]]:
+        taken = self.numbers[:count], self.lines[:count]
+        self.numbers, self.lines = self.numbers[count:], self.lines[count:]
+        return taken
+
+def describe_row(residue: bytes, values: np.ndarray) -> str:
+    """Reconstruye una línea de programa para los mensajes"""
+    words = [residue.decode('latin-1')] if residue else []
+    words += [f"{axis}{value:g}" for axis, value in zip(AXES, values) if not np.isnan(value)]
+    return " ".join(words)
+
+class DiffReport:
+    """Resultado de comparar dos programas G-code"""
+
+    def __init__(self, max_reported: int = 20):
+        self.max_reported = max_reported
+        self.mismatches: List[Dict] = []
+        self.mismatch_count = 0
+        self.compared_lines = 0
+        self.length_mismatch: Optional[str] = None
+        self.truncated = False  # se dejó de comparar al llegar a max_reported
+        self.max_deviation = np.zeros(len(AXES))
+        self.elapsed = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.mismatch_count == 0 and self.length_mismatch is None
+
+    def add_mismatch(self, line_a: int, line_b: int, message: str) -> None:
+        self.mismatch_count += 1
+        if len(self.mismatches) < self.max_reported:
+            self.mismatches.append({"line_a": line_a, "line_b": line_b, "message": message})
+
+    def to_dict(self) -> Dict:
+        """Representación serializable en JSON"""
+        return {
+            "ok": self.ok,
+            "compared_lines": self.compared_lines,
+            "mismatch_count": self.mismatch_count,
+            "mismatches": self.mismatches,
+            "length_mismatch": self.length_mismatch,
+            "truncated": self.truncated,
+            "max_deviation": {axis: round(float(value), 6) for axis, value in zip(AXES, self.max_deviation)},
+            "elapsed_s": round(self.elapsed, 3),
+        }
+
+def compare_gcode(path_a: str, path_b: str,
+                  position_tolerance: float = POSITION_TOLERANCE,
+                  feed_tolerance: float = FEED_TOLERANCE,
+                  max_reported: int = 20,
+                  stop_early: bool = True,
+                  chunk_size: int = 512 * 1024) -> DiffReport:
+    """Diff semántico: mismas líneas de programa y valores X Y Z F dentro de tolerancia
+
+    Ambos archivos se recorren a la vez por bloques. Las líneas con el mismo
+    texto se dan por iguales sin analizarlas; solo las distintas se analizan
+    (de forma vectorizada) y se comparan con tolerancia. Con stop_early la
+    comparación termina en cuanto hay max_reported diferencias, así que un
+    archivo grande que diverge pronto se informa enseguida.
+    """
+    report = DiffReport(max_reported)
+    start = time.perf_counter()
+    tolerance = np.array([position_tolerance] * 3 + [feed_tolerance])
+    buffer_a = _BlockBuffer(iter_program_blocks(path_a, chunk_size))
+    buffer_b = _BlockBuffer(iter_program_blocks(path_b, chunk_size))
+
+    while True:
+        available_a, available_b = buffer_a.fill(), buffer_b.fill()
+        count = min(available_a, available_b)
+        if count == 0:
+            if available_a or available_b:
+                longer, buffer = ("A", buffer_a) if available_a else ("B", buffer_b)
+                report.length_mismatch = (f"El programa {longer} continúa en la línea "
+                                          f"{int(buffer.numbers[0])}: {buffer.lines[0].decode('latin-1').strip()}")
+            break
+
+        numbers_a, lines_a = buffer_a.take(count)
+        numbers_b, lines_b = buffer_b.take(count)
+        report.compared_lines += count
+
+        # Las líneas idénticas no necesitan análisis; el resto se analiza en bloque
+        changed = [i for i, (a, b) in enumerate(zip(lines_a, lines_b)) if a != b]
+        if not changed:
+            continue
+        residues_a, values_a = parse_rows([lines_a[i] for i in changed])
+        residues_b, values_b = parse_rows([lines_b[i] for i in changed])
+        missing_a, missing_b = np.isnan(values_a), np.isnan(values_b)
+        deviation = np.abs(np.where(missing_a | missing_b, 0.0, values_a - values_b))
+        np.maximum(report.max_deviation, deviation.max(axis=0), out=report.max_deviation)
+
+        different = (missing_a != missing_b).any(axis=1) | (deviation > tolerance).any(axis=1)
+        different |= np.fromiter((a != b for a, b in zip(residues_a, residues_b)), dtype=bool, count=len(changed))
+        for j in np.flatnonzero(different):
+            i = changed[j]
+            report.add_mismatch(int(numbers_a[i]), int(numbers_b[i]),
+                                f"{describe_row(residues_a[j], values_a[j])}  !=  "
+                                f"{describe_row(residues_b[j], values_b[j])}")
+
+        if stop_early and report.mismatch_count >= max_reported:
+            report.truncated = True
+            break
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def harness_cases() -> List[str]:
+    """Casos: el generador básico, cada combinación máquina_perfil del avanzado y los repartos"""
+    return ["basic"] + [f"{machine}_{profile}"
+                        for machine in MACHINE_CONFIGS for profile in setup_drawing_profiles()] + list(SHARD_CASES)
+
+def build_generator(case: str) -> HandDrawnGCodeGenerator:
+    """Generador de un caso con los valores por defecto (sin config.json local)"""
+    if case == "basic":
+        return HandDrawnGCodeGenerator()
+    machine, profile = case.split("_", 1)
+    return create_generator(machine, profile)
+
+def run_case(image_path: str, case: str, output_path: str) -> List[str]:
+    """Genera el G-code de un caso con semilla fija y sin salida por consola
+
+    Los repartos escriben un programa por máquina (base_maquinaN.gcode).
+    """
+    random.seed(HARNESS_SEED)
+    np.random.seed(HARNESS_SEED)
+    base_case, machines = SHARD_CASES.get(case, (case, 0))
+    generator = build_generator(base_case)
+    generator.seed = HARNESS_SEED
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not machines:
+            return generator.process_image_to_gcode(image_path, output_path)
+        toolpath = generator.get_toolpath(image_path)
+        shards = shard_by_region(generator, toolpath, machines)
+        makespan_summary(generator, toolpath, shards)
+        return [path for paths in write_shards(generator, shards, output_path, max_workers=1) for path in paths]
+
+def golden_path(golden_dir: str, image_path: str, case: str) -> str:
+    """golden/<imagen>/<caso>.gcode"""
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(golden_dir, stem, f"{case}.gcode")
+
+def run_harness(images: List[str], golden_dir: str = GOLDEN_DIR,
+                cases: Optional[List[str]] = None, update: bool = False,
+                **compare_options) -> Dict[str, Dict]:
+    """Ejecuta todos los casos sobre el corpus y los compara (o actualiza) con los dorados"""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="golden_") as workdir:
+        for image_path in images:
+            for case in cases or harness_cases():
+                golden_dir_case = os.path.dirname(golden_path(golden_dir, image_path, case))
+                start = time.perf_counter()
+                try:
+                    outputs = run_case(image_path, case, os.path.join(workdir, f"{case}.gcode"))
+                except Exception as e:
+                    name = os.path.relpath(golden_path(golden_dir, image_path, case), golden_dir)
+                    results[name] = {"status": "error", "message": str(e)}
+                    continue
+
+                # Un caso puede escribir varios programas: cada uno con su dorado del mismo nombre
+                for output in outputs:
+                    golden = os.path.join(golden_dir_case, os.path.basename(output))
+                    name = os.path.relpath(golden, golden_dir)
+                    if update:
+                        os.makedirs(golden_dir_case, exist_ok=True)
+                        shutil.copyfile(output, golden)
+                        results[name] = {"status": "updated"}
+                    elif not os.path.exists(golden):
+                        results[name] = {"status": "missing"}
+                    else:
+                        report = compare_gcode(golden, output, **compare_options)
+                        results[name] = {"status": "ok" if report.ok else "diff", "report": report.to_dict()}
+                    results[name]["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return results
+
+def print_diff(report: Dict, indent: str = "  ") -> None:
+    """Muestra las diferencias de un DiffReport.to_dict()"""
+    for mismatch in report["mismatches"]:
+        print(f"{indent}línea {mismatch['line_a']}/{mismatch['line_b']}: {mismatch['message']}")
+    if report["length_mismatch"]:
+        print(f"{indent}{report['length_mismatch']}")
+    if report["truncated"]:
+        print(f"{indent}... (comparación detenida tras {report['mismatch_count']} diferencias)")
+
+def print_results(results: Dict[str, Dict]) -> None:
+    """Resumen por caso en consola"""
+    symbols = {"ok": "✓", "updated": "↻", "diff": "✗", "missing": "?", "error": "✗"}
+    for name, result in results.items():
+        status = result["status"]
+        detail = ""
+        if status == "diff":
+            detail = f" ({result['report']['mismatch_count']} diferencias)"
+        elif status == "error":
+            detail = f" ({result['message']})"
+        elif status == "missing":
+            detail = " (sin archivo dorado; ejecutar con --update)"
+        print(f"{symbols[status]} {name}{detail}")
+        if status == "diff":
+            print_diff(result["report"])
+    failed = sum(result["status"] in ("diff", "missing", "error") for result in results.values())
+    print(f"\n{len(results) - failed}/{len(results)} casos correctos")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compara la salida de los generadores con archivos dorados')
+    parser.add_argument('--images', nargs='+', default=DEFAULT_CORPUS,
+                        help='Imágenes del corpus (default: test.png)')
+    parser.add_argument('--golden-dir', default=GOLDEN_DIR, help='Directorio de archivos dorados (default: golden/)')
+    parser.add_argument('--cases', nargs='+', help='Casos a ejecutar, p. ej. basic grbl_artistic (default: todos)')
+    parser.add_argument('--update', action='store_true', help='Regenerar los archivos dorados')
+    parser.add_argument('--diff', nargs=2, metavar=('A', 'B'), help='Solo comparar dos archivos G-code')
+    parser.add_argument('--tolerance', type=float, default=POSITION_TOLERANCE,
+                        help=f'Tolerancia de X, Y y Z en mm (default: {POSITION_TOLERANCE})')
+    parser.add_argument('--feed-tolerance', type=float, default=FEED_TOLERANCE,
+                        help=f'Tolerancia de F en mm/min (default: {FEED_TOLERANCE})')
+    parser.add_argument('--max-reported', type=int, default=20,
+                        help='Diferencias por caso antes de detener la comparación (default: 20)')
+    parser.add_argument('--json', action='store_true', help='Salida en formato JSON')
+
+    args = parser.parse_args(argv)
+    compare_options = {"position_tolerance": args.tolerance, "feed_tolerance": args.feed_tolerance,
+                       "max_reported": args.max_reported}
+
+    if args.diff:
+        try:
+            report = compare_gcode(*args.diff, **compare_options).to_dict()
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        if args.json:
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            print_diff(report, indent="")
+            print(f"{'✓ Equivalentes' if report['ok'] else '✗ Distintos'}: {report['compared_lines']} "
+                  f"líneas comparadas en {report['elapsed_s']}s, desviación máxima {report['max_deviation']}")
+        return 0 if report["ok"] else 1
+
+    unknown = set(args.cases or []) - set(harness_cases())
+    if unknown:
+        print(f"Error: casos desconocidos: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 1
+
+    results = run_harness(args.images, args.golden_dir, args.cases, args.update, **compare_options)
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print_results(results)
+    return 0 if all(result["status"] in ("ok", "updated") for result in results.values()) else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Reparto de un trabajo entre varias máquinas iguales
+Divide la trayectoria ordenada en N programas de duración estimada parecida,
+por regiones del canvas (bisección recursiva ponderada por duración) o por
+capas de color (la capa más larga primero a la máquina menos cargada). Cada
+programa lleva el header y el footer completos de la máquina y se escriben
+en paralelo. Una región usa coordenadas propias con el origen en su esquina
+(indicada en el header); las capas comparten el marco del canvas completo
+"""
+
+import argparse
+import copy
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from advanced_generator import create_generator
+from color_layers import separate_colors
+from config_loader import load_config
+from image_to_gcode import HandDrawnGCodeGenerator
+from job_metrics import format_duration
+
+# Modos de reparto
+SHARD_REGION = "region"
+SHARD_LAYER = "layer"
+
+Layer = Tuple[List[str], List[np.ndarray]]
+
+class Shard:
+    """Parte del trabajo para una máquina: capas (líneas previas, trayectoria normalizada)
+
+    La trayectoria está normalizada al marco de la parte: origin (mm del canvas
+    completo) y size (mm); size None es el canvas completo.
+    """
+
+    def __init__(self, number: int, label: str, layers: List[Layer],
+                 origin: Tuple[float, float] = (0.0, 0.0), size: Optional[Tuple[float, float]] = None):
+        self.number = number
+        self.label = label
+        self.layers = layers
+        self.origin = origin
+        self.size = size
+        self.estimated_seconds = 0.0
+
+    @property
+    def stroke_count(self) -> int:
+        return sum(len(toolpath) for _, toolpath in self.layers)
+
+def nominal_strokes(generator: HandDrawnGCodeGenerator, paths: Sequence[np.ndarray]) -> list:
+    """Trazos a la altura base y al avance nominal, sin ruido: solo longitudes y avances"""
+    return [(path, np.full(len(path), generator.z_draw_base), np.full(len(path), int(generator.feed_rate)))
+            if len(path) >= 2 else None for path in paths]
+
+def estimate_stroke_seconds(generator: HandDrawnGCodeGenerator, paths: Sequence[np.ndarray]) -> np.ndarray:
+    """Duración estimada de cada trazo en mm (dibujo, desplazamiento previo, bajada y subida)"""
+    return np.array(generator.create_job_metrics().add_strokes(nominal_strokes(generator, paths)))
+
+def estimate_job_seconds(generator: HandDrawnGCodeGenerator, paths: Sequence[np.ndarray]) -> float:
+    """Duración estimada de un programa con estos trazos en este orden, con el regreso al origen"""
+    metrics = generator.create_job_metrics()
+    metrics.add_strokes(nominal_strokes(generator, paths))
+    metrics.finish()
+    return metrics.estimated_seconds
+
+def path_centers(paths: Sequence[np.ndarray]) -> np.ndarray:
+    """Centro (media de los puntos) de cada polilínea, en una pasada sobre todos los puntos"""
+    if not paths:
+        return np.zeros((0, 2))
+    sizes = np.array([len(path) for path in paths])
+    starts = np.cumsum(sizes) - sizes
+    return np.add.reduceat(np.concatenate(paths), starts) / sizes[:, None]
+
+def split_regions(centers: np.ndarray, weights: np.ndarray, bounds: Tuple[float, float, float, float],
+                  count: int, indices: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, tuple]]:
+    """Divide los trazos en count rectángulos de peso parecido por bisección recursiva
+
+    Cada corte va por el lado más largo del rectángulo y reparte el peso en
+    proporción al número de máquinas de cada mitad. Los trazos se asignan
+    por su centro y no se cortan, así que pueden asomar fuera de su región.
+    Devuelve (índices en orden creciente, (x0, y0, x1, y1)) por región.
+    """
+    if indices is None:
+        indices = np.arange(len(centers))
+    if count == 1:
+        return [(indices, bounds)]
+
+    x0, y0, x1, y1 = bounds
+    axis = 0 if x1 - x0 >= y1 - y0 else 1
+    low_count = count // 2
+    order = indices[np.argsort(centers[indices, axis], kind="stable")]
+    cumulative = np.concatenate(([0.0], np.cumsum(weights[order])))
+    # Número de trazos de la primera mitad cuyo peso más se acerca al objetivo
+    split = int(np.abs(cumulative - cumulative[-1] * low_count / count).argmin())
+    if 0 < split < len(order):
+        cut = (centers[order[split - 1], axis] + centers[order[split], axis]) / 2
+    else:
+        cut = (bounds[axis] + bounds[axis + 2]) / 2
+    low_bounds = (x0, y0, cut, y1) if axis == 0 else (x0, y0, x1, cut)
+    high_bounds = (cut, y0, x1, y1) if axis == 0 else (x0, cut, x1, y1)
+    return (split_regions(centers, weights, low_bounds, low_count, np.sort(order[:split])) +
+            split_regions(centers, weights, high_bounds, count - low_count, np.sort(order[split:])))
+
+def assign_layers(weights: Sequence[float], count: int) -> List[List[int]]:
+    """Reparte capas enteras entre count máquinas: la más larga primero a la menos cargada
+
+    Cada máquina conserva el orden original de sus capas (de clara a oscura).
+    """
+    loads = np.zeros(count)
+    assigned: List[List[int]] = [[] for _ in range(count)]
+    for layer in sorted(range(len(weights)), key=lambda i: -weights[i]):
+        machine = int(loads.argmin())
+        loads[machine] += weights[layer]
+        assigned[machine].append(layer)
+    return [sorted(layers) for layers in assigned]
+
+def number_shards(shards: List[Shard]) -> List[Shard]:
+    """Descarta las partes sin trazos y numera las demás de forma consecutiva"""
+    shards = [shard for shard in shards if shard.stroke_count]
+    for number, shard in enumerate(shards, 1):
+        shard.number = number
+    return shards
+
+def shard_generator(generator: HandDrawnGCodeGenerator, shard: Shard) -> HandDrawnGCodeGenerator:
+    """Copia del generador con el canvas de la parte (las métricas no se comparten)"""
+    shard_gen = copy.copy(generator)
+    if shard.size is not None:
+        shard_gen.canvas_width, shard_gen.canvas_height = shard.size
+    return shard_gen
+
+def shard_by_region(generator: HandDrawnGCodeGenerator, toolpath: List[np.ndarray], count: int) -> List[Shard]:
+    """Reparte una trayectoria normalizada en count regiones del canvas de duración parecida
+
+    Cada región se desplaza a su propio origen: la máquina se coloca en la
+    esquina de la región y dibuja desde X0 Y0. El marco incluye los trazos que
+    sobresalen de la región (se asignan por su centro).
+    """
+    paths = [generator.scale_path(path) for path in toolpath]
+    weights = estimate_stroke_seconds(generator, paths)
+    bounds = (0.0, 0.0, generator.canvas_width, generator.canvas_height)
+    shards = []
+    for indices, (x0, y0, x1, y1) in split_regions(path_centers(paths), weights, bounds, count):
+        # Una región en blanco (o más máquinas que trazos) no genera programa
+        if not len(indices):
+            continue
+        points = np.concatenate([paths[i] for i in indices])
+        low = np.minimum((x0, y0), points.min(axis=0))
+        size = np.maximum(np.maximum((x1, y1), points.max(axis=0)) - low, 1e-9)
+        label = f"región X{x0:.1f}-{x1:.1f} Y{y0:.1f}-{y1:.1f} mm"
+        shards.append(Shard(0, label, [([], [(paths[i] - low) / size for i in indices])],
+                            origin=(float(low[0]), float(low[1])), size=(float(size[0]), float(size[1]))))
+    return number_shards(shards)
+
+def shard_by_layer(generator: HandDrawnGCodeGenerator, layers: List[Layer], count: int) -> List[Shard]:
+    """Reparte capas (líneas de cambio de herramienta, trayectoria) entre count máquinas"""
+    weights = [float(estimate_stroke_seconds(generator, [generator.scale_path(path) for path in toolpath]).sum())
+               for _, toolpath in layers]
+    shards = [Shard(0, f"{'capa' if len(members) == 1 else 'capas'} {', '.join(str(i + 1) for i in members)}",
+                    [layers[i] for i in members])
+              for members in assign_layers(weights, count)]
+    return number_shards(shards)
+
+def shard_output_path(output_path: str, number: int) -> str:
+    """Nombre del programa de una máquina: base_maquina1.gcode"""
+    base, ext = os.path.splitext(output_path)
+    if ext in ('.gz', '.xz'):
+        base, inner = os.path.splitext(base)
+        ext = inner + ext
+    return f"{base}_maquina{number}{ext or '.gcode'}"
+
+def makespan_summary(generator: HandDrawnGCodeGenerator, toolpath: List[np.ndarray],
+                     shards: Sequence[Shard]) -> dict:
+    """Duración estimada de cada parte y del trabajo completo (toolpath) en una sola máquina
+
+    El makespan es la duración de la parte más larga: el tiempo hasta que
+    terminan todas las máquinas si empiezan a la vez.
+    """
+    for shard in shards:
+        shard_gen = shard_generator(generator, shard)
+        paths = [shard_gen.scale_path(path) for _, shard_toolpath in shard.layers for path in shard_toolpath]
+        shard.estimated_seconds = estimate_job_seconds(shard_gen, paths)
+    single = estimate_job_seconds(generator, [generator.scale_path(path) for path in toolpath])
+    makespan = max((shard.estimated_seconds for shard in shards), default=0.0)
+    mean = sum(shard.estimated_seconds for shard in shards) / len(shards) if shards else 0.0
+    return {
+        "single_seconds": single,
+        "makespan_seconds": makespan,
+        "speedup": single / makespan if makespan > 0 else 0.0,
+        "balance": mean / makespan if makespan > 0 else 1.0,
+    }
+
+def write_shard(generator: HandDrawnGCodeGenerator, shard: Shard, output_path: str, total: int) -> List[str]:
+    """Escribe el programa de una parte con una copia del generador (las métricas no se comparten)"""
+    first_lines, first_toolpath = shard.layers[0]
+    intro = [f"; Máquina {shard.number} de {total} ({shard.label}): "
+             f"{shard.stroke_count} trazos, estimado {format_duration(shard.estimated_seconds)}"]
+    if shard.size is None:
+        intro.append("; Coordenadas del canvas completo (origen compartido por todas las máquinas)")
+    else:
+        intro.append(f"; Origen X0 Y0 = X{shard.origin[0]:.3f} Y{shard.origin[1]:.3f} mm del canvas completo; "
+                     f"área {shard.size[0]:.1f}x{shard.size[1]:.1f} mm")
+    layers = [(intro + first_lines, first_toolpath)] + shard.layers[1:]
+    return shard_generator(generator, shard).write_layers_gcode(layers, shard_output_path(output_path, shard.number))
+
+def write_shards(generator: HandDrawnGCodeGenerator, shards: Sequence[Shard], output_path: str,
+                 max_workers: Optional[int] = None) -> List[List[str]]:
+    """Escribe los programas de todas las partes en paralelo; devuelve los archivos de cada una"""
+    workers = max_workers or min(len(shards), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(workers, thread_name_prefix="shard") as executor:
+        return list(executor.map(lambda shard: write_shard(generator, shard, output_path, len(shards)), shards))
+
+def print_makespan(shards: Sequence[Shard], summary: dict) -> None:
+    """Muestra la duración de cada máquina y la mejora frente a una sola"""
+    for shard in shards:
+        origin = (f", origen X{shard.origin[0]:.1f} Y{shard.origin[1]:.1f} mm"
+                  if shard.size is not None else "")
+        print(f"Máquina {shard.number} ({shard.label}{origin}): {shard.stroke_count} trazos, "
+              f"{format_duration(shard.estimated_seconds)}")
+    print(f"Una máquina: {format_duration(summary['single_seconds'])}; "
+          f"{len(shards)} máquina{'s' if len(shards) > 1 else ''}: {format_duration(summary['makespan_seconds'])} "
+          f"({summary['speedup']:.2f}x, equilibrio {summary['balance']:.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Reparte un trabajo entre varias máquinas iguales con duraciones equilibradas',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  %(prog)s mural.png --machines 3 --width 600 --height 400 -o mural.gcode
+  %(prog)s retrato.jpg --machines 2 --mode layer --colors 4
+        """
+    )
+    parser.add_argument('input_image', help='Imagen o SVG de entrada')
+    parser.add_argument('-o', '--output', help='Base de los archivos de salida (default: nombre_reparto.gcode)')
+    parser.add_argument('--machines', type=int, default=2, help='Número de máquinas (default: 2)')
+    parser.add_argument('--mode', choices=[SHARD_REGION, SHARD_LAYER], default=SHARD_REGION,
+                        help='Repartir por regiones del canvas o por capas de color (default: region)')
+    parser.add_argument('--colors', type=int, default=4, help='Colores en el modo por capas (default: 4)')
+    parser.add_argument('--pens', help='Colores de las plumas en el modo por capas, p. ej. "#000000,#ff0000"')
+    parser.add_argument('--machine', default='grbl', help='Tipo de máquina (default: grbl)')
+    parser.add_argument('--profile', default='artistic', help='Perfil de dibujo (default: artistic)')
+    parser.add_argument('--width', type=float, default=200.0, help='Ancho del canvas en mm (default: 200)')
+    parser.add_argument('--height', type=float, default=200.0, help='Alto del canvas en mm (default: 200)')
+    parser.add_argument('--config', help='Archivo de configuración (default: config.json)')
+    parser.add_argument('--workers', type=int, help='Hilos de escritura de los programas (default: CPUs)')
+
+    args = parser.parse_args()
+    if args.machines < 1:
+        print("Error: --machines debe ser al menos 1", file=sys.stderr)
+        return 1
+    if not args.output:
+        args.output = f"{os.path.splitext(os.path.basename(args.input_image))[0]}_reparto.gcode"
+
+    generator = create_generator(args.machine, args.profile, load_config(args.config),
+                                 canvas_width=args.width, canvas_height=args.height)
+    try:
+        if args.mode == SHARD_LAYER:
+            layers = separate_colors(generator, args.input_image, args.colors,
+                                     args.pens.split(',') if args.pens else None)
+            layers = [(generator.generate_tool_change_lines(number, layer.hex), layer.toolpath)
+                      for number, layer in enumerate(layers, 1)]
+            toolpath = [path for _, layer_toolpath in layers for path in layer_toolpath]
+            shards = shard_by_layer(generator, layers, args.machines)
+        else:
+            toolpath = generator.get_toolpath(args.input_image)
+            shards = shard_by_region(generator, toolpath, args.machines)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not shards:
+        print("Error: la imagen no tiene trazos que repartir", file=sys.stderr)
+        return 1
+    if len(shards) < args.machines:
+        print(f"Aviso: solo hay trabajo para {len(shards)} de {args.machines} máquinas")
+
+    summary = makespan_summary(generator, toolpath, shards)
+    write_shards(generator, shards, args.output, args.workers)
+    print_makespan(shards, summary)
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
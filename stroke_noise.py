@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Ruido coherente precalculado para los efectos de trazo manual
+Tablas de ruido 1/f muestreadas por longitud de arco a lo largo de cada trazo
+"""
+
+import numpy as np
+from typing import Optional
+
+class NoiseTable:
+    """Tabla periódica de ruido 1/f^exponent normalizada a [-1, 1]
+
+    La tabla contiene frecuencias entre 1/longitud_tabla y max_frequency
+    (ciclos por mm). Muestrear una posición cuesta una interpolación lineal.
+    """
+
+    def __init__(self, rng: np.random.Generator, max_frequency: float,
+                 exponent: float = 1.0, size: int = 4096, samples_per_cycle: int = 4):
+        self.size = size
+        # mm entre muestras: la frecuencia de corte queda a samples_per_cycle muestras por ciclo
+        self.step = 1.0 / (samples_per_cycle * max(max_frequency, 1e-6))
+
+        # Ruido blanco en frecuencia, con amplitud ∝ f^(-exponent/2) y sin armónicos por encima del corte
+        freqs = np.fft.rfftfreq(size)
+        spectrum = rng.normal(size=len(freqs)) + 1j * rng.normal(size=len(freqs))
+        spectrum[0] = 0.0
+        spectrum[1:] /= freqs[1:] ** (exponent / 2.0)
+        spectrum[freqs > 1.0 / samples_per_cycle] = 0.0
+
+        table = np.fft.irfft(spectrum, size)
+        peak = np.abs(table).max()
+        self.table = table / peak if peak > 0 else table
+
+    @property
+    def length_mm(self) -> float:
+        """Longitud en mm antes de que la tabla se repita"""
+        return self.size * self.step
+
+    def sample(self, positions: np.ndarray, offset: float = 0.0) -> np.ndarray:
+        """Muestrea la tabla en posiciones de longitud de arco (mm)"""
+        index = (positions + offset) / self.step
+        base = np.floor(index)
+        frac = index - base
+        i0 = base.astype(np.int64) % self.size
+        i1 = (i0 + 1) % self.size
+        return self.table[i0] * (1.0 - frac) + self.table[i1] * frac
+
+class StrokeNoise:
+    """Juego de tablas de un trabajo: temblor X/Y, presión y velocidad"""
+
+    def __init__(self,
+                 seed: Optional[int] = None,
+                 tremor_frequency: float = 0.5,  # ciclos/mm
+                 pressure_frequency: float = 0.05,  # ciclos/mm
+                 speed_frequency: float = 0.05,  # ciclos/mm
+                 exponent: float = 1.0):
+        self.rng = np.random.default_rng(seed)
+        self.params = (tremor_frequency, pressure_frequency, speed_frequency, exponent)
+        self.tremor_x = NoiseTable(self.rng, tremor_frequency, exponent)
+        self.tremor_y = NoiseTable(self.rng, tremor_frequency, exponent)
+        self.pressure = NoiseTable(self.rng, pressure_frequency, exponent)
+        self.speed = NoiseTable(self.rng, speed_frequency, exponent)
+
+    def stroke_offsets(self) -> np.ndarray:
+        """Desplazamientos aleatorios de cada tabla para que cada trazo sea distinto"""
+        lengths = np.array([self.tremor_x.length_mm, self.tremor_y.length_mm,
+                            self.pressure.length_mm, self.speed.length_mm])
+        return self.rng.random(4) * lengths
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Entrada vectorial SVG
+Lee trazados, líneas, polilíneas, polígonos, rectángulos, círculos y elipses
+con el parser XML de la biblioteca estándar, aplica las transformaciones y
+aproxima las curvas por polilíneas con una tolerancia en mm. Todas las
+curvas se convierten a Bézier cúbicas y se subdividen a la vez: el número de
+tramos de cada segmento se calcula de forma vectorizada según su curvatura
+"""
+
+import math
+import re
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+SVG_EXTENSIONS = ('.svg',)
+
+# Elementos cuyo contenido no se dibuja directamente
+HIDDEN_CONTAINERS = {'defs', 'clipPath', 'mask', 'symbol', 'marker', 'pattern',
+                     'metadata', 'title', 'desc', 'style', 'script'}
+
+# Tramos máximos por segmento (protege de tolerancias absurdamente pequeñas)
+MAX_SUBDIVISIONS = 1024
+
+_NUMBER = re.compile(r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+_PATH_COMMAND = re.compile(r"([MmZzLlHhVvCcSsQqTtAa])([^MmZzLlHhVvCcSsQqTtAa]*)")
+# Números por grupo de argumentos de cada comando
+_ARITY = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7}
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+
+# Transformación afín (a, b, c, d, e, f) como en matrix(): x' = a x + c y + e, y' = b x + d y + f
+Affine = Tuple[float, float, float, float, float, float]
+IDENTITY: Affine = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+def is_svg_file(path: str) -> bool:
+    return path.lower().endswith(SVG_EXTENSIONS)
+
+def _local_name(tag: str) -> str:
+    """Nombre del elemento sin el espacio de nombres ({http://www.w3.org/2000/svg}path -> path)"""
+    return tag.rpartition('}')[2]
+
+def parse_length(text: Optional[str]) -> Optional[float]:
+    """Longitud SVG como número (las unidades se ignoran: solo importa la proporción)"""
+    if not text:
+        return None
+    match = _NUMBER.match(text.strip())
+    return float(match.group()) if match else None
+
+def compose(outer: Affine, inner: Affine) -> Affine:
+    """Transformación equivalente a aplicar inner y después outer"""
+    a, b, c, d, e, f = outer
+    a2, b2, c2, d2, e2, f2 = inner
+    return (a * a2 + c * b2, b * a2 + d * b2, a * c2 + c * d2, b * c2 + d * d2,
+            a * e2 + c * f2 + e, b * e2 + d * f2 + f)
+
+def parse_transform(text: Optional[str]) -> Affine:
+    """Transformación afín del atributo transform"""
+    matrix = IDENTITY
+    if not text:
+        return matrix
+    for name, args in _TRANSFORM.findall(text):
+        values = [float(v) for v in _NUMBER.findall(args)]
+        if name == 'matrix' and len(values) == 6:
+            step = tuple(values)
+        elif name == 'translate' and values:
+            step = (1.0, 0.0, 0.0, 1.0, values[0], values[1] if len(values) > 1 else 0.0)
+        elif name == 'scale' and values:
+            step = (values[0], 0.0, 0.0, values[1] if len(values) > 1 else values[0], 0.0, 0.0)
+        elif name == 'rotate' and values:
+            angle = math.radians(values[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            cx, cy = (values[1], values[2]) if len(values) >= 3 else (0.0, 0.0)
+            step = (cos, sin, -sin, cos, cx - cos * cx + sin * cy, cy - sin * cx - cos * cy)
+        elif name == 'skewX' and values:
+            step = (1.0, 0.0, math.tan(math.radians(values[0])), 1.0, 0.0, 0.0)
+        elif name == 'skewY' and values:
+            step = (1.0, math.tan(math.radians(values[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        matrix = compose(matrix, step)
+    return matrix
+
+def _line(p0: Tuple[float, float], p1: Tuple[float, float]) -> Tuple[float, ...]:
+    """Recta como cúbica degenerada (curvatura nula: se emite en un solo tramo)"""
+    dx, dy = p1[0] - p0[0], p1[1] - p0[1]
+    return (p0[0], p0[1], p0[0] + dx / 3, p0[1] + dy / 3,
+            p0[0] + 2 * dx / 3, p0[1] + 2 * dy / 3, p1[0], p1[1])
+
+def _quadratic(p0, q, p1) -> Tuple[float, ...]:
+    """Cuadrática elevada a cúbica (exacta)"""
+    return (p0[0], p0[1], p0[0] + 2 * (q[0] - p0[0]) / 3, p0[1] + 2 * (q[1] - p0[1]) / 3,
+            p1[0] + 2 * (q[0] - p1[0]) / 3, p1[1] + 2 * (q[1] - p1[1]) / 3, p1[0], p1[1])
+
+def arc_to_cubics(p0, rx: float, ry: float, rotation: float, large_arc: bool,
+                  sweep: bool, p1) -> List[Tuple[float, ...]]:
+    """Arco elíptico de SVG en cúbicas de como mucho 90° (conversión del apéndice F.6.5)"""
+    if p0 == p1:
+        return []
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return [_line(p0, p1)]
+    phi = math.radians(rotation)
+    cos, sin = math.cos(phi), math.sin(phi)
+    hx, hy = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1, y1 = cos * hx + sin * hy, -sin * hx + cos * hy
+    # Radios demasiado pequeños se amplían hasta que el arco sea posible
+    scale = x1 * x1 / (rx * rx) + y1 * y1 / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    numerator = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    denominator = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    factor = math.sqrt(max(numerator, 0.0) / denominator) if denominator else 0.0
+    if large_arc == sweep:
+        factor = -factor
+    cxp, cyp = factor * rx * y1 / ry, -factor * ry * x1 / rx
+    cx = cos * cxp - sin * cyp + (p0[0] + p1[0]) / 2
+    cy = sin * cxp + cos * cyp + (p0[1] + p1[1]) / 2
+
+    theta = math.atan2((y1 - cyp) / ry, (x1 - cxp) / rx)
+    end = math.atan2((-y1 - cyp) / ry, (-x1 - cxp) / rx)
+    delta = end - theta
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    return ellipse_cubics(cx, cy, rx, ry, phi, theta, delta)
+
+def ellipse_cubics(cx: float, cy: float, rx: float, ry: float, phi: float,
+                   theta: float, delta: float) -> List[Tuple[float, ...]]:
+    """Cúbicas que aproximan un arco de elipse de ángulo delta desde theta"""
+    pieces = max(1, int(math.ceil(abs(delta) / (math.pi / 2) - 1e-9)))
+    step = delta / pieces
+    k = 4.0 / 3.0 * math.tan(step / 4)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+
+    def point(ex: float, ey: float) -> Tuple[float, float]:
+        return (cx + cos_phi * ex - sin_phi * ey, cy + sin_phi * ex + cos_phi * ey)
+
+    cubics = []
+    for i in range(pieces):
+        a0, a1 = theta + i * step, theta + (i + 1) * step
+        c0, s0, c1, s1 = math.cos(a0), math.sin(a0), math.cos(a1), math.sin(a1)
+        p0 = point(rx * c0, ry * s0)
+        q0 = point(rx * (c0 - k * s0), ry * (s0 + k * c0))
+        q1 = point(rx * (c1 + k * s1), ry * (s1 - k * c1))
+        p1 = point(rx * c1, ry * s1)
+        cubics.append(p0 + q0 + q1 + p1)
+    return cubics
+
+def _arc_arguments(text: str) -> List[float]:
+    """Argumentos de A en grupos de 7; las banderas pueden ir pegadas ("0 01 10 10")"""
+    values: List[float] = []
+    pending = _NUMBER.findall(text)[::-1]
+    while pending:
+        token = pending.pop()
+        if len(values) % 7 in (3, 4) and len(token) > 1 and token[0] in '01':
+            pending.append(token[1:])
+            token = token[0]
+        values.append(float(token))
+    return values
+
+def path_to_cubics(data: str) -> List[List[Tuple[float, ...]]]:
+    """Subtrazados del atributo d como listas de cúbicas (x0, y0, x1, y1, x2, y2, x3, y3)
+
+    Cada comando y sus números se extraen con una expresión regular. Un grupo
+    de argumentos incompleto termina el trazado, como hacen los navegadores,
+    conservando lo leído hasta entonces.
+    """
+    subpaths: List[List[Tuple[float, ...]]] = []
+    current: List[Tuple[float, ...]] = []
+    position = start = (0.0, 0.0)
+    last_control = None  # segundo punto de control para S/T
+    previous = None
+    for command, arguments in _PATH_COMMAND.findall(data):
+        upper = command.upper()
+        if upper == 'Z':
+            if position != start:
+                current.append(_line(position, start))
+            if current:
+                subpaths.append(current)
+            current = []
+            position = start
+            last_control, previous = None, 'Z'
+            continue
+
+        values = _arc_arguments(arguments) if upper == 'A' else [float(v) for v in _NUMBER.findall(arguments)]
+        arity = _ARITY[upper]
+        relative = command.islower()
+        for group in range(len(values) // arity):
+            v = values[group * arity:(group + 1) * arity]
+            ox, oy = position if relative else (0.0, 0.0)
+            if upper == 'M':
+                point = (v[0] + ox, v[1] + oy)
+                if group == 0:
+                    if current:
+                        subpaths.append(current)
+                    current = []
+                    start = point
+                else:
+                    # Las coordenadas tras un M son rectas implícitas
+                    current.append(_line(position, point))
+                last_control = None
+            elif upper == 'L':
+                point = (v[0] + ox, v[1] + oy)
+                current.append(_line(position, point))
+                last_control = None
+            elif upper == 'H':
+                point = (v[0] + ox, position[1])
+                current.append(_line(position, point))
+                last_control = None
+            elif upper == 'V':
+                point = (position[0], v[0] + (position[1] if relative else 0.0))
+                current.append(_line(position, point))
+                last_control = None
+            elif upper in 'CS':
+                if upper == 'C':
+                    c1 = (v[0] + ox, v[1] + oy)
+                    v = v[2:]
+                elif last_control is not None and previous in 'CS':
+                    c1 = (2 * position[0] - last_control[0], 2 * position[1] - last_control[1])
+                else:
+                    c1 = position
+                c2 = (v[0] + ox, v[1] + oy)
+                point = (v[2] + ox, v[3] + oy)
+                current.append(position + c1 + c2 + point)
+                last_control = c2
+            elif upper in 'QT':
+                if upper == 'Q':
+                    q = (v[0] + ox, v[1] + oy)
+                    v = v[2:]
+                elif last_control is not None and previous in 'QT':
+                    q = (2 * position[0] - last_control[0], 2 * position[1] - last_control[1])
+                else:
+                    q = position
+                point = (v[0] + ox, v[1] + oy)
+                current.append(_quadratic(position, q, point))
+                last_control = q
+            else:
+                point = (v[5] + ox, v[6] + oy)
+                current.extend(arc_to_cubics(position, v[0], v[1], v[2], v[3] != 0, v[4] != 0, point))
+                last_control = None
+            position = point
+            previous = upper
+        if len(values) % arity or not values:
+            break
+    if current:
+        subpaths.append(current)
+    return subpaths
+
+def _points(text: Optional[str]) -> List[Tuple[float, float]]:
+    values = [float(v) for v in _NUMBER.findall(text or "")]
+    return list(zip(values[0::2], values[1::2]))
+
+def shape_to_cubics(name: str, attrib: dict) -> List[List[Tuple[float, ...]]]:
+    """Subtrazados de un elemento de forma básica (o de un path)"""
+    def number(key: str) -> float:
+        return parse_length(attrib.get(key)) or 0.0
+
+    if name == 'path':
+        return path_to_cubics(attrib.get('d', ''))
+    if name == 'line':
+        return [[_line((number('x1'), number('y1')), (number('x2'), number('y2')))]]
+    if name in ('polyline', 'polygon'):
+        points = _points(attrib.get('points'))
+        if name == 'polygon' and len(points) > 2:
+            points.append(points[0])
+        segments = [_line(p0, p1) for p0, p1 in zip(points, points[1:])]
+        return [segments] if segments else []
+    if name in ('circle', 'ellipse'):
+        cx, cy = number('cx'), number('cy')
+        rx = number('r') if name == 'circle' else number('rx')
+        ry = number('r') if name == 'circle' else number('ry')
+        if rx <= 0 or ry <= 0:
+            return []
+        return [ellipse_cubics(cx, cy, rx, ry, 0.0, 0.0, 2 * math.pi)]
+    if name == 'rect':
+        x, y, width, height = number('x'), number('y'), number('width'), number('height')
+        if width <= 0 or height <= 0:
+            return []
+        rx = parse_length(attrib.get('rx'))
+        ry = parse_length(attrib.get('ry'))
+        rx, ry = (rx if rx is not None else ry or 0.0), (ry if ry is not None else rx or 0.0)
+        rx, ry = min(rx, width / 2), min(ry, height / 2)
+        if rx <= 0 or ry <= 0:
+            corners = [(x, y), (x + width, y), (x + width, y + height), (x, y + height), (x, y)]
+            return [[_line(p0, p1) for p0, p1 in zip(corners, corners[1:])]]
+        return path_to_cubics(
+            f"M{x + rx},{y} H{x + width - rx} A{rx},{ry} 0 0 1 {x + width},{y + ry} "
+            f"V{y + height - ry} A{rx},{ry} 0 0 1 {x + width - rx},{y + height} "
+            f"H{x + rx} A{rx},{ry} 0 0 1 {x},{y + height - ry} V{y + ry} A{rx},{ry} 0 0 1 {x + rx},{y} Z")
+    return []
+
+def _is_hidden(attrib: dict) -> bool:
+    style = attrib.get('style', '').replace(' ', '')
+    return attrib.get('display') == 'none' or 'display:none' in style
+
+class SvgDrawing:
+    """Geometría de un SVG: cúbicas ya transformadas y su agrupación en subtrazados
+
+    cubics es (K, 4, 2) en unidades de usuario del documento y counts indica
+    cuántas cúbicas seguidas forman cada subtrazado. viewbox es
+    (x, y, ancho, alto), la región del documento que se estira al canvas.
+    """
+
+    def __init__(self, cubics: np.ndarray, counts: np.ndarray,
+                 viewbox: Tuple[float, float, float, float]):
+        self.cubics = cubics
+        self.counts = counts
+        self.viewbox = viewbox
+
+    def polylines_mm(self, canvas_width: float, canvas_height: float,
+                     tolerance: float) -> List[np.ndarray]:
+        """Polilíneas en mm del canvas (Y hacia arriba) con error de cuerda <= tolerance"""
+        vx, vy, vw, vh = self.viewbox
+        sx, sy = canvas_width / vw, canvas_height / vh
+        control = np.empty_like(self.cubics)
+        control[..., 0] = (self.cubics[..., 0] - vx) * sx
+        control[..., 1] = (vy + vh - self.cubics[..., 1]) * sy
+        return flatten_cubics(control, self.counts, tolerance)
+
+def _iter_geometry(path: str) -> Iterator[Tuple[str, dict, np.ndarray]]:
+    """Recorre el documento en streaming: (nombre, atributos, transformación acumulada)
+
+    Los elementos ya procesados se liberan, así que archivos con decenas de
+    miles de trazados no se mantienen enteros en memoria.
+    """
+    transforms = [IDENTITY]
+    hidden = 0
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        name = _local_name(element.tag)
+        if event == 'start':
+            transforms.append(compose(transforms[-1], parse_transform(element.get('transform')))
+                              if element.get('transform') else transforms[-1])
+            if hidden or name in HIDDEN_CONTAINERS or _is_hidden(element.attrib):
+                hidden += 1
+            elif name in ('path', 'line', 'polyline', 'polygon', 'circle', 'ellipse', 'rect', 'svg'):
+                yield name, element.attrib, transforms[-1]
+        else:
+            transforms.pop()
+            if hidden:
+                hidden -= 1
+            if name != 'svg':
+                element.clear()
+
+def read_svg(path: str) -> SvgDrawing:
+    """Lee la geometría de un archivo SVG"""
+    cubics: List[Tuple[float, ...]] = []
+    counts: List[int] = []
+    matrices = [IDENTITY]
+    matrix_index: List[int] = []  # transformación de cada subtrazado
+    viewbox = None
+    for name, attrib, transform in _iter_geometry(path):
+        if name == 'svg':
+            if viewbox is None:
+                viewbox = _document_viewbox(attrib)
+            continue
+        if transform is not matrices[-1]:
+            matrices.append(transform)
+        for subpath in shape_to_cubics(name, attrib):
+            cubics.extend(subpath)
+            counts.append(len(subpath))
+            matrix_index.append(len(matrices) - 1)
+
+    control = np.array(cubics, dtype=np.float64).reshape(-1, 4, 2)
+    counts_array = np.array(counts, dtype=np.int64)
+    if len(control):
+        # Todas las transformaciones de una vez: una matriz por cúbica
+        a, b, c, d, e, f = np.array(matrices)[np.repeat(np.array(matrix_index), counts_array)].T[:, :, None]
+        x, y = control[..., 0], control[..., 1]
+        control = np.stack([a * x + c * y + e, b * x + d * y + f], axis=-1)
+    if viewbox is None or viewbox[2] <= 0 or viewbox[3] <= 0:
+        viewbox = _bounding_viewbox(control)
+    return SvgDrawing(control, counts_array, viewbox)
+
+def _document_viewbox(attrib: dict) -> Optional[Tuple[float, float, float, float]]:
+    """viewBox del elemento raíz, o (0, 0, width, height) si no lo tiene"""
+    values = [float(v) for v in _NUMBER.findall(attrib.get('viewBox', ''))]
+    if len(values) == 4:
+        return tuple(values)
+    width, height = parse_length(attrib.get('width')), parse_length(attrib.get('height'))
+    if width and height:
+        return (0.0, 0.0, width, height)
+    return None
+
+def _bounding_viewbox(control: np.ndarray) -> Tuple[float, float, float, float]:
+    """Caja de los puntos de control cuando el documento no declara su tamaño"""
+    if not len(control):
+        return (0.0, 0.0, 1.0, 1.0)
+    low = control.reshape(-1, 2).min(axis=0)
+    high = control.reshape(-1, 2).max(axis=0)
+    size = np.maximum(high - low, 1e-9)
+    return (float(low[0]), float(low[1]), float(size[0]), float(size[1]))
+
+def svg_document_size(path: str) -> Optional[Tuple[float, float]]:
+    """(ancho, alto) del documento leyendo solo el elemento raíz"""
+    for _, element in ET.iterparse(path, events=('start',)):
+        viewbox = _document_viewbox(element.attrib)
+        return (viewbox[2], viewbox[3]) if viewbox else None
+    return None
+
+def subdivisions(control: np.ndarray, tolerance: float) -> np.ndarray:
+    """Tramos de cada cúbica para que la cuerda se separe de la curva como mucho tolerance
+
+    Con n tramos uniformes el error es <= M / (8 n²), donde M acota la segunda
+    derivada: 6 veces la mayor diferencia segunda de los puntos de control.
+    """
+    second = np.maximum(
+        np.hypot(*(control[:, 0] - 2 * control[:, 1] + control[:, 2]).T),
+        np.hypot(*(control[:, 1] - 2 * control[:, 2] + control[:, 3]).T))
+    n = np.ceil(np.sqrt(6.0 * second / (8.0 * max(tolerance, 1e-9))))
+    return np.clip(n, 1, MAX_SUBDIVISIONS).astype(np.int64)
+
+def flatten_cubics(control: np.ndarray, counts: np.ndarray, tolerance: float) -> List[np.ndarray]:
+    """Polilínea de cada subtrazado: su primer punto más los tramos de sus cúbicas"""
+    if not len(control):
+        return []
+    n = subdivisions(control, tolerance)
+    segment = np.repeat(np.arange(len(control)), n)
+    first = np.cumsum(n) - n
+    t = (np.arange(len(segment)) - first[segment] + 1) / n[segment]
+    u = 1.0 - t
+    p = control[segment]
+    points = ((u * u * u)[:, None] * p[:, 0] + (3 * u * u * t)[:, None] * p[:, 1] +
+              (3 * u * t * t)[:, None] * p[:, 2] + (t * t * t)[:, None] * p[:, 3])
+
+    # Intercalar el punto inicial de cada subtrazado delante de sus tramos
+    per_subpath = np.add.reduceat(n, np.cumsum(counts) - counts)
+    sizes = per_subpath + 1
+    starts = np.cumsum(sizes) - sizes
+    output = np.empty((int(sizes.sum()), 2))
+    is_start = np.zeros(len(output), dtype=bool)
+    is_start[starts] = True
+    output[is_start] = control[np.cumsum(counts) - counts, 0]
+    output[~is_start] = points
+    return np.split(output, starts[1:])
+
+def polyline_lengths(polylines: List[np.ndarray]) -> np.ndarray:
+    """Longitud de cada polilínea con una sola pasada sobre todos los puntos"""
+    if not polylines:
+        return np.zeros(0)
+    sizes = np.array([len(p) for p in polylines])
+    points = np.concatenate(polylines)
+    segment = np.zeros(len(points))
+    segment[1:] = np.hypot(*np.diff(points, axis=0).T)
+    # El primer punto de cada polilínea no continúa la anterior
+    segment[np.cumsum(sizes) - sizes] = 0.0
+    return np.add.reduceat(segment, np.cumsum(sizes) - sizes)
@@ -161,7 +161,9 @@ def cleanup_test_files():
     test_files = [
         "test_drawing.png",
         "test_output.gcode",
-        "test_advanced.gcode"
+        "test_advanced.gcode",
+        "test_output.metrics.json",
+        "test_advanced.metrics.json"
     ]
     
     for file in test_files:
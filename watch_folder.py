@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Servicio de carpeta vigilada
+Sondea un directorio, espera a que cada imagen termine de escribirse y la
+convierte con AdvancedGCodeGenerator en un pool de procesos. Los archivos
+procesados se registran en SQLite para que un reinicio no repita trabajo
+ni se salte archivos
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from batch_pipeline import build_jobs
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp', '.svg')
+
+# Firma de un archivo: (tamaño, mtime en ns); cambiarla implica reprocesarlo
+Signature = Tuple[int, int]
+
+# Estado global de cada proceso worker
+_worker_config = None
+
+
+def _init_worker(config_path: Optional[str]) -> None:
+    """Precalienta el proceso worker importando OpenCV y el generador"""
+    global _worker_config
+    import cv2  # noqa: F401
+    from config_loader import load_config
+    _worker_config = load_config(config_path)
+
+
+def _process_image(image_path: str, output_path: str, options: Dict) -> List[str]:
+    """Convierte una imagen dentro de un worker y devuelve los archivos escritos"""
+    from advanced_generator import create_generator
+
+    # Los mensajes del generador no deben ensuciar la salida del servicio
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator = create_generator(options["machine"], options["profile"], _worker_config,
+                                     canvas_width=options["width"], canvas_height=options["height"])
+        return generator.process_image_to_gcode(image_path, output_path)
+
+
+class WatchState:
+    """Registro SQLite de los archivos ya procesados (o fallidos) y su firma"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                outputs TEXT,
+                error TEXT,
+                elapsed_s REAL,
+                processed_at REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+        # Copia en memoria para comparar firmas sin consultar la base en cada sondeo
+        self.known: Dict[str, Tuple[Signature, str]] = {
+            path: ((size, mtime_ns), status)
+            for path, size, mtime_ns, status in self.connection.execute(
+                "SELECT path, size, mtime_ns, status FROM files")
+        }
+
+    def is_current(self, path: str, signature: Signature, retry_failed: bool = False) -> bool:
+        """True si el archivo ya se procesó con esta misma firma"""
+        record = self.known.get(path)
+        if record is None or record[0] != signature:
+            return False
+        return not (retry_failed and record[1] == "failed")
+
+    def record(self, path: str, signature: Signature, status: str,
+               outputs: Optional[List[str]] = None, error: Optional[str] = None,
+               elapsed: Optional[float] = None) -> None:
+        """Guarda el resultado de un archivo (una transacción por archivo)"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, status, outputs, error, elapsed_s, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, signature[0], signature[1], status,
+                 json.dumps(outputs) if outputs is not None else None, error, elapsed, time.time()))
+        self.known[path] = (signature, status)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class FolderWatcher:
+    """Sondea un directorio y envía las imágenes nuevas o modificadas al pool"""
+
+    def __init__(self, watch_dir: str, output_dir: str, state: WatchState, options: Dict,
+                 workers: int = 2, poll_interval: float = 2.0, settle_time: float = 2.0,
+                 config_path: Optional[str] = None, retry_failed: bool = False):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.output_dir = output_dir
+        self.state = state
+        self.options = options
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.config_path = config_path
+        self.retry_failed = retry_failed
+
+        # Última firma vista de cada archivo aún sin procesar
+        self.observed: Dict[str, Signature] = {}
+        self.in_flight: Dict[Future, Tuple[str, Signature, float]] = {}
+        self.processed = 0
+        self.failed = 0
+
+    def scan(self) -> List[Tuple[str, Signature]]:
+        """Imágenes listas para procesar: sin cambios desde el sondeo anterior y
+        con una antigüedad mínima de settle_time (la escritura terminó)
+
+        Solo se usa el stat de cada entrada; no se lee ni se hashea ningún archivo.
+        """
+        now_ns = time.time_ns()
+        busy = {path for path, _, _ in self.in_flight.values()}
+        observed = {}
+        ready = []
+        with os.scandir(self.watch_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    info = entry.stat()
+                except OSError:
+                    continue  # borrado o movido entre el listado y el stat
+                path = entry.path
+                signature = (info.st_size, info.st_mtime_ns)
+                if (info.st_size == 0 or path in busy
+                        or self.state.is_current(path, signature, self.retry_failed)):
+                    continue
+                observed[path] = signature
+                settled = now_ns - info.st_mtime_ns >= self.settle_time * 1e9
+                if settled and self.observed.get(path) == signature:
+                    ready.append((path, signature))
+        self.observed = observed
+        return ready
+
+    def output_path(self, image_path: str) -> str:
+        suffix = f"{self.options['machine']}_{self.options['profile']}"
+        return build_jobs([image_path], self.output_dir, suffix)[0][1]
+
+    def submit(self, executor: ProcessPoolExecutor, path: str, signature: Signature) -> None:
+        future = executor.submit(_process_image, path, self.output_path(path), self.options)
+        self.in_flight[future] = (path, signature, time.perf_counter())
+        print(f"→ {os.path.basename(path)}")
+
+    def collect(self) -> None:
+        """Registra los trabajos terminados (la base solo se usa desde este hilo)"""
+        for future in [future for future in self.in_flight if future.done()]:
+            path, signature, start = self.in_flight.pop(future)
+            elapsed = time.perf_counter() - start
+            try:
+                outputs = future.result()
+            except Exception as e:
+                self.state.record(path, signature, "failed", error=str(e), elapsed=elapsed)
+                self.failed += 1
+                print(f"✗ {os.path.basename(path)}: {e}")
+                continue
+            self.state.record(path, signature, "done", outputs=outputs, elapsed=elapsed)
+            self.processed += 1
+            print(f"✓ {os.path.basename(path)} -> {', '.join(outputs)} ({elapsed:.1f}s)")
+
+    def run(self, once: bool = False) -> None:
+        """Bucle de sondeo; con once termina cuando no queda nada pendiente"""
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.config_path,)) as executor:
+            try:
+                while True:
+                    self.collect()
+                    # No adelantar más trabajo del que el pool puede empezar
+                    for path, signature in self.scan():
+                        if len(self.in_flight) >= 2 * self.workers:
+                            break
+                        self.submit(executor, path, signature)
+                    if once and not self.in_flight and not self.observed:
+                        break
+                    time.sleep(self.poll_interval)
+            except KeyboardInterrupt:
+                print("\nDeteniendo: se esperan los trabajos en curso...")
+                for future in self.in_flight:
+                    future.cancel()
+                executor.shutdown(wait=True)
+                self.collect()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Vigila una carpeta y convierte las imágenes nuevas a G-code',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  %(prog)s escaneos -d gcode --machine plotter --profile sketch
+  %(prog)s escaneos --once
+        """
+    )
+    parser.add_argument('watch_dir', help='Carpeta a vigilar')
+    parser.add_argument('-d', '--output-dir', help='Directorio de salida (default: <carpeta>/gcode)')
+    parser.add_argument('--machine', default='grbl', help='Tipo de máquina (default: grbl)')
+    parser.add_argument('--profile', default='artistic', help='Perfil de dibujo (default: artistic)')
+    parser.add_argument('--width', type=float, default=200.0, help='Ancho del canvas en mm (default: 200)')
+    parser.add_argument('--height', type=float, default=200.0, help='Alto del canvas en mm (default: 200)')
+    parser.add_argument('--config', help='Archivo de configuración (default: config.json)')
+    parser.add_argument('--workers', type=int, default=2, help='Procesos worker (default: 2)')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='Segundos entre sondeos de la carpeta (default: 2)')
+    parser.add_argument('--settle-time', type=float, default=2.0,
+                        help='Segundos sin cambios para dar un archivo por terminado (default: 2)')
+    parser.add_argument('--state', help='Base de datos de estado (default: <salida>/watch_state.sqlite3)')
+    parser.add_argument('--retry-failed', action='store_true', help='Reintentar los archivos que fallaron')
+    parser.add_argument('--once', action='store_true', help='Procesar lo pendiente y terminar')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.watch_dir):
+        print(f"Error: no existe la carpeta {args.watch_dir}")
+        return 1
+    output_dir = args.output_dir or os.path.join(args.watch_dir, "gcode")
+    os.makedirs(output_dir, exist_ok=True)
+
+    state = WatchState(args.state or os.path.join(output_dir, "watch_state.sqlite3"))
+    options = {"machine": args.machine, "profile": args.profile, "width": args.width, "height": args.height}
+    watcher = FolderWatcher(args.watch_dir, output_dir, state, options,
+                            workers=args.workers, poll_interval=args.poll_interval,
+                            settle_time=args.settle_time, config_path=args.config,
+                            retry_failed=args.retry_failed)
+
+    print(f"Vigilando {os.path.abspath(args.watch_dir)} -> {output_dir} "
+          f"({args.machine}/{args.profile}, {args.workers} workers)")
+    try:
+        watcher.run(once=args.once)
+    finally:
+        state.close()
+    print(f"Procesadas: {watcher.processed}, fallidas: {watcher.failed}")
+    return 0 if not watcher.failed else 1
+
+if __name__ == "__main__":
+    exit(main())
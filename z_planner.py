@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Planificación de la Z de presión a lo largo de cada trazo
+Filtra la presión por longitud de arco, limita la pendiente dZ/mm a lo que
+el eje Z puede seguir sin frenar el movimiento XY y agrupa los cambios
+pequeños para que esos segmentos sean movimientos solo XY
+"""
+
+import numpy as np
+from typing import Optional
+
+def smooth_along_path(values: np.ndarray, arc: np.ndarray, window: float) -> np.ndarray:
+    """Media móvil de values en una ventana de window mm centrada en cada punto
+
+    Usa la integral acumulada por trapecios, así que los puntos pueden estar
+    espaciados de forma irregular. En los extremos la ventana se recorta.
+    """
+    if window <= 0 or len(values) < 3 or arc[-1] <= 0:
+        return values
+    integral = np.zeros(len(values))
+    np.cumsum((values[1:] + values[:-1]) * 0.5 * np.diff(arc), out=integral[1:])
+    low = np.maximum(arc - window / 2, 0.0)
+    high = np.minimum(arc + window / 2, arc[-1])
+    width = high - low
+    average = (np.interp(high, arc, integral) - np.interp(low, arc, integral)) / np.where(width > 0, width, 1.0)
+    return np.where(width > 0, average, values)
+
+def limit_slope(values: np.ndarray, arc: np.ndarray, max_slope: float) -> np.ndarray:
+    """Mayor curva por debajo de values con |dZ/ds| <= max_slope
+
+    Bajar Z (más presión) nunca levanta la pluma del papel. Cada pasada es un
+    mínimo acumulado: z_i = min_j (z_j + max_slope * |s_i - s_j|).
+    """
+    forward = max_slope * arc + np.minimum.accumulate(values - max_slope * arc)
+    reverse = (forward + max_slope * arc)[::-1]
+    return np.minimum.accumulate(reverse)[::-1] - max_slope * arc
+
+def apply_deadband(values: np.ndarray, base: float, deadband: float) -> np.ndarray:
+    """Redondea a múltiplos de deadband sobre base: los cambios menores desaparecen"""
+    if deadband <= 0:
+        return values
+    return base + np.round((values - base) / deadband) * deadband
+
+def plan_pressure_z(z: np.ndarray, arc: np.ndarray, smoothing: float = 0.0,
+                    max_slope: Optional[float] = None, deadband: float = 0.0,
+                    z_min: float = -np.inf, z_max: float = np.inf) -> np.ndarray:
+    """Aplica filtro paso bajo, límite de pendiente y banda muerta a la Z de un trazo"""
+    planned = smooth_along_path(z, arc, smoothing)
+    planned = apply_deadband(planned, z_min if np.isfinite(z_min) else 0.0, deadband)
+    # Tras la banda muerta cada cambio es un escalón: el límite lo convierte en rampa
+    if max_slope is not None and len(planned) > 1:
+        planned = limit_slope(planned, arc, max_slope)
+    return np.clip(planned, z_min, z_max)